@@ -0,0 +1,110 @@
+"""
+Telemetry-to-video frame alignment tracks.
+
+A track resamples a piece's periodic channels onto a video's frame
+timeline so an overlay needs one array lookup per frame. Frame f maps to
+telemetry time f * 1000 / fps + first_stroke_ms + offset_ms, the same model
+the video analysis page uses. Tracks are stored serialized and rebuilt only
+when the video's offset, piece or fps changes.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import orjson
+
+from force_curves import periodic_matrix
+
+# Used when a video's frame rate is unknown
+DEFAULT_FPS = 30.0
+
+SCALAR_CHANNELS = ['speed', 'accel', 'distance']
+SEAT_CHANNELS = ['gate_angle', 'gate_force_x', 'gate_angle_vel']
+
+
+def _to_list(values: np.ndarray, digits: int = 2) -> List[Any]:
+    """Round to `digits` and convert NaN to None."""
+    out = np.round(values, digits).astype(object)
+    out[np.isnan(values)] = None
+    return out.tolist()
+
+
+def _interp(frame_times: np.ndarray, times: np.ndarray, values: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(values)
+    if valid.sum() < 2:
+        return np.full(len(frame_times), np.nan)
+    return np.interp(frame_times, times[valid], values[valid], left=np.nan, right=np.nan)
+
+
+def build_alignment_track(
+    points: List[Dict[str, Any]],
+    stroke_times: Sequence[int],
+    offset_ms: int,
+    fps: float,
+    duration_ms: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Resample periodic data onto video frames.
+
+    Args:
+        points: Periodic points for the piece (ascending time)
+        stroke_times: time_ms of each stroke, ascending
+        offset_ms: User sync adjustment stored on the video
+        fps: Video frame rate
+        duration_ms: Video duration; when unknown the track runs to the end of the telemetry
+
+    Returns:
+        Dict with the timing parameters, a per-frame stroke index (-1 before
+        the first stroke) and one per-frame array per channel. Per-seat
+        channels hold a list of seat values for each frame.
+    """
+    timed = [p for p in points if p.get('time_ms') is not None]
+    base_offset_ms = int(stroke_times[0]) if len(stroke_times) else 0
+    start_ms = base_offset_ms + offset_ms
+
+    if duration_ms:
+        frame_count = int(np.ceil(duration_ms * fps / 1000.0))
+    elif timed:
+        frame_count = max(int((timed[-1]['time_ms'] - start_ms) * fps / 1000.0) + 1, 0)
+    else:
+        frame_count = 0
+
+    frame_times = start_ms + np.arange(frame_count) * (1000.0 / fps)
+    track: Dict[str, Any] = {
+        'fps': fps,
+        'offset_ms': offset_ms,
+        'base_offset_ms': base_offset_ms,
+        'frame_count': frame_count,
+        'stroke_index': (np.searchsorted(np.asarray(stroke_times, dtype=float), frame_times, side='right') - 1).tolist(),
+    }
+
+    times = np.array([p['time_ms'] for p in timed], dtype=float)
+    for key in SCALAR_CHANNELS:
+        values = np.array([np.nan if p.get(key) is None else p[key] for p in timed], dtype=float)
+        track[key] = _to_list(_interp(frame_times, times, values))
+    for key in SEAT_CHANNELS:
+        matrix = periodic_matrix(timed, key)
+        resampled = np.column_stack([_interp(frame_times, times, matrix[:, s]) for s in range(matrix.shape[1])]) \
+            if frame_count else np.empty((0, matrix.shape[1]))
+        track[key] = _to_list(resampled)
+    return track
+
+
+def load_cached_track(cursor, video_id: str, piece_id: str, offset_ms: int, fps: float) -> Optional[bytes]:
+    """Return the stored serialized track if it was built with the same parameters."""
+    cursor.execute("""
+        SELECT data FROM video_alignment_tracks
+        WHERE video_id = ? AND piece_id = ? AND offset_ms = ? AND fps = ?
+    """, (video_id, piece_id, offset_ms, fps))
+    row = cursor.fetchone()
+    return row['data'] if row else None
+
+
+def store_track(cursor, video_id: str, piece_id: str, offset_ms: int, fps: float, track: Dict[str, Any]) -> bytes:
+    """Serialize and store a track, replacing any earlier one for the video."""
+    data = orjson.dumps(track)
+    cursor.execute("""
+        INSERT OR REPLACE INTO video_alignment_tracks (video_id, piece_id, offset_ms, fps, data)
+        VALUES (?, ?, ?, ?, ?)
+    """, (video_id, piece_id, offset_ms, fps, data))
+    return data
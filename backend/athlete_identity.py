@@ -0,0 +1,135 @@
+"""
+Global athlete identity resolution.
+
+Crew members in a Peach CSV are linked to global athletes by UNI, or by
+normalized name when the CSV has no UNI. global_athletes.name_key holds
+the normalized name so both lookups are served by an index, and a whole
+crew is resolved with one query. An AthleteIdentityMap remembers ids
+already resolved, so a bulk import only asks the database about each
+athlete once.
+"""
+
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from csv_parser import parse_to_float
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase with runs of whitespace collapsed; the value stored in name_key."""
+    return ' '.join(name.lower().split())
+
+
+class AthleteIdentityMap:
+    """UNI and name_key -> global athlete id, filled from the database on demand."""
+
+    def __init__(self):
+        self.by_uni: Dict[str, str] = {}
+        # Only athletes without a UNI are matched by name
+        self.by_name: Dict[str, str] = {}
+        self._seen_unis: Set[str] = set()
+        self._seen_names: Set[str] = set()
+
+    def clear(self):
+        """Forget everything, e.g. after a rolled-back transaction that inserted athletes."""
+        self.by_uni.clear()
+        self.by_name.clear()
+        self._seen_unis.clear()
+        self._seen_names.clear()
+
+    def load(self, cursor, unis: Set[str], name_keys: Set[str]):
+        """Look up the keys not yet seen in one query."""
+        unis = sorted(unis - self._seen_unis)
+        name_keys = sorted(name_keys - self._seen_names)
+        if not unis and not name_keys:
+            return
+        uni_marks = ','.join('?' * len(unis)) or 'NULL'
+        name_marks = ','.join('?' * len(name_keys)) or 'NULL'
+        cursor.execute(f"""
+            SELECT id, uni, name_key FROM global_athletes
+            WHERE uni IN ({uni_marks})
+               OR (name_key IN ({name_marks}) AND (uni IS NULL OR uni = ''))
+            ORDER BY created_at
+        """, [*unis, *name_keys])
+        for row in cursor.fetchall():
+            if row['uni']:
+                self.by_uni.setdefault(row['uni'], row['id'])
+            else:
+                self.by_name.setdefault(row['name_key'], row['id'])
+        self._seen_unis.update(unis)
+        self._seen_names.update(name_keys)
+
+
+def _crew_fields(crew_member: Dict[str, str], athlete_name: str) -> Dict[str, Any]:
+    return {
+        'uni': crew_member.get('Abbr', '').strip().lower() or crew_member.get('Abbreviation', '').strip().lower(),
+        'squad': crew_member.get('Squad', '').strip().lower() or None,
+        'first_name': crew_member.get('First Name', '').strip() or None,
+        'last_name': crew_member.get('Last Name', '').strip() or None,
+        'peach_id': crew_member.get('ID', '').strip() or None,
+        'weight': parse_to_float(crew_member.get('Weight', '')),
+        'name': athlete_name,
+        'name_key': normalize_name(athlete_name),
+    }
+
+
+def resolve_crew(
+    cursor,
+    crew: Sequence[Tuple[Dict[str, str], str]],
+    identity: Optional[AthleteIdentityMap] = None,
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Find or create the global athlete for each (crew_member, athlete_name).
+
+    A UNI match takes the CSV's name, squad, weight and name parts; a name
+    match (athletes without a UNI) takes squad and weight. Unmatched crew
+    members become new global athletes. Returns (global_athlete_id, uni)
+    per crew member, in order.
+    """
+    identity = identity if identity is not None else AthleteIdentityMap()
+    entries = [_crew_fields(member, name) for member, name in crew]
+    identity.load(
+        cursor,
+        {e['uni'] for e in entries if e['uni']},
+        {e['name_key'] for e in entries if not e['uni']},
+    )
+
+    inserts, uni_updates, name_updates, results = [], [], [], []
+    for e in entries:
+        index, key = (identity.by_uni, e['uni']) if e['uni'] else (identity.by_name, e['name_key'])
+        global_athlete_id = index.get(key)
+        if global_athlete_id is None:
+            global_athlete_id = index[key] = str(uuid.uuid4())
+            inserts.append((global_athlete_id, e['uni'] or None, e['name'], e['name_key'], e['first_name'],
+                            e['last_name'], e['squad'], e['weight'], e['peach_id']))
+        elif e['uni']:
+            uni_updates.append((e['squad'], e['weight'], e['name'], e['name_key'], e['first_name'],
+                                e['last_name'], global_athlete_id))
+        else:
+            name_updates.append((e['squad'], e['weight'], global_athlete_id))
+        results.append((global_athlete_id, e['uni'] or None))
+
+    # Inserts first: a later seat with the same UNI or name updates the row just created
+    cursor.executemany("""
+        INSERT INTO global_athletes (id, uni, name, name_key, first_name, last_name, squad, weight, peach_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, inserts)
+    cursor.executemany("""
+        UPDATE global_athletes
+        SET squad = COALESCE(?, squad),
+            weight = COALESCE(?, weight),
+            name = ?,
+            name_key = ?,
+            first_name = COALESCE(?, first_name),
+            last_name = COALESCE(?, last_name),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, uni_updates)
+    cursor.executemany("""
+        UPDATE global_athletes
+        SET squad = COALESCE(?, squad),
+            weight = COALESCE(?, weight),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, name_updates)
+    return results
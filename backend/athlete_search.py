@@ -0,0 +1,178 @@
+"""
+Fuzzy athlete search and duplicate detection.
+
+Search goes through athlete_search, an FTS5 trigram index over global
+athlete names and UNIs kept in sync by triggers (see database.py). The
+index finds every athlete sharing a trigram with the query; those
+candidates are then ranked by trigram similarity, so typos ("Jonh") and
+short forms ("Jon" for "Jonathan") still match.
+
+The duplicate report scores pairs that share uncommon trigrams, found
+through an in-memory inverted index, plus pairs with the same last name
+where one first name is a prefix of the other. It never compares every
+athlete with every other.
+"""
+
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set
+
+from athlete_identity import normalize_name
+
+# Candidates read from the FTS index before ranking
+SEARCH_CANDIDATES = 200
+
+# Results below this similarity are dropped
+MIN_SEARCH_SCORE = 0.2
+
+# Trigrams shared by more athletes than this are ignored when pairing
+# duplicates; they are mostly word starts like "  j"
+MAX_POSTING = 50
+
+_WORD = re.compile(r'\w+')
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of each word padded with two leading blanks and one trailing (as pg_trgm)."""
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """Jaccard similarity of two trigram sets."""
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def _score(query: str, query_grams: Set[str], row) -> float:
+    if row['uni'] and row['uni'] == query:
+        return 1.0
+    name = row['name_key'] or normalize_name(row['name'])
+    if name == query:
+        return 1.0
+    score = similarity(query_grams, trigrams(name))
+    for word in name.split():
+        score = max(score, similarity(query_grams, trigrams(word)) * 0.9)
+        if word.startswith(query):
+            # "jon" for "jonathan": prefixes score higher the more of the word they cover
+            score = max(score, 0.5 + 0.4 * len(query) / len(word))
+    return round(score, 4)
+
+
+def _match_expression(query: str) -> Optional[str]:
+    # The FTS5 trigram tokenizer indexes raw three-character substrings
+    grams = {word[i:i + 3] for word in _WORD.findall(query) for i in range(len(word) - 2)}
+    if not grams:
+        return None
+    return ' OR '.join('"' + g.replace('"', '""') + '"' for g in sorted(grams))
+
+
+def rebuild_search_index(cursor):
+    """
+    Re-read every athlete into athlete_search. Needed when the index is
+    first created and after a full VACUUM, which may renumber the
+    global_athletes rowids it refers to.
+    """
+    cursor.execute("INSERT INTO athlete_search (athlete_search) VALUES ('rebuild')")
+
+
+def search_athletes(cursor, query: str, limit: int = 20, squad: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Global athletes matching `query` by name or UNI, best first, each with a `score`."""
+    query = normalize_name(query)
+    if not query:
+        return []
+    squad_clause, params = "", []
+    if squad:
+        squad_clause = "AND g.squad = ?"
+        params.append(squad.strip().lower())
+
+    expression = _match_expression(query)
+    if expression is not None:
+        cursor.execute(f"""
+            SELECT g.* FROM athlete_search
+            JOIN global_athletes g ON g.rowid = athlete_search.rowid
+            WHERE athlete_search MATCH ? {squad_clause}
+            ORDER BY athlete_search.rank
+            LIMIT ?
+        """, [expression, *params, SEARCH_CANDIDATES])
+    else:
+        # Shorter than a trigram: prefix match on name words and UNI
+        cursor.execute(f"""
+            SELECT g.* FROM global_athletes g
+            WHERE (g.name_key LIKE ? OR g.name_key LIKE ? OR g.uni LIKE ?) {squad_clause}
+            LIMIT ?
+        """, [f"{query}%", f"% {query}%", f"{query}%", *params, SEARCH_CANDIDATES])
+
+    query_grams = trigrams(query)
+    results = []
+    for row in cursor.fetchall():
+        score = _score(query, query_grams, row)
+        if score >= MIN_SEARCH_SCORE:
+            results.append({**dict(row), 'score': score})
+    results.sort(key=lambda r: (-r['score'], r['name']))
+    return results[:limit]
+
+
+def _nickname_pair(a: List[str], b: List[str]) -> bool:
+    """Same last name, and one first name is a shorter prefix of the other ("jon" / "jonathan")."""
+    if len(a) < 2 or len(b) < 2 or a[-1] != b[-1]:
+        return False
+    first_a, first_b = a[0], b[0]
+    shorter, longer = sorted((first_a, first_b), key=len)
+    return len(shorter) >= 2 and shorter != longer and longer.startswith(shorter)
+
+
+def find_duplicate_candidates(cursor, threshold: float = 0.5, limit: int = 200) -> List[Dict[str, Any]]:
+    """
+    Pairs of global athletes that are likely the same person, best first.
+
+    Pairs with two different UNIs are skipped: the UNI is authoritative.
+    """
+    cursor.execute("SELECT * FROM global_athletes ORDER BY created_at")
+    rows = [dict(row) for row in cursor.fetchall()]
+    names = [row['name_key'] or normalize_name(row['name']) for row in rows]
+    grams = [trigrams(name) for name in names]
+
+    postings = defaultdict(list)
+    for i, athlete_grams in enumerate(grams):
+        for gram in athlete_grams:
+            postings[gram].append(i)
+
+    pairs: Dict[tuple, str] = {}
+    for posting in postings.values():
+        if len(posting) > MAX_POSTING:
+            continue
+        for x, i in enumerate(posting):
+            for j in posting[x + 1:]:
+                pairs.setdefault((i, j), 'similar_name')
+
+    by_last_name = defaultdict(list)
+    for i, name in enumerate(names):
+        words = name.split()
+        if len(words) >= 2:
+            by_last_name[words[-1]].append(i)
+    for group in by_last_name.values():
+        for x, i in enumerate(group):
+            for j in group[x + 1:]:
+                if _nickname_pair(names[i].split(), names[j].split()):
+                    pairs[(i, j)] = 'nickname'
+
+    candidates = []
+    for (i, j), reason in pairs.items():
+        a, b = rows[i], rows[j]
+        if a['uni'] and b['uni'] and a['uni'] != b['uni']:
+            continue
+        score = similarity(grams[i], grams[j])
+        if reason == 'nickname':
+            score = max(score, threshold)
+        elif names[i] == names[j]:
+            reason = 'same_name'
+        if score >= threshold:
+            candidates.append({'score': round(score, 4), 'reason': reason, 'athlete_a': a, 'athlete_b': b})
+    candidates.sort(key=lambda c: (-c['score'], c['athlete_a']['name']))
+    return candidates[:limit]
@@ -0,0 +1,187 @@
+"""
+Parser and ingest benchmark.
+
+Generates synthetic Peach CSVs (see benchmarks/synthetic.py) and measures
+throughput and peak Python memory for each ingest stage:
+
+    parse     parse_peach_csv on the whole file
+    strokes   extract_stroke_arrays over every stroke row
+    periodic  extract_periodic_arrays over every periodic row
+    upload    POST /api/upload end to end, into a scratch database
+
+Timings are the best of --repeat runs. Peak memory comes from a separate
+tracemalloc run so tracing overhead does not skew the timings. Results can
+be saved with --json and compared to an earlier run with --baseline; the
+exit status is 1 when any stage is slower than the baseline by more than
+--tolerance.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ingest --minutes 10 60 180
+    python -m benchmarks.bench_ingest --minutes 60 --json out.json --baseline base.json
+"""
+
+import argparse
+import atexit
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Point the app at a scratch database before it is imported
+_SCRATCH_DIR = tempfile.mkdtemp(prefix='peach-bench-')
+atexit.register(shutil.rmtree, _SCRATCH_DIR, ignore_errors=True)
+os.environ.setdefault('PEACH_DB_PATH', os.path.join(_SCRATCH_DIR, 'bench.db'))
+
+from benchmarks.synthetic import SyntheticSession, generate_peach_csv  # noqa: E402
+from csv_parser import parse_peach_csv, extract_stroke_arrays, extract_periodic_arrays  # noqa: E402
+
+
+def best_time(fn, repeat, teardown=None):
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+        if teardown:
+            teardown()
+    return best
+
+
+def peak_memory(fn, teardown=None):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        if teardown:
+            teardown()
+
+
+def make_upload(content):
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    body = content.encode()
+    session_ids = []
+
+    def upload():
+        response = client.post('/api/upload', files={'file': ('bench.csv', body, 'text/csv')})
+        response.raise_for_status()
+        session_ids.append(response.json()['session_id'])
+
+    def teardown():
+        # Untimed: the next run must not be skipped as a duplicate upload
+        while session_ids:
+            client.delete(f"/api/sessions/{session_ids.pop()}")
+
+    return upload, teardown
+
+
+def bench_size(config, repeat, skip_upload):
+    content = generate_peach_csv(config)
+    parsed = parse_peach_csv(content)
+    rows = {
+        'parse': len(parsed.stroke_metrics) + len(parsed.periodic_data),
+        'strokes': len(parsed.stroke_metrics),
+        'periodic': len(parsed.periodic_data),
+        'upload': len(parsed.stroke_metrics) + len(parsed.periodic_data),
+    }
+    stages = {
+        'parse': lambda: parse_peach_csv(content),
+        'strokes': lambda: [extract_stroke_arrays(row) for row in parsed.stroke_metrics],
+        'periodic': lambda: [extract_periodic_arrays(row) for row in parsed.periodic_data],
+    }
+    teardowns = {}
+    if not skip_upload:
+        stages['upload'], teardowns['upload'] = make_upload(content)
+
+    results = {'minutes': config.minutes, 'bytes': len(content), 'stages': {}}
+    for name, fn in stages.items():
+        seconds = best_time(fn, repeat, teardowns.get(name))
+        results['stages'][name] = {
+            'seconds': seconds,
+            'rows_per_s': rows[name] / seconds if seconds else None,
+            'mb_per_s': len(content) / 1e6 / seconds if name in ('parse', 'upload') else None,
+            'peak_mb': peak_memory(fn, teardowns.get(name)) / 1e6,
+        }
+    return results
+
+
+def print_results(results):
+    print(f"\n{results['minutes']:g} min file, {results['bytes'] / 1e6:.1f} MB")
+    for name, stage in results['stages'].items():
+        mb_s = f"{stage['mb_per_s']:7.1f} MB/s" if stage['mb_per_s'] else ' ' * 12
+        print(f"  {name:<9} {stage['seconds'] * 1000:9.1f} ms  {stage['rows_per_s']:12,.0f} rows/s  "
+              f"{mb_s}  peak {stage['peak_mb']:8.1f} MB")
+
+
+def compare(results, baseline, tolerance):
+    """Print slowdowns against a baseline run. Returns True if any exceed the tolerance."""
+    config_keys = ('seats', 'pieces', 'column_style')
+    if any(results[k] != baseline.get(k) for k in config_keys):
+        print('  baseline was run with a different seats/pieces/column style; not comparable')
+        return False
+
+    regressed = False
+    base_by_minutes = {run['minutes']: run for run in baseline['runs']}
+    for run in results['runs']:
+        base = base_by_minutes.get(run['minutes'])
+        if not base:
+            continue
+        for name, stage in run['stages'].items():
+            base_stage = base['stages'].get(name)
+            if not base_stage:
+                continue
+            ratio = stage['seconds'] / base_stage['seconds']
+            flag = ''
+            if ratio > 1 + tolerance:
+                regressed = True
+                flag = '  REGRESSION'
+            print(f"  {run['minutes']:g} min {name:<9} x{ratio:5.2f} vs baseline{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=float, nargs='+', default=[10, 60])
+    parser.add_argument('--seats', type=int, default=8)
+    parser.add_argument('--pieces', type=int, default=1)
+    parser.add_argument('--column-style', choices=['compact', 'spaced'], default='compact')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-upload', action='store_true', help='only benchmark the parser stages')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='compare against a previous --json output')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown (0.15 = 15%%)')
+    args = parser.parse_args()
+
+    results = {'seats': args.seats, 'pieces': args.pieces, 'column_style': args.column_style, 'runs': []}
+    for minutes in args.minutes:
+        config = SyntheticSession(seats=args.seats, pieces=args.pieces, minutes=minutes,
+                                  column_style=args.column_style)
+        run = bench_size(config, args.repeat, args.skip_upload)
+        print_results(run)
+        results['runs'].append(run)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        print('\nBaseline comparison:')
+        baseline = json.loads(Path(args.baseline).read_text())
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Serialization benchmark for the bulk JSON endpoints.
+
+Compares the old path (Pydantic model per row + stdlib json) with the
+orjson fast path, and reports bytes on the wire for identity, gzip and
+brotli encodings.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization --strokes 600 --seconds 1200
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+import orjson
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compression import _Compressor  # noqa: E402
+from models import StrokeMetric  # noqa: E402
+
+
+def make_stroke_rows(count, seats=8):
+    rng = random.Random(1)
+    rows = []
+    for n in range(1, count + 1):
+        row = {
+            'id': f'stroke-{n}', 'piece_id': 'piece', 'stroke_number': n,
+            'time_ms': n * 1900, 'rating': 32 + rng.random(),
+            'avg_boat_speed': 5 + rng.random(), 'distance_per_stroke': 9.5,
+            'average_power': 380 + rng.random() * 20,
+        }
+        for key in ['swivel_power', 'min_angle', 'max_angle', 'catch_slip',
+                    'finish_slip', 'drive_time', 'recovery_time',
+                    'work_pc_q1', 'work_pc_q2', 'work_pc_q3', 'work_pc_q4']:
+            row[key] = [round(rng.uniform(-60, 450), 2) for _ in range(seats)]
+        rows.append(row)
+    return rows
+
+
+def make_periodic_points(seconds, hz=50, seats=8):
+    points = []
+    for i in range(int(seconds * hz)):
+        t = i * 1000 // hz
+        phase = (t % 1900) / 1900
+        points.append({
+            'time_ms': t, 'normalized_time': round(phase * 100, 2),
+            'speed': round(5 + math.sin(phase * 6.28), 3), 'distance': round(t / 200, 2),
+            'accel': round(math.cos(phase * 6.28), 3),
+            'gate_angle': [round(-55 + 90 * phase + s, 2) for s in range(seats)],
+            'gate_force_x': [round(max(0.0, 800 * math.sin(phase * 6.28)) + s, 2) for s in range(seats)],
+            'gate_angle_vel': [round(200 * math.cos(phase * 6.28), 2) for _ in range(seats)],
+        })
+    return points
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    out = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def wire_sizes(body):
+    sizes = {'identity': len(body)}
+    for encoding in ('gzip', 'br'):
+        sizes[encoding] = len(_Compressor(encoding).compress(body, final=True))
+    return sizes
+
+
+def bench_endpoint(name, legacy, fast, repeat):
+    legacy_s, legacy_body = timed(legacy, repeat)
+    fast_s, fast_body = timed(fast, repeat)
+    sizes = wire_sizes(fast_body)
+    print(f"{name:<12} legacy {legacy_s * 1000:8.1f} ms   orjson {fast_s * 1000:8.1f} ms   "
+          f"x{legacy_s / fast_s:5.1f}   bytes identity={sizes['identity']:,} "
+          f"gzip={sizes['gzip']:,} br={sizes['br']:,}")
+    return {'legacy_ms': legacy_s * 1000, 'fast_ms': fast_s * 1000, 'bytes': sizes,
+            'legacy_bytes': len(legacy_body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--strokes', type=int, default=600)
+    parser.add_argument('--seconds', type=float, default=1200, help='periodic duration at 50 Hz')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    strokes = make_stroke_rows(args.strokes)
+    periodic = make_periodic_points(args.seconds)
+    force_curve = periodic[:200]
+
+    def legacy_strokes():
+        models = [StrokeMetric(**row) for row in strokes]
+        return json.dumps([m.model_dump(mode='json') for m in models]).encode()
+
+    def legacy_periodic(points):
+        return lambda: json.dumps({'piece_id': 'piece', 'total_points': len(points), 'data': points}).encode()
+
+    def fast_periodic(points):
+        return lambda: orjson.dumps({'piece_id': 'piece', 'total_points': len(points), 'data': points})
+
+    bench_endpoint('strokes', legacy_strokes, lambda: orjson.dumps(strokes), args.repeat)
+    bench_endpoint('periodic', legacy_periodic(periodic), fast_periodic(periodic), args.repeat)
+    bench_endpoint('force-curve', legacy_periodic(force_curve), fast_periodic(force_curve), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""
+API load-test harness.
+
+Seeds a scratch database with synthetic sessions (benchmarks/synthetic.py),
+starts the real app under uvicorn in a separate process and drives it from
+a pool of client threads, each holding a keep-alive connection like a
+browser tab. Every request is timed and the report gives per-endpoint
+throughput and p50/p95/p99 latency.
+
+Scenarios (weights set with --mix):
+    dashboard    GET /api/sessions/{id}/dashboard for a random session
+    force_curve  scrub through consecutive strokes' force curves
+    trends       GET /api/athletes/{id}/trends for a random athlete
+    upload       POST /api/upload of a short synthetic CSV
+
+Results are written with --json and can be compared against an earlier run
+with --baseline; the exit status is 1 when an endpoint's p95 or throughput
+regresses by more than --tolerance.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --sessions 20 --concurrency 16 --duration 30 --json run.json
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 8 --duration 60
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.synthetic import SyntheticSession, generate_peach_csv  # noqa: E402
+
+DEFAULT_MIX = 'dashboard=4,force_curve=8,trends=2,upload=1'
+
+# Strokes requested per force_curve scenario (one scrub gesture)
+SCRUB_STROKES = 5
+
+# Endpoints with fewer samples than this are reported but never flagged
+MIN_COMPARE_SAMPLES = 20
+
+
+# ----------------------------------------------------------------- setup
+
+def seed_database(db_path: str, sessions: int, minutes: float, crews: int):
+    """Ingest synthetic sessions straight into a fresh database."""
+    os.environ['PEACH_DB_PATH'] = db_path
+    from database import get_db
+    from ingest import prepare_ingest, write_ingest
+
+    squads = ['varsity', 'jv', 'novice']
+    for i in range(sessions):
+        config = SyntheticSession(minutes=minutes, seed=i, roster=i % crews,
+                                  squad=squads[(i % crews) % len(squads)], pieces=1 + i % 3)
+        prepared = prepare_ingest(generate_peach_csv(config), f'synthetic_{i}.csv')
+        with get_db() as conn:
+            write_ingest(conn.cursor(), prepared)
+        print(f"  seeded session {i + 1}/{sessions}", end='\r', flush=True)
+    print()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, PEACH_DB_PATH=db_path)
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning', '--no-access-log'],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('server did not start')
+
+
+# ----------------------------------------------------------------- client
+
+class Recorder:
+    """Collects (endpoint, latency, status, bytes) samples from all workers."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.bytes: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, endpoint: str, seconds: float, ok: bool, size: int):
+        with self._lock:
+            if ok:
+                self.samples[endpoint].append(seconds)
+                self.bytes[endpoint] += size
+            else:
+                self.errors[endpoint] += 1
+
+
+class Client:
+    """One keep-alive connection, like a single coach's browser."""
+
+    def __init__(self, host: str, port: int, recorder: Recorder, encoding: str):
+        self.host, self.port = host, port
+        self.recorder = recorder
+        self.encoding = encoding
+        self.conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, endpoint: str, method: str, path: str, body: bytes = None,
+                headers: Optional[Dict[str, str]] = None) -> Optional[bytes]:
+        headers = dict(headers or {})
+        if self.encoding:
+            headers['Accept-Encoding'] = self.encoding
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            ok = 200 <= response.status < 300
+        except (OSError, http.client.HTTPException):
+            self.conn = None
+            data, ok = None, False
+        self.recorder.add(endpoint, time.perf_counter() - start, ok, len(data or b''))
+        return data if ok else None
+
+
+def discover(host: str, port: int) -> Dict[str, list]:
+    """Find session, piece, stroke and athlete ids to target."""
+    client = Client(host, port, Recorder(), '')
+
+    def get(path):
+        data = client.request('discover', 'GET', path)
+        if data is None:
+            raise RuntimeError(f'GET {path} failed during discovery')
+        return json.loads(data)
+
+    sessions = get('/api/sessions')
+    pieces = []
+    for session in sessions[:50]:
+        for piece in get(f"/api/sessions/{session['id']}")['pieces']:
+            strokes = [s['stroke_number'] for s in get(f"/api/pieces/{piece['id']}/strokes")]
+            if strokes:
+                pieces.append((piece['id'], strokes))
+    athletes = [a['id'] for a in get('/api/athletes')]
+    if not sessions or not pieces or not athletes:
+        raise RuntimeError('target has no data; seed it first or drop --url')
+    return {'sessions': [s['id'] for s in sessions], 'pieces': pieces, 'athletes': athletes}
+
+
+def multipart(filename: str, content: bytes):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+def run_scenario(name: str, client: Client, targets: Dict[str, list], rng: random.Random,
+                 upload_body):
+    if name == 'dashboard':
+        client.request('dashboard', 'GET', f"/api/sessions/{rng.choice(targets['sessions'])}/dashboard")
+    elif name == 'force_curve':
+        piece_id, strokes = rng.choice(targets['pieces'])
+        start = rng.randrange(len(strokes))
+        for n in strokes[start:start + SCRUB_STROKES]:
+            client.request('force_curve', 'GET', f'/api/pieces/{piece_id}/stroke/{n}/force-curve')
+    elif name == 'trends':
+        client.request('trends', 'GET', f"/api/athletes/{rng.choice(targets['athletes'])}/trends")
+    elif name == 'upload':
+        body, headers = upload_body
+        client.request('upload', 'POST', '/api/upload', body=body, headers=headers)
+    else:
+        raise ValueError(f'unknown scenario {name}')
+
+
+def drive_load(host, port, targets, mix, concurrency, duration, encoding, seed) -> Recorder:
+    recorder = Recorder()
+    names, weights = zip(*mix.items())
+    upload_body = multipart('load.csv', generate_peach_csv(SyntheticSession(minutes=1, seed=9999)).encode())
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = Client(host, port, recorder, encoding)
+        while time.perf_counter() < deadline:
+            run_scenario(rng.choices(names, weights)[0], client, targets, rng, upload_body)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder
+
+
+# ----------------------------------------------------------------- report
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return float('nan')
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(recorder: Recorder, duration: float) -> Dict[str, dict]:
+    endpoints = {}
+    for endpoint in sorted(set(recorder.samples) | set(recorder.errors)):
+        values = sorted(recorder.samples.get(endpoint, []))
+        endpoints[endpoint] = {
+            'requests': len(values),
+            'errors': recorder.errors.get(endpoint, 0),
+            'rps': len(values) / duration,
+            'mean_ms': sum(values) / len(values) * 1000 if values else None,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'max_ms': values[-1] * 1000 if values else None,
+            'bytes_per_request': recorder.bytes.get(endpoint, 0) / len(values) if values else None,
+        }
+    return endpoints
+
+
+def print_report(endpoints: Dict[str, dict]):
+    print(f"\n{'endpoint':<12} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9} {'KB/req':>8}")
+    for name, e in endpoints.items():
+        kb = f"{e['bytes_per_request'] / 1024:8.1f}" if e['bytes_per_request'] is not None else '       -'
+        print(f"{name:<12} {e['requests']:7d} {e['errors']:5d} {e['rps']:8.1f} {e['p50_ms']:9.1f} "
+              f"{e['p95_ms']:9.1f} {e['p99_ms']:9.1f} {(e['max_ms'] or 0):9.1f} {kb}")
+
+
+def compare(endpoints: Dict[str, dict], config: dict, baseline: dict, tolerance: float) -> bool:
+    """Print changes against a baseline run. Returns True on a regression beyond the tolerance."""
+    for key in ('concurrency', 'mix', 'sessions', 'server_workers'):
+        if baseline.get('config', {}).get(key) != config[key]:
+            print(f'  note: baseline used a different {key}')
+    regressed = False
+    for name, e in endpoints.items():
+        base = baseline['endpoints'].get(name)
+        if not base or min(base['requests'], e['requests']) < MIN_COMPARE_SAMPLES:
+            print(f"  {name:<12} too few samples to compare")
+            continue
+        p95_ratio = e['p95_ms'] / base['p95_ms']
+        rps_ratio = e['rps'] / base['rps']
+        flag = ''
+        if p95_ratio > 1 + tolerance or rps_ratio < 1 - tolerance:
+            regressed = True
+            flag = '  REGRESSION'
+        print(f"  {name:<12} p95 x{p95_ratio:5.2f}  throughput x{rps_ratio:5.2f}{flag}")
+    return regressed
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='drive an already running instance instead of a seeded local one')
+    parser.add_argument('--sessions', type=int, default=20, help='synthetic sessions to seed')
+    parser.add_argument('--minutes', type=float, default=10, help='length of each seeded session')
+    parser.add_argument('--crews', type=int, default=4, help='distinct rosters across seeded sessions')
+    parser.add_argument('--server-workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--concurrency', type=int, default=8, help='simultaneous clients')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'scenario weights (default {DEFAULT_MIX})')
+    parser.add_argument('--encoding', default='br, gzip', help="Accept-Encoding to send ('' for none)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='compare against a previous --json output')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95/throughput change (0.2 = 20%%)')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+    config = dict(concurrency=args.concurrency, duration=args.duration, mix=mix,
+                  sessions=args.sessions, minutes=args.minutes, server_workers=args.server_workers,
+                  encoding=args.encoding, url=args.url)
+
+    scratch = None
+    server = None
+    try:
+        if args.url:
+            target = urlparse(args.url)
+            host, port = target.hostname, target.port or 80
+        else:
+            scratch = tempfile.mkdtemp(prefix='peach-load-')
+            db_path = os.path.join(scratch, 'load.db')
+            print(f"Seeding {args.sessions} sessions of {args.minutes:g} min into {db_path}")
+            seed_database(db_path, args.sessions, args.minutes, args.crews)
+            host, port = '127.0.0.1', free_port()
+            server = start_server(db_path, port, args.server_workers)
+
+        targets = discover(host, port)
+        print(f"Driving {host}:{port} with {args.concurrency} clients for {args.duration:g}s "
+              f"({len(targets['sessions'])} sessions, {len(targets['athletes'])} athletes)")
+        recorder = drive_load(host, port, targets, mix, args.concurrency, args.duration,
+                              args.encoding, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    endpoints = summarize(recorder, args.duration)
+    print_report(endpoints)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({'config': config, 'endpoints': endpoints}, indent=2))
+
+    if args.baseline:
+        print('\nBaseline comparison:')
+        if compare(endpoints, config, json.loads(Path(args.baseline).read_text()), args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
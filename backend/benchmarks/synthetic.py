@@ -0,0 +1,240 @@
+"""
+Deterministic synthetic Peach CSV generator.
+
+Produces files in the PowerLine export layout the parser expects: File
+Info, Crew Info, Rig Info, Piece, Aperiodic 0x800A (one row per stroke) and
+Periodic (50 Hz) sections, each introduced by an #ERROR! marker. Stroke and
+periodic channels follow a simple stroke cycle (half-sine force over the
+drive, gate angle sweeping catch to finish, boat speed surging), so derived
+metrics such as force curves look plausible. The same seed always produces
+the same file.
+
+Lines are generated lazily, so multi-hour files can be written without
+holding them in memory.
+
+Usage (from backend/):
+    python -m benchmarks.synthetic out.csv --minutes 120 --seats 8 --pieces 4
+"""
+
+import argparse
+import math
+import random
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+STROKE_METRICS = [
+    # (compact header, spaced header variant)
+    ('SwivelPower', 'Swivel Power'),
+    ('MinAngle', 'Min Angle'),
+    ('MaxAngle', 'Max Angle'),
+    ('CatchSlip', 'Catch Slip'),
+    ('FinishSlip', 'Finish Slip'),
+    ('DriveTime', 'Drive Time'),
+    ('RecoveryTime', 'Recovery Time'),
+    ('WorkPCQ1', 'Work PC Q1'),
+    ('WorkPCQ2', 'Work PC Q2'),
+    ('WorkPCQ3', 'Work PC Q3'),
+    ('WorkPCQ4', 'Work PC Q4'),
+]
+
+PERIODIC_SEAT_CHANNELS = ['GateAngle', 'GateForceX', 'GateAngleVel']
+
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Casey', 'Riley', 'Morgan', 'Taylor', 'Jamie', 'Drew']
+LAST_NAMES = ['Smith', 'Chen', 'Okafor', 'Garcia', 'Novak', 'Singh', 'Murphy', 'Kowalski', 'Ito']
+
+
+@dataclass
+class SyntheticSession:
+    """Parameters for one generated file."""
+    seats: int = 8
+    pieces: int = 1
+    minutes: float = 10.0
+    rating: float = 32.0
+    hz: int = 50
+    seed: int = 0
+    # 'compact' (SwivelPower, Abbr) or 'spaced' (Swivel Power, Abbreviation)
+    column_style: str = 'compact'
+    squad: str = 'varsity'
+    uni_prefix: str = 'syn'
+    # Sessions with the same roster share athletes; defaults to the seed
+    roster: Optional[int] = None
+
+    @property
+    def duration_ms(self) -> int:
+        return int(self.minutes * 60_000)
+
+    @property
+    def stroke_ms(self) -> float:
+        return 60_000.0 / self.rating
+
+    @property
+    def stroke_count(self) -> int:
+        return int(self.duration_ms // self.stroke_ms)
+
+    @property
+    def periodic_count(self) -> int:
+        return self.duration_ms * self.hz // 1000
+
+
+def _stroke_header(config: SyntheticSession) -> List[List[str]]:
+    spaced = config.column_style == 'spaced'
+    h1 = ['Time', 'StrokeNumber', 'Rating', 'AvgBoatSpeed', 'Dist/Stroke', 'Average Power']
+    h2 = ['', '', '', 'Boat', 'Boat', '']
+    for compact, variant in STROKE_METRICS:
+        for seat in range(1, config.seats + 1):
+            h1.append(variant if spaced else compact)
+            h2.append(str(seat))
+    return [h1, h2]
+
+
+def _periodic_header(config: SyntheticSession) -> List[List[str]]:
+    h1 = ['Time', 'Normalized Time', 'Speed', 'Distance', 'Accel']
+    h2 = ['', '', 'Boat', 'Boat', 'Boat']
+    for channel in PERIODIC_SEAT_CHANNELS:
+        for seat in range(1, config.seats + 1):
+            h1.append(channel)
+            h2.append(str(seat))
+    return [h1, h2]
+
+
+def _seat_profile(rng: random.Random, seats: int) -> List[dict]:
+    """Per-seat constants so each rower has a consistent signature."""
+    return [{
+        'power': rng.uniform(330, 460),
+        'catch': rng.uniform(-62, -52),
+        'finish': rng.uniform(32, 42),
+        'peak_force': rng.uniform(650, 900),
+        'drive_frac': rng.uniform(0.34, 0.42),
+    } for _ in range(seats)]
+
+
+def iter_peach_csv_lines(config: SyntheticSession) -> Iterator[str]:
+    """Yield the lines of a synthetic Peach CSV (without newlines)."""
+    rng = random.Random(config.seed)
+    spaced = config.column_style == 'spaced'
+    profile = _seat_profile(rng, config.seats)
+    stroke_ms = config.stroke_ms
+
+    yield '#ERROR!,File Info'
+    yield 'Filename,Session,Serial #,Start Time,Boat'
+    day = config.seed % 28 + 1
+    yield f'synthetic_{config.seed}.csv,Synthetic {config.seed},PL{1000 + config.seed},{day:02d}/03/2024 07:30:00,{config.seats}x'
+
+    yield '#ERROR!,Crew Info'
+    yield f"Position,Name,{'Abbreviation' if spaced else 'Abbr'},Squad,First Name,Last Name,ID,Weight"
+    roster = config.seed if config.roster is None else config.roster
+    for seat in range(1, config.seats + 1):
+        first = FIRST_NAMES[(seat + roster) % len(FIRST_NAMES)]
+        last = LAST_NAMES[(seat * 3 + roster) % len(LAST_NAMES)]
+        yield (f'{seat},{first} {last},{config.uni_prefix}{seat:02d}{roster % 100:02d},'
+               f'{config.squad},{first},{last},{seat},{rng.uniform(68, 95):.1f}')
+
+    yield '#ERROR!,Rig Info'
+    yield 'Position,Side'
+    yield ','
+    for seat in range(1, config.seats + 1):
+        yield f"{seat},{'Port' if seat % 2 else 'Stbd'}"
+
+    yield '#ERROR!,Piece'
+    yield '#,Start,End,Duration,Distance,Rating,Pace'
+    piece_ms = config.duration_ms // max(config.pieces, 1)
+    for piece in range(config.pieces):
+        start = piece * piece_ms
+        distance = piece_ms / 1000 * 5.0
+        yield (f'{piece + 1},{start},{start + piece_ms},{piece_ms / 1000:.1f},{distance:.0f},'
+               f'{config.rating:.1f},1:40.0')
+
+    yield '#ERROR!,Aperiodic,0x800A'
+    for header in _stroke_header(config):
+        yield ','.join(header)
+    for n in range(1, config.stroke_count + 1):
+        time_ms = int(n * stroke_ms)
+        row = [str(time_ms), str(n), f'{config.rating + rng.gauss(0, 0.4):.1f}',
+               f'{5.0 + rng.gauss(0, 0.05):.2f}', f'{9.4 + rng.gauss(0, 0.1):.2f}',
+               f'{sum(p["power"] for p in profile) / config.seats:.1f}']
+        for compact, _ in STROKE_METRICS:
+            for p in profile:
+                drive_s = stroke_ms * p['drive_frac'] / 1000
+                value = {
+                    'SwivelPower': p['power'] + rng.gauss(0, 8),
+                    'MinAngle': p['catch'] + rng.gauss(0, 0.5),
+                    'MaxAngle': p['finish'] + rng.gauss(0, 0.5),
+                    'CatchSlip': 4.5 + rng.gauss(0, 0.6),
+                    'FinishSlip': -9 + rng.gauss(0, 0.6),
+                    'DriveTime': drive_s + rng.gauss(0, 0.01),
+                    'RecoveryTime': stroke_ms / 1000 - drive_s + rng.gauss(0, 0.02),
+                    'WorkPCQ1': 22 + rng.gauss(0, 1),
+                    'WorkPCQ2': 31 + rng.gauss(0, 1),
+                    'WorkPCQ3': 29 + rng.gauss(0, 1),
+                    'WorkPCQ4': 18 + rng.gauss(0, 1),
+                }[compact]
+                row.append(f'{value:.2f}')
+        yield ','.join(row)
+
+    # Periodic must stay last: the parser reads it to end of file
+    yield '#ERROR!,Periodic'
+    for header in _periodic_header(config):
+        yield ','.join(header)
+    step_ms = 1000 / config.hz
+    distance = 0.0
+    for i in range(config.periodic_count):
+        t = i * step_ms
+        phase = (t % stroke_ms) / stroke_ms
+        speed = 5.0 + 0.6 * math.sin(2 * math.pi * phase) + rng.gauss(0, 0.02)
+        distance += speed * step_ms / 1000
+        row = [str(int(t)), f'{phase * 100:.1f}', f'{speed:.3f}', f'{distance:.2f}',
+               f'{3.0 * math.cos(2 * math.pi * phase):.3f}']
+        angles, forces, velocities = [], [], []
+        for p in profile:
+            drive = p['drive_frac']
+            span = p['finish'] - p['catch']
+            if phase < drive:
+                progress = phase / drive
+                angles.append(p['catch'] + span * (1 - math.cos(math.pi * progress)) / 2)
+                forces.append(p['peak_force'] * math.sin(math.pi * progress) + rng.gauss(0, 10))
+                velocities.append(span * math.pi / 2 * math.sin(math.pi * progress) / (drive * stroke_ms / 1000))
+            else:
+                progress = (phase - drive) / (1 - drive)
+                angles.append(p['finish'] - span * (1 - math.cos(math.pi * progress)) / 2)
+                forces.append(rng.gauss(0, 5))
+                velocities.append(-span * math.pi / 2 * math.sin(math.pi * progress) / ((1 - drive) * stroke_ms / 1000))
+        row.extend(f'{v:.2f}' for v in angles)
+        row.extend(f'{v:.2f}' for v in forces)
+        row.extend(f'{v:.2f}' for v in velocities)
+        yield ','.join(row)
+
+
+def generate_peach_csv(config: SyntheticSession) -> str:
+    """Return a whole synthetic file as a string."""
+    return '\n'.join(iter_peach_csv_lines(config)) + '\n'
+
+
+def write_peach_csv(path: str, config: SyntheticSession) -> int:
+    """Write a synthetic file to `path`. Returns bytes written."""
+    written = 0
+    with open(path, 'w', newline='') as f:
+        for line in iter_peach_csv_lines(config):
+            written += f.write(line + '\n')
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output')
+    parser.add_argument('--minutes', type=float, default=10.0)
+    parser.add_argument('--seats', type=int, default=8, choices=[1, 2, 4, 8])
+    parser.add_argument('--pieces', type=int, default=1)
+    parser.add_argument('--rating', type=float, default=32.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--column-style', choices=['compact', 'spaced'], default='compact')
+    args = parser.parse_args()
+
+    config = SyntheticSession(seats=args.seats, pieces=args.pieces, minutes=args.minutes,
+                              rating=args.rating, seed=args.seed, column_style=args.column_style)
+    size = write_peach_csv(args.output, config)
+    print(f"wrote {args.output}: {size / 1e6:.1f} MB, {config.stroke_count} strokes, "
+          f"{config.periodic_count} periodic rows")
+
+
+if __name__ == '__main__':
+    main()
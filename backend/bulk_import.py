@@ -0,0 +1,256 @@
+"""
+Bulk importer for archives of Peach CSVs.
+
+Walks a directory tree, parses files in parallel worker processes with the
+same prepare_ingest code the API uses, and writes them in batches, each
+batch in one transaction under the single-writer lock. Files whose
+sha256 matches an existing session are skipped, so re-running over the
+same archive only loads what is new.
+
+A checkpoint file records every file handled (by path, size and mtime)
+after its batch commits. An interrupted run picks up where it stopped
+without re-reading finished files; failed files are listed there with
+their error and are retried with --retry-failed.
+
+Usage (from backend/):
+    python -m bulk_import /data/peach-archive --workers 8
+    python -m bulk_import /data/peach-archive --checkpoint archive.ckpt --retry-failed
+"""
+
+import argparse
+import dataclasses
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from athlete_identity import AthleteIdentityMap
+from database import get_db, init_db, write_db
+from ingest import prepare_ingest, write_ingest
+
+DEFAULT_CHECKPOINT = "bulk_import.checkpoint.jsonl"
+
+# A batch commits once it reaches either limit
+BATCH_FILES = 25
+BATCH_ROWS = 250_000
+
+PROGRESS_INTERVAL = 2.0
+
+# Hashes already in the database, set in each worker by _init_worker
+_known_hashes: Set[str] = set()
+
+
+def iter_csv_files(root: Path) -> Iterator[Path]:
+    """Every *.csv under root, in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith('.csv'):
+                yield Path(dirpath) / name
+
+
+def _file_key(path: Path) -> Dict[str, Any]:
+    stat = path.stat()
+    return {'path': str(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def load_checkpoint(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Latest checkpoint entry per file path."""
+    entries = {}
+    if path.exists():
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    entries[entry['path']] = entry
+    return entries
+
+
+def _init_worker(known_hashes: Set[str]):
+    global _known_hashes
+    _known_hashes = known_hashes
+
+
+def _prepare_file(key: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker: hash and parse one file. Returns the key plus a status."""
+    try:
+        payload = Path(key['path']).read_bytes()
+        content_hash = hashlib.sha256(payload).hexdigest()
+        if content_hash in _known_hashes:
+            return {**key, 'status': 'skipped', 'content_hash': content_hash}
+        prepared = prepare_ingest(payload.decode('utf-8'), Path(key['path']).name, content_hash=content_hash)
+        if not prepared.strokes and not prepared.periodic:
+            return {**key, 'status': 'failed', 'error': 'No stroke or periodic data found'}
+        # write_ingest only needs the header sections; drop the raw rows before pickling
+        prepared.parsed = dataclasses.replace(prepared.parsed, stroke_metrics=[], periodic_data=[])
+        return {**key, 'status': 'prepared', 'content_hash': content_hash, 'prepared': prepared}
+    except Exception as exc:
+        return {**key, 'status': 'failed', 'error': f"{type(exc).__name__}: {exc}"}
+
+
+class BulkImporter:
+    """Feeds files through a process pool and commits them in batches."""
+
+    def __init__(self, root: Path, checkpoint: Path, workers: int, batch_files: int = BATCH_FILES,
+                 batch_rows: int = BATCH_ROWS, retry_failed: bool = False):
+        self.root = root
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.batch_files = batch_files
+        self.batch_rows = batch_rows
+        self.retry_failed = retry_failed
+        self.counts = {'imported': 0, 'skipped': 0, 'failed': 0, 'resumed': 0}
+        self.rows = 0
+        self.bytes = 0
+        self.total = 0
+        self._batch: List[Dict[str, Any]] = []
+        self._batch_rows = 0
+        self._hashes: Set[str] = set()
+        # Shared by every batch so each athlete is looked up once per run
+        self.identity = AthleteIdentityMap()
+        self._started = time.perf_counter()
+        self._last_report = 0.0
+
+    def _pending_files(self) -> List[Dict[str, Any]]:
+        done = load_checkpoint(self.checkpoint)
+        pending = []
+        for path in iter_csv_files(self.root):
+            key = _file_key(path)
+            entry = done.get(key['path'])
+            if (entry and entry['size'] == key['size'] and entry['mtime_ns'] == key['mtime_ns']
+                    and (entry['status'] != 'failed' or not self.retry_failed)):
+                self.counts['resumed'] += 1
+                continue
+            pending.append(key)
+        return pending
+
+    def _record(self, results: List[Dict[str, Any]]):
+        with open(self.checkpoint, 'a') as f:
+            for result in results:
+                entry = {k: result.get(k) for k in ('path', 'size', 'mtime_ns', 'status', 'content_hash',
+                                                    'session_id', 'error')}
+                f.write(json.dumps(entry) + '\n')
+                self.counts[result['status']] += 1
+
+    def _write(self, results: List[Dict[str, Any]]):
+        try:
+            with write_db() as conn:
+                cursor = conn.cursor()
+                for result in results:
+                    result['session_id'] = write_ingest(cursor, result['prepared'], identity=self.identity).session_id
+        except Exception:
+            # The map may hold athletes inserted by the rolled-back transaction
+            self.identity.clear()
+            raise
+
+    def _flush(self):
+        batch, self._batch, self._batch_rows = self._batch, [], 0
+        if not batch:
+            return
+        try:
+            self._write(batch)
+        except Exception:
+            # Find the offending file by committing the batch one file at a time
+            for result in batch:
+                try:
+                    self._write([result])
+                except Exception as exc:
+                    result['status'] = 'failed'
+                    result['session_id'] = None
+                    result['error'] = f"{type(exc).__name__}: {exc}"
+        for result in batch:
+            if result['status'] == 'prepared':
+                result['status'] = 'imported'
+                self.rows += result['prepared'].total_rows
+                self.bytes += result['size']
+        self._record(batch)
+
+    def _handle(self, result: Dict[str, Any]):
+        if result['status'] == 'prepared' and result['content_hash'] in self._hashes:
+            # Same file twice in this run
+            result = {**result, 'status': 'skipped', 'prepared': None}
+        if result['status'] != 'prepared':
+            self._record([result])
+            return
+        self._hashes.add(result['content_hash'])
+        self._batch.append(result)
+        self._batch_rows += result['prepared'].total_rows
+        if len(self._batch) >= self.batch_files or self._batch_rows >= self.batch_rows:
+            self._flush()
+
+    def _report(self, final: bool = False):
+        now = time.perf_counter()
+        if not final and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        elapsed = max(now - self._started, 1e-9)
+        handled = sum(self.counts[k] for k in ('imported', 'skipped', 'failed'))
+        files_per_s = handled / elapsed
+        eta = (self.total - handled) / files_per_s if files_per_s and not final else 0
+        print(f"\r{handled}/{self.total} files  imported {self.counts['imported']}  "
+              f"skipped {self.counts['skipped']}  failed {self.counts['failed']}  "
+              f"{self.rows / elapsed:,.0f} rows/s  {self.bytes / 1e6 / elapsed:.1f} MB/s  "
+              f"eta {eta:.0f}s   ", end='\n' if final else '', flush=True)
+
+    def run(self) -> Dict[str, int]:
+        init_db()
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT content_hash FROM sessions WHERE content_hash IS NOT NULL")
+            self._hashes = {row['content_hash'] for row in cursor.fetchall()}
+
+        pending = self._pending_files()
+        self.total = len(pending)
+        print(f"{self.total} files to import ({self.counts['resumed']} already in the checkpoint), "
+              f"{self.workers} workers")
+
+        # Bound in-flight files so parsed data waiting to be written stays small
+        max_in_flight = self.workers * 2
+        queue = iter(pending)
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self._hashes,)) as pool:
+            in_flight = set()
+            while True:
+                while len(in_flight) < max_in_flight:
+                    key = next(queue, None)
+                    if key is None:
+                        break
+                    in_flight.add(pool.submit(_prepare_file, key))
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._handle(future.result())
+                self._report()
+        self._flush()
+        self._report(final=True)
+        return self.counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', type=Path, help='directory to scan for *.csv files')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='parser processes')
+    parser.add_argument('--checkpoint', type=Path, default=Path(DEFAULT_CHECKPOINT))
+    parser.add_argument('--batch-files', type=int, default=BATCH_FILES)
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS)
+    parser.add_argument('--retry-failed', action='store_true', help='retry files that failed on a previous run')
+    args = parser.parse_args(argv)
+
+    if not args.root.is_dir():
+        parser.error(f"{args.root} is not a directory")
+
+    counts = BulkImporter(args.root, args.checkpoint, max(args.workers, 1), args.batch_files,
+                          args.batch_rows, args.retry_failed).run()
+    if counts['failed']:
+        print(f"{counts['failed']} files failed; see {args.checkpoint}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
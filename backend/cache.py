@@ -0,0 +1,65 @@
+"""
+Small in-process caches for derived telemetry results.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional
+
+from metrics import Counter, Gauge
+
+# Every cache created, for the metrics below
+_caches: List["LRUCache"] = []
+
+
+class LRUCache:
+    """Thread-safe LRU cache that counts hits and misses."""
+
+    def __init__(self, name: str, maxsize: int = 128):
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def evict(self, predicate: Callable[[Hashable], bool]):
+        """Drop every entry whose key matches the predicate."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+Counter('peach_cache_hits_total', 'Cache lookups that found an entry.', ['cache'],
+        collect=lambda: {(c.name,): c.hits for c in _caches})
+Counter('peach_cache_misses_total', 'Cache lookups that found nothing.', ['cache'],
+        collect=lambda: {(c.name,): c.misses for c in _caches})
+Gauge('peach_cache_hit_ratio', 'Hits over lookups since startup.', ['cache'],
+      collect=lambda: {(c.name,): c.hit_ratio for c in _caches})
+Gauge('peach_cache_entries', 'Entries currently cached.', ['cache'],
+      collect=lambda: {(c.name,): len(c) for c in _caches})
@@ -0,0 +1,164 @@
+"""
+Response compression middleware.
+
+Negotiates brotli or gzip from the request's Accept-Encoding header and
+compresses responses above a size threshold. Streaming responses are
+compressed chunk by chunk and flushed so clients can decode incrementally.
+"""
+
+import re
+import zlib
+from typing import Iterable, Optional
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from timing import phase
+
+# Content types that are already compressed or must keep byte offsets intact
+UNCOMPRESSIBLE_PREFIXES = ('video/', 'image/', 'audio/', 'application/octet-stream',
+                           'application/zip', 'application/vnd.apache')
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, honouring q=0."""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+
+    for encoding in ('br', 'gzip'):
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    """Incremental compressor with a uniform interface for br and gzip."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._br = brotli.Compressor(quality=4)
+        else:
+            # wbits=31 -> gzip container
+            self._gz = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        with phase('compress'):
+            if self.encoding == 'br':
+                out = self._br.process(data) if data else b''
+                return out + (self._br.finish() if final else self._br.flush())
+            out = self._gz.compress(data) if data else b''
+            return out + self._gz.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """Compress HTTP responses with brotli or gzip.
+
+    Args:
+        minimum_size: Responses whose complete body is smaller than this are
+            sent uncompressed.
+        exclude_paths: Path patterns (regular expressions matched from the
+            start of the path) that are never compressed, e.g. video
+            byte-range endpoints.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024,
+                 exclude_paths: Iterable[str] = ()):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.exclude_paths = [re.compile(pattern) for pattern in exclude_paths]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'http' and not any(p.match(scope['path']) for p in self.exclude_paths):
+            encoding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+            if encoding:
+                responder = _CompressionResponder(self.app, encoding, self.minimum_size)
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.compressor: Optional[_Compressor] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _should_skip(self) -> bool:
+        headers = Headers(raw=self.initial_message['headers'])
+        if 'content-encoding' in headers or 'content-range' in headers:
+            return True
+        if self.initial_message.get('status') in (204, 206, 304):
+            return True
+        content_type = headers.get('content-type', '')
+        return content_type.startswith(UNCOMPRESSIBLE_PREFIXES)
+
+    async def send_compressed(self, message: Message) -> None:
+        message_type = message['type']
+        if message_type == 'http.response.start':
+            # Hold the start message until the first body chunk tells us
+            # whether compression is worthwhile.
+            self.initial_message = message
+            self.passthrough = self._should_skip()
+            return
+
+        if message_type != 'http.response.body':
+            await self.send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        if not self.started:
+            self.started = True
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(self.initial_message)
+                await self.send(message)
+                self.passthrough = True
+                return
+
+            self.compressor = _Compressor(self.encoding)
+            headers = MutableHeaders(raw=self.initial_message['headers'])
+            headers['Content-Encoding'] = self.encoding
+            headers.add_vary_header('Accept-Encoding')
+            if more_body:
+                del headers['Content-Length']
+            message['body'] = self.compressor.compress(body, final=not more_body)
+            if not more_body:
+                headers['Content-Length'] = str(len(message['body']))
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        message['body'] = self.compressor.compress(body, final=not more_body)
+        await self.send(message)
@@ -6,6 +6,7 @@ The format is section-based with #ERROR! markers as delimiters.
 """
 
 import json
+from datetime import datetime
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 
@@ -49,6 +50,27 @@ def parse_to_int(value: str) -> Optional[int]:
         return None
 
 
+# Start Time formats seen in Peach exports (day-first, as written by PowerLine)
+SESSION_DATE_FORMATS = [
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d',
+    '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y',
+    '%a %b %d %H:%M:%S %Y', '%d %b %Y %H:%M:%S', '%d %b %Y',
+]
+
+
+def parse_session_date(value: str) -> Optional[str]:
+    """Parse a Peach start time into an ISO date (YYYY-MM-DD), or None."""
+    if not value or not value.strip():
+        return None
+    value = value.strip()
+    for fmt in SESSION_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
 def parse_peach_csv(content: str) -> ParsedData:
     """
     Parse a Peach rowing telemetry CSV file.
@@ -251,4 +273,4 @@ def get_athlete_side(crew: List[Dict], rig_info: List[Dict], position: str) -> O
         if rig.get('position') == position:
             return rig.get('side')
     return None
- 
\ No newline at end of file
+ 
\ No newline at end of file
@@ -0,0 +1,434 @@
+"""
+Force-curve similarity search.
+
+Ingest stores a shape vector for every stroke and seat: gate force on a
+CURVE_VECTOR_POINTS normalized-time grid, centred and scaled to unit
+length. The dot product of two vectors is then the correlation of the two
+curve shapes, however hard either stroke was pulled. Vectors are
+quantized to int8 and stored one row per piece and seat in
+stroke_shape_vectors, so no periodic data is decoded at query time.
+
+CurveIndex keeps every vector in one in-memory matrix and searches it
+exactly, in chunks, with a matrix-vector product. Before each query it
+reads the rows added since the last one; it reloads from scratch only
+after rows were deleted or replaced. An athlete's curve profile is the
+normalized mean of all their stroke vectors.
+
+Usage (from backend/), to add vectors for pieces uploaded before this existed:
+    python -m curve_search --backfill
+"""
+
+import argparse
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from database import get_db, init_db, write_db
+from force_curves import regrid_curves, stroke_curves, unpack_curves
+from metrics import Gauge
+from periodic_store import TIER_RAW, load_periodic
+
+# Normalized-time samples per shape vector
+CURVE_VECTOR_POINTS = 32
+
+# Unit vector components are stored as round(value * _SCALE) in int8
+_SCALE = 127
+
+# Centred curves shorter than this carry no shape (e.g. an empty seat)
+MIN_CURVE_NORM = 1e-6
+
+# Rows converted to float per matrix product
+SEARCH_CHUNK = 1 << 18
+
+
+def shape_vectors(force: np.ndarray) -> np.ndarray:
+    """
+    Unit shape vectors from (strokes, points, seats) force curves.
+
+    Returns (strokes, seats, points); a stroke's row is NaN where its curve
+    has gaps or no variation.
+    """
+    curves = np.moveaxis(force, 2, 1).astype(np.float32)
+    centred = curves - curves.mean(axis=2, keepdims=True)
+    norms = np.linalg.norm(centred, axis=2, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vectors = centred / norms
+    vectors[~(norms[..., 0] >= MIN_CURVE_NORM)] = np.nan
+    return vectors
+
+
+def piece_shape_vectors(
+    points: List[Dict[str, Any]],
+    strokes: Sequence[Dict[str, Any]],
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Shape vectors for a piece from its periodic points and strokes.
+
+    Returns (stroke_numbers, vectors (strokes, seats, points)), or None when
+    there is not enough periodic data.
+    """
+    timed = sorted((s for s in strokes if s['time_ms'] is not None), key=lambda s: s['stroke_number'])
+    curves = stroke_curves(points, [s['time_ms'] for s in timed], CURVE_VECTOR_POINTS)
+    if curves is None:
+        return None
+    return np.array([s['stroke_number'] for s in timed], dtype=np.int32), shape_vectors(curves[0])
+
+
+def vector_rows(
+    piece_id: str,
+    seats: Sequence[Tuple[Optional[str], int]],
+    stroke_numbers: np.ndarray,
+    vectors: np.ndarray,
+) -> List[tuple]:
+    """
+    stroke_shape_vectors rows for each rower, skipping strokes without a vector.
+
+    Args:
+        seats: (global_athlete_id, seat_position) per rower
+    """
+    rows = []
+    for global_athlete_id, seat_position in seats:
+        if seat_position - 1 >= vectors.shape[1]:
+            continue
+        seat_vectors = vectors[:, seat_position - 1, :]
+        valid = ~np.isnan(seat_vectors).any(axis=1)
+        if not valid.any():
+            continue
+        quantized = np.round(seat_vectors[valid] * _SCALE).astype(np.int8)
+        rows.append((piece_id, seat_position, global_athlete_id,
+                     stroke_numbers[valid].astype('<i4').tobytes(), quantized.tobytes()))
+    return rows
+
+
+def write_shape_vectors(cursor, rows: List[tuple]):
+    cursor.executemany("""
+        INSERT OR REPLACE INTO stroke_shape_vectors (piece_id, seat_position, global_athlete_id, stroke_numbers, vectors)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+
+
+class CurveIndex:
+    """Every stored shape vector in one int8 matrix, with the piece, seat, stroke and athlete of each row."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.count = 0
+        self.max_id = 0
+        self.vectors = np.empty((0, CURVE_VECTOR_POINTS), dtype=np.int8)
+        self.stroke_numbers = np.empty(0, dtype=np.int32)
+        # 1 / length of each quantized row, so scores are exact cosines of the stored vectors
+        self.row_scales = np.empty(0, dtype=np.float32)
+        # Row -> segment; a segment is one (piece, seat) row of stroke_shape_vectors
+        self.row_segments = np.empty(0, dtype=np.int32)
+        self.segment_keys: List[Tuple[str, int]] = []
+        self.segment_athletes: List[Optional[str]] = []
+        self.segment_starts: List[int] = []
+        self.segment_sums = np.empty((0, CURVE_VECTOR_POINTS), dtype=np.float32)
+        self.segment_lookup: Dict[Tuple[str, int], int] = {}
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def refresh(self, cursor):
+        """Catch up with stroke_shape_vectors."""
+        cursor.execute("SELECT COUNT(*) AS n, COALESCE(MAX(id), 0) AS max_id FROM stroke_shape_vectors")
+        state = cursor.fetchone()
+        count, max_id = state['n'], state['max_id']
+        with self._lock:
+            if (count, max_id) == (self.count, self.max_id):
+                return
+            cursor.execute("SELECT COUNT(*) FROM stroke_shape_vectors WHERE id > ? AND id <= ?",
+                           (self.max_id, max_id))
+            if self.count + cursor.fetchone()[0] != count:
+                # Rows were deleted or replaced since the last refresh
+                self._reset()
+            cursor.execute("""
+                SELECT piece_id, seat_position, global_athlete_id, stroke_numbers, vectors
+                FROM stroke_shape_vectors WHERE id > ? AND id <= ? ORDER BY id
+            """, (self.max_id, max_id))
+            self._append(cursor.fetchall())
+            self.count, self.max_id = count, max_id
+
+    def _append(self, rows):
+        if not rows:
+            return
+        vectors, stroke_numbers, row_segments, sums = [self.vectors], [self.stroke_numbers], [self.row_segments], []
+        row_scales = [self.row_scales]
+        offset = len(self.vectors)
+        for row in rows:
+            segment = len(self.segment_keys)
+            block = np.frombuffer(row['vectors'], dtype=np.int8).reshape(-1, CURVE_VECTOR_POINTS)
+            key = (row['piece_id'], row['seat_position'])
+            self.segment_keys.append(key)
+            self.segment_athletes.append(row['global_athlete_id'])
+            self.segment_starts.append(offset)
+            self.segment_lookup[key] = segment
+            vectors.append(block)
+            stroke_numbers.append(np.frombuffer(row['stroke_numbers'], dtype='<i4'))
+            row_segments.append(np.full(len(block), segment, dtype=np.int32))
+            row_scales.append(1.0 / np.maximum(np.linalg.norm(block.astype(np.float32), axis=1), 1.0))
+            sums.append(block.sum(axis=0, dtype=np.float32) / _SCALE)
+            offset += len(block)
+        self.vectors = np.concatenate(vectors)
+        self.stroke_numbers = np.concatenate(stroke_numbers).astype(np.int32)
+        self.row_segments = np.concatenate(row_segments)
+        self.row_scales = np.concatenate(row_scales).astype(np.float32)
+        self.segment_sums = np.concatenate([self.segment_sums, np.array(sums, dtype=np.float32)])
+
+    def _segment_rows(self, segment: int) -> slice:
+        end = self.segment_starts[segment + 1] if segment + 1 < len(self.segment_starts) else len(self.vectors)
+        return slice(self.segment_starts[segment], end)
+
+    def stroke_vector(self, piece_id: str, seat_position: int, stroke_number: int) -> Optional[np.ndarray]:
+        """Unit vector of one stored stroke, or None."""
+        with self._lock:
+            segment = self.segment_lookup.get((piece_id, seat_position))
+            if segment is None:
+                return None
+            rows = self._segment_rows(segment)
+            match = np.nonzero(self.stroke_numbers[rows] == stroke_number)[0]
+            if not len(match):
+                return None
+            return _unit(self.vectors[rows][match[0]].astype(np.float32))
+
+    def profiles(self) -> Dict[str, Tuple[np.ndarray, int]]:
+        """Global athlete id -> (unit mean shape vector, strokes)."""
+        with self._lock:
+            sums, athletes, starts = self.segment_sums, self.segment_athletes, self.segment_starts + [len(self.vectors)]
+        totals: Dict[str, List] = {}
+        for segment, athlete in enumerate(athletes):
+            if athlete is None:
+                continue
+            total = totals.setdefault(athlete, [np.zeros(CURVE_VECTOR_POINTS, dtype=np.float32), 0])
+            total[0] += sums[segment]
+            total[1] += starts[segment + 1] - starts[segment]
+        return {athlete: (_unit(vector), strokes) for athlete, (vector, strokes) in totals.items()}
+
+    def segment_profile(self, piece_id: str, seat_position: int) -> Optional[np.ndarray]:
+        """Unit mean shape vector of one seat in one piece, or None."""
+        with self._lock:
+            segment = self.segment_lookup.get((piece_id, seat_position))
+            return None if segment is None else _unit(self.segment_sums[segment])
+
+    def search(self, query: np.ndarray, limit: int, segment_filter=None) -> List[Dict[str, Any]]:
+        """
+        The `limit` stored strokes most similar to a unit `query` vector.
+
+        Args:
+            segment_filter: Optional (piece_id, seat_position, global_athlete_id) -> bool
+        """
+        with self._lock:
+            vectors, stroke_numbers, row_segments = self.vectors, self.stroke_numbers, self.row_segments
+            row_scales = self.row_scales
+            keys, athletes = list(self.segment_keys), list(self.segment_athletes)
+        if not len(vectors):
+            return []
+        q = query.astype(np.float32)
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), SEARCH_CHUNK):
+            scores[start:start + SEARCH_CHUNK] = vectors[start:start + SEARCH_CHUNK].astype(np.float32) @ q
+        scores *= row_scales
+        if segment_filter is not None:
+            allowed = np.array([segment_filter(*key, athlete) for key, athlete in zip(keys, athletes)], dtype=bool)
+            scores[~allowed[row_segments]] = -np.inf
+
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [{
+            'piece_id': keys[row_segments[i]][0],
+            'seat_position': keys[row_segments[i]][1],
+            'global_athlete_id': athletes[row_segments[i]],
+            'stroke_number': int(stroke_numbers[i]),
+            'similarity': round(float(scores[i]), 4),
+        } for i in top if np.isfinite(scores[i])]
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm >= MIN_CURVE_NORM else vector
+
+
+curve_index = CurveIndex()
+
+Gauge('peach_curve_index_vectors', 'Stroke shape vectors held by the in-memory curve index.',
+      collect=lambda: {(): len(curve_index)})
+
+
+def _describe(cursor, matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Add session and athlete names to search results."""
+    piece_ids = sorted({m['piece_id'] for m in matches})
+    athlete_ids = sorted({m['global_athlete_id'] for m in matches if m['global_athlete_id']})
+    pieces, athletes = {}, {}
+    if piece_ids:
+        cursor.execute(f"""
+            SELECT p.id, p.session_id, s.name AS session_name, s.session_date
+            FROM pieces p JOIN sessions s ON s.id = p.session_id
+            WHERE p.id IN ({','.join('?' * len(piece_ids))})
+        """, piece_ids)
+        pieces = {row['id']: dict(row) for row in cursor.fetchall()}
+    if athlete_ids:
+        cursor.execute(f"SELECT id, name FROM global_athletes WHERE id IN ({','.join('?' * len(athlete_ids))})",
+                       athlete_ids)
+        athletes = {row['id']: row['name'] for row in cursor.fetchall()}
+    results = []
+    for match in matches:
+        piece = pieces.get(match['piece_id'])
+        if piece is None:
+            # Deleted since the index was refreshed
+            continue
+        results.append({
+            **match,
+            'session_id': piece['session_id'],
+            'session_name': piece['session_name'],
+            'session_date': piece['session_date'],
+            'athlete_name': athletes.get(match['global_athlete_id']),
+        })
+    return results
+
+
+def find_similar_strokes(
+    cursor,
+    piece_id: str,
+    seat_position: int,
+    stroke_number: int,
+    limit: int = 20,
+    athlete_id: Optional[str] = None,
+    include_same_piece: bool = False,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Strokes whose force curve shape is closest to one given stroke, best
+    first. Returns None if that stroke has no stored vector.
+    """
+    curve_index.refresh(cursor)
+    query = curve_index.stroke_vector(piece_id, seat_position, stroke_number)
+    if query is None:
+        return None
+
+    def allowed(segment_piece, segment_seat, segment_athlete):
+        if athlete_id is not None and segment_athlete != athlete_id:
+            return False
+        return include_same_piece or segment_piece != piece_id
+
+    return _describe(cursor, curve_index.search(query, limit, allowed))
+
+
+def find_similar_athletes(
+    cursor,
+    piece_id: Optional[str] = None,
+    seat_position: Optional[int] = None,
+    athlete_id: Optional[str] = None,
+    limit: int = 20,
+    squad: Optional[str] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Athletes whose mean force curve shape is closest to a seat in a piece
+    (piece_id and seat_position) or to another athlete's profile, best
+    first. Returns None if the reference has no stored vectors.
+    """
+    curve_index.refresh(cursor)
+    profiles = curve_index.profiles()
+    if athlete_id is not None:
+        query = profiles.get(athlete_id, (None, 0))[0]
+    else:
+        query = curve_index.segment_profile(piece_id, seat_position)
+    if query is None:
+        return None
+
+    candidates = [gid for gid in profiles if gid != athlete_id]
+    if not candidates:
+        return []
+    squad_clause, params = "", list(candidates)
+    if squad:
+        squad_clause = "AND squad = ?"
+        params.append(squad.strip().lower())
+    cursor.execute(f"""
+        SELECT id, name, squad FROM global_athletes
+        WHERE id IN ({','.join('?' * len(candidates))}) {squad_clause}
+    """, params)
+    results = []
+    for row in cursor.fetchall():
+        vector, strokes = profiles[row['id']]
+        results.append({
+            'athlete_id': row['id'],
+            'name': row['name'],
+            'squad': row['squad'],
+            'strokes': strokes,
+            'similarity': round(float(vector @ query), 4),
+        })
+    results.sort(key=lambda r: (-r['similarity'], r['name']))
+    return results[:limit]
+
+
+def backfill_shape_vectors(limit: Optional[int] = None) -> int:
+    """Store vectors for pieces that have none. Returns the number of pieces done."""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, session_id FROM pieces
+            WHERE id NOT IN (SELECT piece_id FROM stroke_shape_vectors)
+            ORDER BY id
+        """)
+        pieces = [dict(row) for row in cursor.fetchall()]
+    done = 0
+    for piece in pieces[:limit]:
+        # Periodic data is immutable once ingested, so it is read before taking the writer lock
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT periodic_tier FROM pieces WHERE id = ?", (piece['id'],))
+            row = cursor.fetchone()
+            if row is None:
+                continue
+            cursor.execute("""
+                SELECT stroke_number, time_ms FROM stroke_metrics WHERE piece_id = ? ORDER BY stroke_number
+            """, (piece['id'],))
+            strokes = [dict(r) for r in cursor.fetchall()]
+            cursor.execute("SELECT global_athlete_id, seat_position FROM athletes WHERE session_id = ?",
+                           (piece['session_id'],))
+            seats = [(r['global_athlete_id'], r['seat_position']) for r in cursor.fetchall()]
+            stored = None
+            if row['periodic_tier'] != TIER_RAW:
+                # Compacted pieces keep full-rate per-stroke curves (see retention.py)
+                cursor.execute("SELECT stroke_count, grid_points, force FROM stroke_curves WHERE piece_id = ?",
+                               (piece['id'],))
+                stored = cursor.fetchone()
+                if stored is not None and stored['stroke_count'] != len(strokes):
+                    stored = None
+            if stored is not None:
+                force = unpack_curves(stored['force'], stored['stroke_count'], stored['grid_points'])
+                result = (np.array([s['stroke_number'] for s in strokes], dtype=np.int32),
+                          shape_vectors(regrid_curves(force, CURVE_VECTOR_POINTS)))
+            else:
+                result = piece_shape_vectors(load_periodic(cursor, piece['id']), strokes)
+        if result is None:
+            continue
+        rows = vector_rows(piece['id'], seats, *result)
+        with write_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM pieces WHERE id = ?", (piece['id'],))
+            if cursor.fetchone() is not None:
+                write_shape_vectors(cursor, rows)
+        done += 1
+    return done
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backfill', action='store_true', help='store vectors for pieces that have none')
+    parser.add_argument('--limit', type=int, help='at most this many pieces')
+    args = parser.parse_args(argv)
+    if not args.backfill:
+        parser.error("nothing to do (pass --backfill)")
+
+    init_db()
+    print(f"{backfill_shape_vectors(args.limit)} pieces backfilled")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,51 @@
+import json
+import os
 import sqlite3
+import threading
+import time
 import uuid
 from pathlib import Path
 from contextlib import contextmanager
 
-DATABASE_PATH = Path(__file__).parent / "peach_telemetry.db"
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within one process
+    fcntl = None
 
+from athlete_identity import normalize_name
+from athlete_search import rebuild_search_index
+from csv_parser import parse_session_date
+from metrics import Histogram
+from periodic_store import write_periodic
+from rollups import METRICS as ROLLUP_METRICS, rebuild_rollups
+from stroke_ranges import backfill_prefix_sums
+from timing import DB_TIMING_ENABLED, TimedConnection
 
-def get_connection():
-    conn = sqlite3.connect(DATABASE_PATH)
+# PEACH_DB_PATH points benchmarks and tools at a scratch database
+DATABASE_PATH = Path(os.environ.get("PEACH_DB_PATH", Path(__file__).parent / "peach_telemetry.db"))
+
+# How long a statement waits for another connection's write lock before
+# failing with "database is locked"
+BUSY_TIMEOUT = float(os.environ.get("PEACH_DB_BUSY_TIMEOUT", "30"))
+
+# Held by write_db() across threads and uvicorn worker processes
+WRITE_LOCK_PATH = DATABASE_PATH.with_name(DATABASE_PATH.name + ".write-lock")
+_write_lock = threading.Lock()
+
+WRITE_LOCK_WAIT = Histogram(
+    'peach_db_write_lock_wait_seconds', 'Time spent waiting for the single-writer lock.',
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+
+def get_connection(check_same_thread=True):
+    # Streaming responses iterate their generator from the threadpool, so
+    # they open connections with check_same_thread=False.
+    conn = sqlite3.connect(DATABASE_PATH, timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread,
+                           factory=TimedConnection if DB_TIMING_ENABLED else sqlite3.Connection)
     conn.row_factory = sqlite3.Row
+    # Durable at each WAL checkpoint rather than each commit
+    conn.execute("PRAGMA synchronous = NORMAL")
     return conn
 
 
@@ -22,8 +59,60 @@ def get_db():
         conn.close()
 
 
+@contextmanager
+def writer_lock():
+    """
+    Serialize writers across threads and worker processes.
+
+    SQLite allows one writer at a time; in WAL mode readers keep working
+    from their snapshot while it writes. Taking this lock before a long
+    write transaction queues writers here instead of having them time out
+    inside SQLite.
+    """
+    start = time.perf_counter()
+    with _write_lock:
+        if fcntl is None:
+            WRITE_LOCK_WAIT.observe(time.perf_counter() - start)
+            yield
+            return
+        with open(WRITE_LOCK_PATH, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            WRITE_LOCK_WAIT.observe(time.perf_counter() - start)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def write_db():
+    """Like get_db, for multi-statement writes: holds the writer lock and starts the transaction up front."""
+    with writer_lock():
+        conn = get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+
 def init_db():
-    """Initialize the database with schema."""
+    """Initialize the database with schema. Workers starting together take turns."""
+    with writer_lock():
+        conn = get_connection()
+        try:
+            # Only takes effect on a new, empty database; existing ones are
+            # converted once with `python -m retention --convert-vacuum`
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            # Persistent: readers in every worker use WAL snapshots from now on
+            conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            conn.close()
+        _init_schema()
+
+
+def _init_schema():
     with get_db() as conn:
         cursor = conn.cursor()
 
@@ -59,6 +148,7 @@ def init_db():
                 id TEXT PRIMARY KEY,
                 uni TEXT,
                 name TEXT NOT NULL,
+                name_key TEXT,
                 first_name TEXT,
                 last_name TEXT,
                 squad TEXT,
@@ -82,6 +172,8 @@ def init_db():
                 distance_meters REAL,
                 avg_rating REAL,
                 pace TEXT,
+                periodic_tier TEXT NOT NULL DEFAULT 'raw',
+                compacted_at TEXT,
                 UNIQUE(session_id, piece_number)
             )
         """)
@@ -121,6 +213,86 @@ def init_db():
             )
         """)
 
+        # Periodic data stored in time-ranged chunks (replaces periodic_data blobs)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS periodic_chunks (
+                piece_id TEXT REFERENCES pieces(id) ON DELETE CASCADE,
+                chunk_index INTEGER NOT NULL,
+                start_ms INTEGER,
+                end_ms INTEGER,
+                sample_count INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (piece_id, chunk_index)
+            )
+        """)
+
+        # Per-stroke force/angle curves kept when periodic data is compacted (see retention.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stroke_curves (
+                piece_id TEXT PRIMARY KEY REFERENCES pieces(id) ON DELETE CASCADE,
+                stroke_count INTEGER NOT NULL,
+                grid_points INTEGER NOT NULL,
+                force BLOB NOT NULL,
+                angle BLOB NOT NULL
+            )
+        """)
+
+        # Running per-seat metric sums after each stroke, for range statistics (see stroke_ranges.py)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'stroke_prefix_sums'")
+        prefix_sums_missing = cursor.fetchone() is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stroke_prefix_sums (
+                piece_id TEXT PRIMARY KEY REFERENCES pieces(id) ON DELETE CASCADE,
+                stroke_count INTEGER NOT NULL,
+                channels INTEGER NOT NULL,
+                stroke_numbers BLOB NOT NULL,
+                sums BLOB NOT NULL
+            )
+        """)
+
+        # Per-stroke force-curve shape vectors, one row per piece and seat (see curve_search.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stroke_shape_vectors (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                piece_id TEXT NOT NULL REFERENCES pieces(id) ON DELETE CASCADE,
+                seat_position INTEGER NOT NULL,
+                global_athlete_id TEXT,
+                stroke_numbers BLOB NOT NULL,
+                vectors BLOB NOT NULL,
+                UNIQUE (piece_id, seat_position)
+            )
+        """)
+
+        # Per-seat metric sums for each session, and their totals per athlete and workout type (see rollups.py)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'athlete_session_rollups'")
+        rollups_missing = cursor.fetchone() is None
+        metric_columns = ''.join(f"{metric}_sum REAL NOT NULL DEFAULT 0, {metric}_n INTEGER NOT NULL DEFAULT 0, "
+                                 for metric in ROLLUP_METRICS)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS athlete_session_rollups (
+                session_id TEXT REFERENCES sessions(id) ON DELETE CASCADE,
+                seat_position INTEGER NOT NULL,
+                global_athlete_id TEXT NOT NULL,
+                session_date TEXT,
+                workout_type TEXT NOT NULL DEFAULT '',
+                strokes INTEGER NOT NULL,
+                {metric_columns}
+                PRIMARY KEY (session_id, seat_position)
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS athlete_rollups (
+                global_athlete_id TEXT NOT NULL,
+                workout_type TEXT NOT NULL,
+                sessions INTEGER NOT NULL,
+                strokes INTEGER NOT NULL,
+                first_session_date TEXT,
+                last_session_date TEXT,
+                {metric_columns}
+                PRIMARY KEY (global_athlete_id, workout_type)
+            )
+        """)
+
         # Video sessions table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS video_sessions (
@@ -136,6 +308,55 @@ def init_db():
             )
         """)
 
+        # Per-video telemetry resampled to frames (see alignment.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS video_alignment_tracks (
+                video_id TEXT PRIMARY KEY REFERENCES video_sessions(id) ON DELETE CASCADE,
+                piece_id TEXT NOT NULL,
+                offset_ms INTEGER NOT NULL,
+                fps REAL NOT NULL,
+                data BLOB NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # In-progress resumable video uploads
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS video_uploads (
+                id TEXT PRIMARY KEY,
+                session_id TEXT REFERENCES sessions(id) ON DELETE CASCADE,
+                piece_id TEXT,
+                original_filename TEXT NOT NULL,
+                total_bytes INTEGER NOT NULL,
+                received_bytes INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Background ingest jobs
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                session_name TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                stage TEXT,
+                rows_processed INTEGER DEFAULT 0,
+                total_rows INTEGER,
+                bytes INTEGER,
+                attempts INTEGER DEFAULT 0,
+                error TEXT,
+                session_id TEXT,
+                result TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                finished_at TEXT,
+                worker_pid INTEGER,
+                worker_token TEXT
+            )
+        """)
+
         # Athlete measurements table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS athlete_measurements (
@@ -166,6 +387,34 @@ def init_db():
         session_columns = [row[1] for row in cursor.fetchall()]
         if 'workout_type' not in session_columns:
             cursor.execute("ALTER TABLE sessions ADD COLUMN workout_type TEXT")
+        if 'session_date' not in session_columns:
+            cursor.execute("ALTER TABLE sessions ADD COLUMN session_date TEXT")
+            _backfill_session_dates(cursor)
+        if 'content_hash' not in session_columns:
+            # sha256 of the source CSV; lets the bulk importer skip files already loaded
+            cursor.execute("ALTER TABLE sessions ADD COLUMN content_hash TEXT")
+
+        # Migrate pieces table: retention tier of the periodic data
+        cursor.execute("PRAGMA table_info(pieces)")
+        piece_columns = [row[1] for row in cursor.fetchall()]
+        if 'periodic_tier' not in piece_columns:
+            cursor.execute("ALTER TABLE pieces ADD COLUMN periodic_tier TEXT NOT NULL DEFAULT 'raw'")
+        if 'compacted_at' not in piece_columns:
+            cursor.execute("ALTER TABLE pieces ADD COLUMN compacted_at TEXT")
+
+        # Migrate video_sessions table: content hash for de-duplicating uploads
+        cursor.execute("PRAGMA table_info(video_sessions)")
+        video_columns = [row[1] for row in cursor.fetchall()]
+        if 'content_hash' not in video_columns:
+            cursor.execute("ALTER TABLE video_sessions ADD COLUMN content_hash TEXT")
+
+        # Migrate ingest_jobs table: owning process, for multi-worker recovery
+        cursor.execute("PRAGMA table_info(ingest_jobs)")
+        job_columns = [row[1] for row in cursor.fetchall()]
+        if 'worker_pid' not in job_columns:
+            cursor.execute("ALTER TABLE ingest_jobs ADD COLUMN worker_pid INTEGER")
+        if 'worker_token' not in job_columns:
+            cursor.execute("ALTER TABLE ingest_jobs ADD COLUMN worker_token TEXT")
 
         # Migrate global_athletes table: add new columns if missing
         cursor.execute("PRAGMA table_info(global_athletes)")
@@ -179,9 +428,20 @@ def init_db():
         for col_name, col_type in new_ga_cols:
             if col_name not in ga_columns:
                 cursor.execute(f"ALTER TABLE global_athletes ADD COLUMN {col_name} {col_type}")
+        if 'name_key' not in ga_columns:
+            # Normalized name (see athlete_identity.normalize_name) so name matches can use an index
+            cursor.execute("ALTER TABLE global_athletes ADD COLUMN name_key TEXT")
+            cursor.execute("SELECT id, name FROM global_athletes")
+            cursor.executemany("UPDATE global_athletes SET name_key = ? WHERE id = ?",
+                               [(normalize_name(row['name']), row['id']) for row in cursor.fetchall()])
+        if 'session_count' not in ga_columns:
+            # Maintained incrementally on upload/delete from here on
+            cursor.execute("ALTER TABLE global_athletes ADD COLUMN session_count INTEGER NOT NULL DEFAULT 0")
+            recount_athlete_sessions(cursor)
 
         # Create video index
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_video_session ON video_sessions(session_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_video_hash ON video_sessions(content_hash)")
 
         # Create indexes
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_athletes_session ON athletes(session_id)")
@@ -190,32 +450,120 @@ def init_db():
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_periodic_piece ON periodic_data(piece_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_athletes_global ON athletes(global_athlete_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_global_athletes_uni ON global_athletes(uni)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_global_athletes_name_key ON global_athletes(name_key)")
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs(status, created_at)")
+
+        # Search indexes
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_date ON sessions(session_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_type_date ON sessions(workout_type, session_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_boat_date ON sessions(boat_name, session_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_hash ON sessions(content_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_athletes_global_session ON athletes(global_athlete_id, session_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_global_athletes_squad ON global_athletes(squad)")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_session_rollups_athlete
+            ON athlete_session_rollups(global_athlete_id, workout_type, session_date, session_id)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_session_rollups_athlete_date
+            ON athlete_session_rollups(global_athlete_id, session_date, session_id)
+        """)
+
+        # Trigram index for fuzzy athlete search (see athlete_search.py), kept in sync by triggers
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'athlete_search'")
+        search_index_missing = cursor.fetchone() is None
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS athlete_search USING fts5(
+                name, uni, content='global_athletes', content_rowid='rowid', tokenize='trigram'
+            )
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS global_athletes_search_insert AFTER INSERT ON global_athletes BEGIN
+                INSERT INTO athlete_search (rowid, name, uni) VALUES (new.rowid, new.name, new.uni);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS global_athletes_search_delete AFTER DELETE ON global_athletes BEGIN
+                INSERT INTO athlete_search (athlete_search, rowid, name, uni) VALUES ('delete', old.rowid, old.name, old.uni);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS global_athletes_search_update AFTER UPDATE OF name, uni ON global_athletes BEGIN
+                INSERT INTO athlete_search (athlete_search, rowid, name, uni) VALUES ('delete', old.rowid, old.name, old.uni);
+                INSERT INTO athlete_search (rowid, name, uni) VALUES (new.rowid, new.name, new.uni);
+            END
+        """)
+        if search_index_missing:
+            # Index athletes created before the triggers existed
+            rebuild_search_index(cursor)
 
         # Backfill: create global athletes for existing session-athletes that lack a link
         _backfill_global_athletes(cursor)
 
+        # Migrate legacy single-blob periodic data into chunks
+        _migrate_periodic_chunks(cursor)
+
+        if prefix_sums_missing:
+            backfill_prefix_sums(cursor)
+
+        if rollups_missing:
+            # Maintained incrementally on upload/retag/delete from here on
+            rebuild_rollups(cursor)
+
 
 def _backfill_global_athletes(cursor):
     """Create global athlete records for session-athletes missing global_athlete_id."""
-    cursor.execute("SELECT * FROM athletes WHERE global_athlete_id IS NULL")
+    cursor.execute("SELECT id, name FROM athletes WHERE global_athlete_id IS NULL")
     orphans = cursor.fetchall()
     if not orphans:
         return
 
     name_map = {}  # normalized_name -> global_athlete_id
+    inserts, links = [], []
     for orphan in orphans:
-        norm = ' '.join(orphan['name'].lower().split())
+        norm = normalize_name(orphan['name'])
         if norm not in name_map:
-            gid = str(uuid.uuid4())
-            cursor.execute(
-                "INSERT INTO global_athletes (id, name) VALUES (?, ?)",
-                (gid, orphan['name'])
-            )
-            name_map[norm] = gid
-        cursor.execute(
-            "UPDATE athletes SET global_athlete_id = ? WHERE id = ?",
-            (name_map[norm], orphan['id'])
+            name_map[norm] = str(uuid.uuid4())
+            inserts.append((name_map[norm], orphan['name'], norm))
+        links.append((name_map[norm], orphan['id']))
+    cursor.executemany("INSERT INTO global_athletes (id, name, name_key) VALUES (?, ?, ?)", inserts)
+    cursor.executemany("UPDATE athletes SET global_athlete_id = ? WHERE id = ?", links)
+    recount_athlete_sessions(cursor, [athlete_id for athlete_id, _, _ in inserts])
+
+
+def _backfill_session_dates(cursor):
+    """Derive ISO session_date from the raw Peach start_time."""
+    cursor.execute("SELECT id, start_time FROM sessions")
+    for row in cursor.fetchall():
+        cursor.execute("UPDATE sessions SET session_date = ? WHERE id = ?",
+                       (parse_session_date(row['start_time']), row['id']))
+
+
+def recount_athlete_sessions(cursor, athlete_ids=None):
+    """Recompute global_athletes.session_count (for all athletes, or the given ids)."""
+    query = """
+        UPDATE global_athletes SET session_count = (
+            SELECT COUNT(DISTINCT a.session_id) FROM athletes a
+            WHERE a.global_athlete_id = global_athletes.id
         )
+    """
+    if athlete_ids is None:
+        cursor.execute(query)
+    else:
+        cursor.executemany(query + " WHERE id = ?", [(aid,) for aid in athlete_ids])
+
+
+def _migrate_periodic_chunks(cursor):
+    """Split legacy periodic_data blobs into periodic_chunks, then drop the blob."""
+    cursor.execute("SELECT id, piece_id FROM periodic_data")
+    legacy = cursor.fetchall()
+    for row in legacy:
+        cursor.execute("SELECT data FROM periodic_data WHERE id = ?", (row['id'],))
+        points = json.loads(cursor.fetchone()['data'])
+        cursor.execute("DELETE FROM periodic_chunks WHERE piece_id = ?", (row['piece_id'],))
+        write_periodic(cursor, row['piece_id'], points)
+        cursor.execute("DELETE FROM periodic_data WHERE id = ?", (row['id'],))
 
 
 # Initialize database on import
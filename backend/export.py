@@ -0,0 +1,228 @@
+"""
+Columnar export of stroke and periodic telemetry.
+
+Streams every piece in a scope (one session, one athlete's sessions, a
+date range, or everything) as Parquet or an Arrow IPC stream, so analysis
+notebooks can load a season with `pd.read_parquet` instead of re-parsing
+CSVs. Per-seat arrays become typed columns (`swivel_power_1` ...
+`swivel_power_8`, `gate_force_x_1` ...), and every row carries its
+session and piece so exports from several sessions concatenate cleanly.
+
+Rows are buffered up to ROW_GROUP_SIZE and written as one row group, and
+the bytes produced are yielded after each group. Server memory is bounded
+by a row group, not by the size of the export.
+"""
+
+import datetime
+from itertools import zip_longest
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from periodic_store import iter_periodic_chunks
+
+SEATS = 8
+
+ROW_GROUP_SIZE = 65_536
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+EXPORT_DATASETS = ('strokes', 'periodic')
+
+STROKE_SCALAR_FIELDS = [
+    ('stroke_number', pa.int32()), ('time_ms', pa.int64()), ('rating', pa.float64()),
+    ('avg_boat_speed', pa.float64()), ('distance_per_stroke', pa.float64()), ('average_power', pa.float64()),
+]
+STROKE_SEAT_FIELDS = [
+    'swivel_power', 'min_angle', 'max_angle', 'catch_slip', 'finish_slip', 'drive_time',
+    'recovery_time', 'work_pc_q1', 'work_pc_q2', 'work_pc_q3', 'work_pc_q4',
+]
+
+# 50 Hz channels are stored as float32: the CSVs carry 2-3 decimals
+PERIODIC_SCALAR_FIELDS = [
+    ('time_ms', pa.int64()), ('normalized_time', pa.float32()), ('speed', pa.float32()),
+    ('distance', pa.float32()), ('accel', pa.float32()),
+]
+PERIODIC_SEAT_FIELDS = ['gate_angle', 'gate_force_x', 'gate_angle_vel']
+
+META_FIELDS = [
+    ('session_id', pa.string()), ('session_name', pa.string()), ('session_date', pa.date32()),
+    ('boat_name', pa.string()), ('piece_id', pa.string()), ('piece_number', pa.int32()),
+]
+
+_EMPTY_SEATS = [None] * SEATS
+
+
+def _schema(dataset: str, with_athlete_seat: bool) -> pa.Schema:
+    if dataset == 'strokes':
+        scalars, seat_fields, seat_type = STROKE_SCALAR_FIELDS, STROKE_SEAT_FIELDS, pa.float64()
+    else:
+        scalars, seat_fields, seat_type = PERIODIC_SCALAR_FIELDS, PERIODIC_SEAT_FIELDS, pa.float32()
+    fields = list(META_FIELDS)
+    if with_athlete_seat:
+        fields.append(('athlete_seat', pa.int8()))
+    fields.extend(scalars)
+    fields.extend((f"{name}_{seat}", seat_type) for name in seat_fields for seat in range(1, SEATS + 1))
+    return pa.schema(fields)
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime.date]:
+    try:
+        return datetime.date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def find_export_pieces(
+    cursor,
+    session_id: Optional[str] = None,
+    athlete_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Pieces in scope, oldest session first, with the session columns each row carries."""
+    clauses, params = [], []
+    athlete_join = ""
+    athlete_col = ""
+    if athlete_id:
+        athlete_join = "JOIN athletes a ON a.session_id = s.id AND a.global_athlete_id = ?"
+        athlete_col = ", a.seat_position AS athlete_seat"
+        params.append(athlete_id)
+    if session_id:
+        clauses.append("s.id = ?")
+        params.append(session_id)
+    if date_from:
+        clauses.append("s.session_date >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("s.session_date <= ?")
+        params.append(date_to)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cursor.execute(f"""
+        SELECT p.id AS piece_id, p.piece_number, s.id AS session_id, s.name AS session_name,
+               s.session_date, s.boat_name{athlete_col}
+        FROM pieces p
+        JOIN sessions s ON s.id = p.session_id
+        {athlete_join}
+        {where}
+        ORDER BY s.session_date, s.created_at, p.piece_number
+    """, params)
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def _segment(schema: pa.Schema, piece: Dict[str, Any], records: List[Dict[str, Any]],
+             scalars, seat_fields) -> pa.RecordBatch:
+    """One piece's records as a record batch matching the export schema."""
+    n = len(records)
+    columns = []
+    for name, type_ in META_FIELDS:
+        value = _parse_date(piece['session_date']) if name == 'session_date' else piece[name]
+        columns.append(pa.repeat(pa.scalar(value, type_), n))
+    if 'athlete_seat' in schema.names:
+        columns.append(pa.repeat(pa.scalar(piece['athlete_seat'], pa.int8()), n))
+    for name, type_ in scalars:
+        columns.append(pa.array([r.get(name) for r in records], type=type_))
+    seat_type = schema.field(f"{seat_fields[0]}_1").type
+    for name in seat_fields:
+        # Transpose per-row seat arrays into per-seat columns; zip_longest pads short rows with None
+        by_seat = list(zip_longest(*(r.get(name) or _EMPTY_SEATS for r in records)))[:SEATS]
+        by_seat += [(None,) * n] * (SEATS - len(by_seat))
+        for values in by_seat:
+            columns.append(pa.array(values, type=seat_type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def _iter_segments(cursor, dataset: str, schema: pa.Schema, pieces: List[Dict[str, Any]]) -> Iterator[pa.RecordBatch]:
+    for piece in pieces:
+        if dataset == 'strokes':
+            cursor.execute("SELECT * FROM stroke_metrics WHERE piece_id = ? ORDER BY stroke_number",
+                           (piece['piece_id'],))
+            records = []
+            for row in cursor.fetchall():
+                record = dict(row)
+                for field in STROKE_SEAT_FIELDS:
+                    record[field] = orjson.loads(record[field]) if record[field] else None
+                records.append(record)
+            if records:
+                yield _segment(schema, piece, records, STROKE_SCALAR_FIELDS, STROKE_SEAT_FIELDS)
+        else:
+            for chunk in iter_periodic_chunks(cursor, piece['piece_id']):
+                yield _segment(schema, piece, chunk, PERIODIC_SCALAR_FIELDS, PERIODIC_SEAT_FIELDS)
+
+
+class _BufferSink:
+    """File-like target whose written bytes the generator drains after each row group."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def iter_export(
+    cursor,
+    dataset: str,
+    fmt: str,
+    pieces: List[Dict[str, Any]],
+    with_athlete_seat: bool = False,
+    row_group_size: int = ROW_GROUP_SIZE,
+) -> Iterator[bytes]:
+    """Yield the bytes of a Parquet file or Arrow IPC stream covering `pieces`."""
+    schema = _schema(dataset, with_athlete_seat)
+    sink = _BufferSink()
+    out = pa.PythonFile(sink, mode='w')
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(out, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_stream(out, schema)
+
+    def write_group(table):
+        table = table.combine_chunks()
+        if fmt == 'parquet':
+            writer.write_table(table, row_group_size=row_group_size)
+        else:
+            for batch in table.to_batches():
+                writer.write_batch(batch)
+
+    pending, pending_rows = [], 0
+    for segment in _iter_segments(cursor, dataset, schema, pieces):
+        pending.append(segment)
+        pending_rows += segment.num_rows
+        if pending_rows >= row_group_size:
+            # Write whole row groups and carry the remainder into the next one
+            table = pa.Table.from_batches(pending, schema=schema)
+            full = pending_rows - pending_rows % row_group_size
+            write_group(table.slice(0, full))
+            pending = table.slice(full).to_batches()
+            pending_rows -= full
+            yield sink.drain()
+    if pending_rows:
+        write_group(pa.Table.from_batches(pending, schema=schema))
+    writer.close()
+    yield sink.drain()
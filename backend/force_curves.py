@@ -0,0 +1,259 @@
+"""
+Ensemble-average force curves.
+
+Each stroke's periodic data is resampled onto a fixed grid, then the mean
+and spread are computed per seat across strokes. Two views are produced:
+gate force vs. normalized stroke time, and gate force vs. gate angle over
+the drive.
+
+Pieces whose periodic data has been compacted (see retention.py) keep
+their per-stroke force and angle curves in the stroke_curves table, and
+the ensemble is computed from those instead.
+"""
+
+import warnings
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache import LRUCache
+
+# Resolution used to locate catch/finish inside each stroke before the
+# drive is resampled onto the angle grid
+DRIVE_SEARCH_POINTS = 200
+
+# Normalized-time resolution of the per-stroke curves kept for compacted pieces
+STORED_CURVE_POINTS = 100
+
+ensemble_cache = LRUCache("force_curve_ensemble", maxsize=256)
+
+
+def stroke_windows(stroke_times: Sequence[int]) -> np.ndarray:
+    """
+    Return (start_ms, end_ms) per stroke, where a stroke runs until the next
+    one starts. The last stroke uses the median stroke duration.
+    """
+    times = np.asarray(stroke_times, dtype=float)
+    if len(times) == 0:
+        return np.empty((0, 2))
+    durations = np.diff(times)
+    last = np.median(durations) if len(durations) else 2000.0
+    ends = np.append(times[1:], times[-1] + last)
+    return np.column_stack([times, ends])
+
+
+def periodic_matrix(points: List[Dict[str, Any]], key: str, seats: int = 8) -> np.ndarray:
+    """Stack a per-seat periodic channel into a (samples, seats) float array with NaN gaps."""
+    out = np.full((len(points), seats), np.nan)
+    for i, point in enumerate(points):
+        values = point.get(key) or []
+        for s, v in enumerate(values[:seats]):
+            if v is not None:
+                out[i, s] = v
+    return out
+
+
+def resample_strokes(times: np.ndarray, values: np.ndarray, windows: np.ndarray, points: int) -> np.ndarray:
+    """
+    Resample a channel onto `points` evenly spaced normalized-time positions
+    for every stroke window at once.
+
+    Args:
+        times: (samples,) sample timestamps in ms, ascending
+        values: (samples, seats) channel values
+        windows: (strokes, 2) start/end ms
+        points: grid size
+
+    Returns:
+        (strokes, points, seats) array
+    """
+    grid = np.linspace(0.0, 1.0, points, endpoint=False)
+    targets = windows[:, :1] + (windows[:, 1:] - windows[:, :1]) * grid  # (strokes, points)
+    flat = targets.ravel()
+    out = np.empty((len(windows), points, values.shape[1]))
+    for s in range(values.shape[1]):
+        column = values[:, s]
+        valid = ~np.isnan(column)
+        if valid.sum() < 2:
+            out[:, :, s] = np.nan
+            continue
+        resampled = np.interp(flat, times[valid], column[valid], left=np.nan, right=np.nan)
+        out[:, :, s] = resampled.reshape(targets.shape)
+    return out
+
+
+def _drive_vs_angle(angle: np.ndarray, force: np.ndarray, angle_grid: np.ndarray) -> np.ndarray:
+    """Resample one stroke's drive (catch -> finish) onto an angle grid."""
+    if np.isnan(angle).all():
+        return np.full(len(angle_grid), np.nan)
+    catch = int(np.nanargmin(angle))
+    finish = catch + int(np.nanargmax(angle[catch:]))
+    if finish - catch < 2:
+        return np.full(len(angle_grid), np.nan)
+    drive_angle = angle[catch:finish + 1]
+    drive_force = force[catch:finish + 1]
+    valid = ~(np.isnan(drive_angle) | np.isnan(drive_force))
+    if valid.sum() < 2:
+        return np.full(len(angle_grid), np.nan)
+    # Handle jitter so np.interp sees a monotonic x axis
+    xs = np.maximum.accumulate(drive_angle[valid])
+    return np.interp(angle_grid, xs, drive_force[valid], left=np.nan, right=np.nan)
+
+
+def _round_list(arr: np.ndarray, digits: int = 2) -> List[Optional[float]]:
+    return [None if np.isnan(v) else round(float(v), digits) for v in arr]
+
+
+def _empty_curves(seats: Sequence[int]) -> List[Dict[str, Any]]:
+    return [{'seat_position': seat, 'strokes_used': 0, 'normalized_time': None, 'gate_angle': None}
+            for seat in seats]
+
+
+def stroke_curves(
+    points: List[Dict[str, Any]],
+    stroke_times: Sequence[int],
+    grid_points: int = STORED_CURVE_POINTS,
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Per-stroke gate force and gate angle on a normalized-time grid.
+
+    Returns (force, angle), each (strokes, grid_points, seats), or None when
+    there is not enough periodic data.
+    """
+    timed = [p for p in points if p.get('time_ms') is not None]
+    windows = stroke_windows(stroke_times)
+    if len(timed) < 2 or len(windows) == 0:
+        return None
+    times = np.array([p['time_ms'] for p in timed], dtype=float)
+    force = resample_strokes(times, periodic_matrix(timed, 'gate_force_x'), windows, grid_points)
+    angle = resample_strokes(times, periodic_matrix(timed, 'gate_angle'), windows, grid_points)
+    return force, angle
+
+
+def pack_curves(curves: np.ndarray) -> bytes:
+    """Serialize a (strokes, points, seats) curve array for the stroke_curves table."""
+    return zlib.compress(curves.astype('<f4').tobytes())
+
+
+def unpack_curves(data: bytes, stroke_count: int, grid_points: int) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(data), dtype='<f4').astype(float).reshape(stroke_count, grid_points, -1)
+
+
+def regrid_curves(curves: np.ndarray, points: int) -> np.ndarray:
+    """Linearly resample stored (strokes, grid, seats) curves onto a `points` normalized-time grid."""
+    grid = curves.shape[1]
+    if grid == points:
+        return curves
+    # Both grids start at 0 and exclude 1; positions past the last stored sample hold its value
+    position = np.linspace(0.0, grid, points, endpoint=False)
+    lower = np.minimum(position.astype(int), grid - 1)
+    upper = np.minimum(lower + 1, grid - 1)
+    frac = (position - lower)[None, :, None]
+    return curves[:, lower, :] * (1 - frac) + curves[:, upper, :] * frac
+
+
+def compute_ensemble(
+    points: List[Dict[str, Any]],
+    stroke_times: Sequence[int],
+    seats: Sequence[int],
+    grid_points: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    Compute ensemble-average force curves per seat.
+
+    Args:
+        points: Periodic points covering the strokes (ascending time)
+        stroke_times: time_ms of each stroke in the range
+        seats: 1-based seat positions to compute
+        grid_points: Size of the normalized-time and angle grids
+
+    Returns:
+        One dict per seat with normalized-time and gate-angle curves
+        (mean and standard deviation) plus the number of strokes used.
+    """
+    timed = [p for p in points if p.get('time_ms') is not None]
+    windows = stroke_windows(stroke_times)
+    if len(timed) < 2 or len(windows) == 0:
+        return _empty_curves(seats)
+
+    times = np.array([p['time_ms'] for p in timed], dtype=float)
+    force = periodic_matrix(timed, 'gate_force_x')
+    angle = periodic_matrix(timed, 'gate_angle')
+
+    force_nt = resample_strokes(times, force, windows, grid_points)
+    force_fine = resample_strokes(times, force, windows, DRIVE_SEARCH_POINTS)
+    angle_fine = resample_strokes(times, angle, windows, DRIVE_SEARCH_POINTS)
+    return ensemble_from_curves(force_nt, force_fine, angle_fine, seats, grid_points)
+
+
+def compute_stored_ensemble(
+    force: np.ndarray,
+    angle: np.ndarray,
+    seats: Sequence[int],
+    grid_points: int = 100,
+) -> List[Dict[str, Any]]:
+    """Same as compute_ensemble, from per-stroke curves kept in stroke_curves."""
+    if len(force) == 0:
+        return _empty_curves(seats)
+    return ensemble_from_curves(regrid_curves(force, grid_points), force, angle, seats, grid_points)
+
+
+def ensemble_from_curves(
+    force_nt: np.ndarray,
+    force_fine: np.ndarray,
+    angle_fine: np.ndarray,
+    seats: Sequence[int],
+    grid_points: int,
+) -> List[Dict[str, Any]]:
+    """
+    Mean and spread per seat from per-stroke curves.
+
+    force_nt is on the output grid; force_fine and angle_fine share a finer
+    grid used to locate catch and finish for the angle view.
+    """
+    nt_axis = _round_list(np.linspace(0.0, 100.0, grid_points, endpoint=False))
+
+    results = []
+    for seat in seats:
+        s = seat - 1
+        seat_nt = force_nt[:, :, s]
+        used = ~np.isnan(seat_nt).all(axis=1)
+        if not used.any():
+            results.append({'seat_position': seat, 'strokes_used': 0, 'normalized_time': None, 'gate_angle': None})
+            continue
+
+        # All-NaN grid columns (e.g. no force recorded late in recovery) are expected
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            nt_curve = {
+                'x': nt_axis,
+                'force_mean': _round_list(np.nanmean(seat_nt[used], axis=0)),
+                'force_std': _round_list(np.nanstd(seat_nt[used], axis=0)),
+            }
+
+            # Common angle grid: median catch to median finish angle across strokes
+            seat_angles = angle_fine[used, :, s]
+            seat_force = force_fine[used, :, s]
+            catches = np.nanmin(seat_angles, axis=1)
+            finishes = np.nanmax(seat_angles, axis=1)
+            angle_curve = None
+            if not (np.isnan(catches).all() or np.isnan(finishes).all()):
+                angle_grid = np.linspace(np.nanmedian(catches), np.nanmedian(finishes), grid_points)
+                drives = np.array([
+                    _drive_vs_angle(seat_angles[i], seat_force[i], angle_grid)
+                    for i in range(seat_angles.shape[0])
+                ])
+                angle_curve = {
+                    'x': _round_list(angle_grid),
+                    'force_mean': _round_list(np.nanmean(drives, axis=0)),
+                    'force_std': _round_list(np.nanstd(drives, axis=0)),
+                }
+
+        results.append({
+            'seat_position': seat,
+            'strokes_used': int(used.sum()),
+            'normalized_time': nt_curve,
+            'gate_angle': angle_curve,
+        })
+    return results
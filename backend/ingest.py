@@ -0,0 +1,246 @@
+"""
+Peach CSV ingest.
+
+Turns a parsed Peach CSV into database rows. Parsing and per-row
+extraction (prepare_ingest) are kept separate from the database writes
+(write_ingest) so the CPU-heavy half can run anywhere and the write
+transaction stays short.
+"""
+
+import json
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from athlete_identity import AthleteIdentityMap, resolve_crew
+from csv_parser import (
+    ParsedData, parse_peach_csv, extract_stroke_arrays, extract_periodic_arrays,
+    get_athlete_side, parse_session_date
+)
+from curve_search import piece_shape_vectors, vector_rows, write_shape_vectors
+from metrics import Counter, Histogram
+from models import Athlete, UploadResponse
+from periodic_store import write_periodic
+from rollups import record_session
+from stroke_ranges import write_prefix_sums
+from timing import phase
+
+# progress(stage, rows_processed, total_rows)
+ProgressCallback = Callable[[str, int, int], None]
+
+# Rows written between progress callbacks
+PROGRESS_BATCH = 1000
+
+INGEST_ROWS = Counter('peach_ingest_rows_total', 'Stroke and periodic rows ingested.', ['kind'])
+INGEST_BYTES = Counter('peach_ingest_bytes_total', 'CSV bytes ingested.')
+INGEST_SECONDS = Histogram(
+    'peach_ingest_duration_seconds', 'Time per ingest stage.', ['stage'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+INGEST_ROWS_PER_SECOND = Histogram(
+    'peach_ingest_rows_per_second', 'End-to-end throughput of each ingest in rows/s.',
+    buckets=(1e3, 5e3, 1e4, 2.5e4, 5e4, 1e5, 2.5e5, 5e5, 1e6),
+)
+INGEST_BYTES_PER_SECOND = Histogram(
+    'peach_ingest_bytes_per_second', 'End-to-end throughput of each ingest in bytes/s.',
+    buckets=(1e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7, 5e7, 1e8),
+)
+
+
+@dataclass
+class PreparedIngest:
+    """A parsed CSV with stroke and periodic rows already extracted."""
+    filename: str
+    session_name: Optional[str]
+    parsed: ParsedData
+    strokes: List[Dict[str, Any]]
+    periodic: List[Dict[str, Any]]
+    # CSV text length (the files are ASCII) and parse + extract time, for metrics
+    size_bytes: int = 0
+    prepare_seconds: float = 0.0
+    # sha256 of the uploaded bytes, stored on the session
+    content_hash: Optional[str] = None
+    # (stroke_numbers, per-seat force-curve shape vectors), see curve_search.py
+    shape_vectors: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def total_rows(self) -> int:
+        return len(self.strokes) + len(self.periodic)
+
+
+def prepare_ingest(content_str: str, filename: str, session_name: Optional[str] = None,
+                   content_hash: Optional[str] = None) -> PreparedIngest:
+    """Parse CSV content and extract per-seat arrays. Does not touch the database."""
+    start = time.perf_counter()
+    with phase('parse'):
+        parsed = parse_peach_csv(content_str)
+    with phase('extract'):
+        strokes = [s for s in (extract_stroke_arrays(row) for row in parsed.stroke_metrics)
+                   if s['stroke_number'] is not None]
+        periodic = [extract_periodic_arrays(p) for p in parsed.periodic_data]
+    with phase('curves'):
+        shape_vectors = piece_shape_vectors(periodic, strokes)
+    elapsed = time.perf_counter() - start
+    INGEST_SECONDS.observe(elapsed, stage='prepare')
+    return PreparedIngest(
+        filename=filename,
+        session_name=session_name,
+        parsed=parsed,
+        strokes=strokes,
+        periodic=periodic,
+        size_bytes=len(content_str),
+        prepare_seconds=elapsed,
+        content_hash=content_hash,
+        shape_vectors=shape_vectors,
+    )
+
+
+def _record_ingest(prepared: PreparedIngest, write_seconds: float):
+    INGEST_SECONDS.observe(write_seconds, stage='write')
+    INGEST_ROWS.inc(len(prepared.strokes), kind='stroke')
+    INGEST_ROWS.inc(len(prepared.periodic), kind='periodic')
+    INGEST_BYTES.inc(prepared.size_bytes)
+    total = prepared.prepare_seconds + write_seconds
+    if total > 0:
+        INGEST_ROWS_PER_SECOND.observe(prepared.total_rows / total)
+        INGEST_BYTES_PER_SECOND.observe(prepared.size_bytes / total)
+
+
+def _stroke_row(stroke_data, piece_id):
+    return (
+        str(uuid.uuid4()), piece_id, stroke_data['stroke_number'], stroke_data['time_ms'],
+        stroke_data['rating'], stroke_data['avg_boat_speed'],
+        stroke_data['distance_per_stroke'], stroke_data['average_power'],
+        json.dumps(stroke_data['swivel_power']),
+        json.dumps(stroke_data['min_angle']),
+        json.dumps(stroke_data['max_angle']),
+        json.dumps(stroke_data['catch_slip']),
+        json.dumps(stroke_data['finish_slip']),
+        json.dumps(stroke_data['drive_time']),
+        json.dumps(stroke_data['recovery_time']),
+        json.dumps(stroke_data['work_pc_q1']),
+        json.dumps(stroke_data['work_pc_q2']),
+        json.dumps(stroke_data['work_pc_q3']),
+        json.dumps(stroke_data['work_pc_q4']),
+    )
+
+
+def write_ingest(cursor, prepared: PreparedIngest, progress: Optional[ProgressCallback] = None,
+                 identity: Optional[AthleteIdentityMap] = None) -> UploadResponse:
+    """
+    Write a prepared ingest into the database using the caller's cursor.
+
+    The caller owns the transaction; progress is reported per stage and
+    every PROGRESS_BATCH rows. Pass the same identity map to consecutive
+    calls to skip re-resolving athletes already seen.
+    """
+    def report(stage, done):
+        if progress:
+            progress(stage, done, prepared.total_rows)
+
+    parsed = prepared.parsed
+    start = time.perf_counter()
+
+    # Generate IDs
+    session_id = str(uuid.uuid4())
+    piece_id = str(uuid.uuid4())
+
+    # Extract session info
+    name = prepared.session_name or parsed.file_info.get('Session', 'Unknown Session')
+    filename = parsed.file_info.get('Filename', prepared.filename)
+    serial_number = parsed.file_info.get('Serial #', '')
+    start_time = parsed.file_info.get('Start Time', '')
+    session_date = parse_session_date(start_time)
+    boat_name = parsed.file_info.get('Boat', '').strip() or None
+
+    # Insert session
+    report('athletes', 0)
+    cursor.execute("""
+        INSERT INTO sessions (id, name, filename, serial_number, start_time, session_date, boat_name, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (session_id, name, filename, serial_number, start_time, session_date, boat_name, prepared.content_hash))
+
+    # Insert athletes with global athlete linking, resolving the whole crew at once
+    seated = [m for m in parsed.crew if m.get('Position', '').isdigit()]
+    resolved = resolve_crew(cursor, [(m, m.get('Name', 'Unknown')) for m in seated], identity)
+    athletes = []
+    for crew_member, (global_athlete_id, uni) in zip(seated, resolved):
+        position = crew_member['Position']
+        athletes.append(Athlete(
+            id=str(uuid.uuid4()),
+            session_id=session_id,
+            seat_position=int(position),
+            name=crew_member.get('Name', 'Unknown'),
+            side=get_athlete_side(parsed.crew, parsed.rig_info, position),
+            global_athlete_id=global_athlete_id,
+            uni=uni
+        ))
+    cursor.executemany("""
+        INSERT INTO athletes (id, session_id, seat_position, name, side, global_athlete_id, uni)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(a.id, a.session_id, a.seat_position, a.name, a.side, a.global_athlete_id, a.uni) for a in athletes])
+
+    # Keep per-athlete session counts current without a COUNT(DISTINCT) join on reads
+    cursor.executemany(
+        "UPDATE global_athletes SET session_count = session_count + 1 WHERE id = ?",
+        [(gid,) for gid in {a.global_athlete_id for a in athletes}]
+    )
+
+    # Insert piece
+    piece_info = parsed.piece_info
+    cursor.execute("""
+        INSERT INTO pieces (id, session_id, piece_number, name, start_time_ms, end_time_ms, duration, distance_meters, avg_rating, pace)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        piece_id,
+        session_id,
+        1,
+        piece_info.get('#', ''),
+        int(piece_info.get('Start', 0)) if piece_info.get('Start') else None,
+        int(piece_info.get('End', 0)) if piece_info.get('End') else None,
+        piece_info.get('Duration', ''),
+        float(piece_info.get('Distance', 0)) if piece_info.get('Distance') else None,
+        float(piece_info.get('Rating', 0)) if piece_info.get('Rating') else None,
+        piece_info.get('Pace', '')
+    ))
+
+    # Insert stroke metrics in batches
+    report('strokes', 0)
+    for offset in range(0, len(prepared.strokes), PROGRESS_BATCH):
+        batch = prepared.strokes[offset:offset + PROGRESS_BATCH]
+        cursor.executemany("""
+            INSERT INTO stroke_metrics (
+                id, piece_id, stroke_number, time_ms, rating, avg_boat_speed,
+                distance_per_stroke, average_power, swivel_power, min_angle,
+                max_angle, catch_slip, finish_slip, drive_time, recovery_time,
+                work_pc_q1, work_pc_q2, work_pc_q3, work_pc_q4
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [_stroke_row(s, piece_id) for s in batch])
+        report('strokes', offset + len(batch))
+
+    write_prefix_sums(cursor, piece_id, prepared.strokes)
+
+    # Insert periodic data as time-ranged chunks
+    report('periodic', len(prepared.strokes))
+    write_periodic(cursor, piece_id, prepared.periodic)
+    report('periodic', prepared.total_rows)
+    if prepared.shape_vectors is not None:
+        write_shape_vectors(cursor, vector_rows(
+            piece_id, [(a.global_athlete_id, a.seat_position) for a in athletes], *prepared.shape_vectors
+        ))
+
+    # Leaderboard sums for each rower; the workout type is set later, when the session is tagged
+    record_session(cursor, session_id, session_date, None,
+                   [(a.global_athlete_id, a.seat_position) for a in athletes], prepared.strokes)
+    _record_ingest(prepared, time.perf_counter() - start)
+
+    return UploadResponse(
+        session_id=session_id,
+        session_name=name,
+        pieces_created=1,
+        stroke_count=len(prepared.strokes),
+        athletes=athletes
+    )
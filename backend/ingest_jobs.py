@@ -0,0 +1,286 @@
+"""
+Background ingest jobs.
+
+Uploaded CSVs are saved to UPLOADS_DIR and processed by a bounded worker
+pool, so the upload request returns as soon as the bytes are on disk.
+Job state lives in the ingest_jobs table. While a job runs, its stage and
+row progress are published to a small file next to its payload, outside
+the write transaction, so a status poll served by any worker sees it
+without waiting on the ingest.
+
+With several uvicorn workers each runs its own pool. Jobs are claimed
+with a conditional UPDATE so only one worker runs each, the write goes
+through the shared single-writer lock, and a restarting worker only
+requeues running jobs whose owning process has exited. Each process
+holds an flock on a lock file named by a random token for as long as it
+lives; a job's owner is gone once that lock can be taken. Unlike a PID,
+the token is never reused by a restarted server.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: assume a single worker process
+    fcntl = None
+
+from database import get_db, write_db
+from ingest import prepare_ingest, write_ingest
+from metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIR = Path(__file__).parent / "uploads"
+UPLOADS_DIR.mkdir(exist_ok=True)
+
+INGEST_WORKERS = int(os.environ.get("PEACH_INGEST_WORKERS", "2"))
+
+# Identifies this process as a job owner; held locked in _owner_lock until exit
+WORKER_TOKEN = uuid.uuid4().hex
+_owner_lock = None
+
+
+def _owner_lock_path(token: str) -> Path:
+    return UPLOADS_DIR / f"worker-{token}.lock"
+
+
+def _hold_owner_lock():
+    global _owner_lock
+    if _owner_lock is None and fcntl is not None:
+        _owner_lock = open(_owner_lock_path(WORKER_TOKEN), 'a')
+        fcntl.flock(_owner_lock, fcntl.LOCK_EX)
+
+
+def _owner_alive(token: Optional[str]) -> bool:
+    """Whether the process that claimed a job with this token is still running."""
+    if token == WORKER_TOKEN:
+        return True
+    if not token or fcntl is None:
+        return False
+    path = _owner_lock_path(token)
+    try:
+        lock_file = open(path, 'r')
+    except FileNotFoundError:
+        return False
+    with lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        # The owner exited and released its lock
+        path.unlink(missing_ok=True)
+        return False
+
+
+def _job_dict(row) -> Dict[str, Any]:
+    job = dict(row)
+    job['result'] = json.loads(job['result']) if job.get('result') else None
+    if job['status'] == 'running':
+        job.update(_read_progress(job['id']))
+    return job
+
+
+def progress_path(job_id: str) -> Path:
+    return UPLOADS_DIR / f"{job_id}.progress.json"
+
+
+def _write_progress(job_id: str, progress: Dict[str, Any]):
+    # Write then rename, so readers never see a partial file
+    path = progress_path(job_id)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_text(json.dumps(progress))
+        os.replace(tmp, path)
+    except OSError:
+        # Progress is informational; never fail the ingest over it
+        logger.warning("Could not publish progress for ingest job %s", job_id, exc_info=True)
+
+
+def _read_progress(job_id: str) -> Dict[str, Any]:
+    try:
+        return json.loads(progress_path(job_id).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+class IngestJobQueue:
+    """Runs ingest jobs on a fixed-size thread pool."""
+
+    def __init__(self, max_workers: int = INGEST_WORKERS):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Progress of jobs running in this process, for the pool gauge
+        self._live: Dict[str, Dict[str, Any]] = {}
+        # Jobs submitted to the pool and not yet finished
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker pool and requeue jobs interrupted by a restart."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingest")
+        _hold_owner_lock()
+        # Drop lock files left by exited processes
+        for path in UPLOADS_DIR.glob("worker-*.lock"):
+            _owner_alive(path.stem[len("worker-"):])
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, worker_token FROM ingest_jobs WHERE status = 'running'")
+            orphaned = [(row['id'], row['worker_token']) for row in cursor.fetchall()
+                        if not _owner_alive(row['worker_token'])]
+            cursor.executemany("""
+                UPDATE ingest_jobs SET status = 'queued', stage = 'queued', worker_pid = NULL, worker_token = NULL
+                WHERE id = ? AND status = 'running' AND worker_token IS ?
+            """, orphaned)
+            cursor.execute("SELECT id FROM ingest_jobs WHERE status = 'queued' ORDER BY created_at")
+            pending = [row['id'] for row in cursor.fetchall()]
+        for job_id in pending:
+            self._submit(job_id)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def payload_path(job_id: str) -> Path:
+        return UPLOADS_DIR / f"{job_id}.csv"
+
+    @property
+    def active_count(self) -> int:
+        with self._lock:
+            return len(self._live)
+
+    def counts(self) -> Dict[str, int]:
+        """Jobs waiting for a worker and jobs being processed."""
+        with self._lock:
+            return {'queued': self._pending - len(self._live), 'running': len(self._live)}
+
+    def _submit(self, job_id: str):
+        with self._lock:
+            self._pending += 1
+        self._executor.submit(self._run, job_id)
+
+    def enqueue(self, job_id: str, filename: str, session_name: Optional[str], size: int) -> Dict[str, Any]:
+        """Record a job whose payload is already saved, and schedule it."""
+        with write_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO ingest_jobs (id, filename, session_name, status, stage, bytes)
+                VALUES (?, ?, ?, 'queued', 'queued', ?)
+            """, (job_id, filename, session_name, size))
+        self._submit(job_id)
+        return self.get(job_id)
+
+    def retry(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Reset a failed job and run it again from the saved payload.
+        Returns None if the job is no longer failed (e.g. a concurrent retry won).
+        """
+        with write_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE ingest_jobs
+                SET status = 'queued', stage = 'queued', error = NULL,
+                    rows_processed = 0, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'failed'
+            """, (job_id,))
+            if cursor.rowcount == 0:
+                return None
+        self._submit(job_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+        if not row:
+            return None
+        return _job_dict(row)
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM ingest_jobs ORDER BY created_at DESC LIMIT ?", (limit,))
+            return [_job_dict(row) for row in cursor.fetchall()]
+
+    def _set_live(self, job_id: str, stage: str, rows_processed: int, total_rows: Optional[int]):
+        progress = {'stage': stage, 'rows_processed': rows_processed, 'total_rows': total_rows}
+        with self._lock:
+            self._live[job_id] = progress
+        _write_progress(job_id, progress)
+
+    def _run(self, job_id: str):
+        try:
+            self._process(job_id)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _process(self, job_id: str):
+        with get_db() as conn:
+            cursor = conn.cursor()
+            # Claim atomically: another worker may have queued the same job
+            cursor.execute("""
+                UPDATE ingest_jobs
+                SET status = 'running', stage = 'parsing', attempts = attempts + 1,
+                    worker_pid = ?, worker_token = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'queued'
+            """, (os.getpid(), WORKER_TOKEN, job_id))
+            if cursor.rowcount == 0:
+                return
+            cursor.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,))
+            job = cursor.fetchone()
+
+        self._set_live(job_id, 'parsing', 0, None)
+        try:
+            payload = self.payload_path(job_id).read_bytes()
+            prepared = prepare_ingest(payload.decode('utf-8'), job['filename'], job['session_name'],
+                                      content_hash=hashlib.sha256(payload).hexdigest())
+            self._set_live(job_id, 'writing', 0, prepared.total_rows)
+
+            # The rows and the job's success are committed together
+            with write_db() as conn:
+                result = write_ingest(
+                    conn.cursor(), prepared,
+                    progress=lambda stage, done, total: self._set_live(job_id, stage, done, total)
+                )
+                conn.cursor().execute("""
+                    UPDATE ingest_jobs
+                    SET status = 'succeeded', stage = 'done', rows_processed = ?, total_rows = ?,
+                        session_id = ?, result = ?, updated_at = CURRENT_TIMESTAMP,
+                        finished_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (prepared.total_rows, prepared.total_rows, result.session_id,
+                      result.model_dump_json(), job_id))
+            self.payload_path(job_id).unlink(missing_ok=True)
+        except Exception as exc:
+            logger.exception("Ingest job %s failed", job_id)
+            with self._lock:
+                failed_stage = self._live.get(job_id, {}).get('stage')
+            with get_db() as conn:
+                conn.cursor().execute("""
+                    UPDATE ingest_jobs
+                    SET status = 'failed', stage = ?, error = ?, updated_at = CURRENT_TIMESTAMP,
+                        finished_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (failed_stage, f"{type(exc).__name__}: {exc}", job_id))
+        finally:
+            with self._lock:
+                self._live.pop(job_id, None)
+            progress_path(job_id).unlink(missing_ok=True)
+
+
+ingest_queue = IngestJobQueue()
+
+Gauge('peach_ingest_jobs', 'Ingest jobs by state.', ['status'],
+      collect=lambda: {(status,): n for status, n in ingest_queue.counts().items()})
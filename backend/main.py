@@ -6,34 +6,54 @@ FastAPI application for uploading, storing, and retrieving rowing telemetry data
 
 import uuid
 import json
+import hashlib
 import shutil
-from pathlib import Path
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+import orjson
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request, Response, WebSocket
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from typing import List, Optional
 
-from database import get_db, init_db
+from alignment import DEFAULT_FPS, build_alignment_track, load_cached_track, store_track
+from athlete_identity import normalize_name
+from athlete_search import find_duplicate_candidates, search_athletes
+from compression import CompressionMiddleware
+from curve_search import find_similar_athletes, find_similar_strokes
+from database import get_connection, get_db, init_db, write_db
+from export import EXPORT_DATASETS, EXPORT_FORMATS, find_export_pieces, iter_export
 from models import (
     Session, SessionWithDetails, SessionUpdate, Athlete, Piece, StrokeMetric,
-    UploadResponse, PieceAverages, AthleteAverage, PeriodicDataPoint,
-    GlobalAthlete, GlobalAthleteUpdate, GlobalAthleteDetail,
-    AthleteSessionEntry, AthleteTrendPoint, AthleteTrends,
+    UploadResponse, PieceAverages, AthleteAverage, PieceRangeAverages, PeriodicDataPoint,
+    GlobalAthlete, GlobalAthleteUpdate, GlobalAthleteDetail, AthleteSearchResult, DuplicateAthleteCandidate,
+    RosterImportResult,
+    AthleteSessionEntry, AthleteTrendPoint, AthleteTrends, Leaderboard,
     AthleteMeasurements, AthleteMeasurementsUpdate,
-    VideoSession, VideoSessionUpdate
+    VideoSession, VideoSessionUpdate, VideoUpload, VideoUploadCreate, VideoAlignmentTrack,
+    SessionDashboard, PieceEnsembleCurves, SimilarStroke, SimilarAthlete, IngestJob, RequestProfile
 )
-
-VIDEOS_DIR = Path(__file__).parent / "videos"
-VIDEOS_DIR.mkdir(exist_ok=True)
-from csv_parser import (
-    parse_peach_csv, extract_stroke_arrays, extract_periodic_arrays,
-    get_athlete_side, parse_to_float
+from force_curves import compute_ensemble, compute_stored_ensemble, ensemble_cache, unpack_curves
+from ingest import prepare_ingest, write_ingest
+from ingest_jobs import ingest_queue
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS_ENABLED, REGISTRY, MetricsMiddleware
+from periodic_store import TIER_RAW, delete_periodic, has_periodic, iter_periodic_chunks, load_periodic, purge_archived
+from profiling import ADMIN_TOKEN, ProfilingMiddleware, check_admin_token, list_profiles, profile_path
+from replay import REPLAY_SPEEDS, REPLAY_TRACKS, evict_replay_buffers, get_replay_buffer, stream_replay
+from rollups import METRICS as LEADERBOARD_METRICS, delete_session_rollups, leaderboard, retag_session
+from roster_import import import_roster, parse_roster_csv
+from stroke_ranges import range_stats
+from timing import SERVER_TIMING_ENABLED, ORJSONResponse, ServerTimingMiddleware, phase
+from video_streaming import RangeFileResponse
+from video_uploads import (
+    ALLOWED_VIDEO_EXTENSIONS, UPLOAD_CHUNK_SIZE, VIDEOS_DIR, append_chunk, claim, discard_partial,
+    finish_hash, partial_path, release, release_video_file, save_stream, store_video_file, upload_ext
 )
 
 app = FastAPI(
     title="Peach Rowing Telemetry API",
     description="API for rowing telemetry analysis",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Enable CORS for frontend
@@ -45,26 +65,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiate br/gzip for JSON payloads; video files are served as-is
+app.add_middleware(CompressionMiddleware, minimum_size=1024, exclude_paths=[r"/api/videos/[^/]+/file$"])
+
+# Server-Timing breakdown (PEACH_SERVER_TIMING=1); outermost so compression counts toward the total
+if SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
+# Per-route latency histograms and in-flight gauge for /api/metrics (PEACH_METRICS=0 disables)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Requests carrying the admin token in X-Peach-Profile or ?profile= are profiled
+if ADMIN_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
+
+STROKE_ARRAY_FIELDS = [
+    'swivel_power', 'min_angle', 'max_angle', 'catch_slip',
+    'finish_slip', 'drive_time', 'recovery_time',
+    'work_pc_q1', 'work_pc_q2', 'work_pc_q3', 'work_pc_q4',
+]
+
 
 @app.on_event("startup")
 async def startup():
     init_db()
+    ingest_queue.start()
 
 
-def _compute_seat_averages(stroke_rows, seat_idx):
-    """Compute per-seat averages from stroke metric rows. Returns a dict of averages."""
+@app.on_event("shutdown")
+async def shutdown():
+    ingest_queue.shutdown()
+
+
+def _decode_stroke_row(row):
+    """Convert a stroke_metrics row into a plain dict with per-seat arrays decoded.
+
+    DB rows are written by our own ingest path, so bulk endpoints serialize
+    these dicts directly instead of validating a StrokeMetric per row.
+    """
+    row_dict = dict(row)
+    for key in STROKE_ARRAY_FIELDS:
+        if row_dict.get(key):
+            row_dict[key] = json.loads(row_dict[key])
+    return row_dict
+
+
+def _compute_seat_averages(strokes, seat_idx):
+    """Compute per-seat averages from decoded stroke dicts. Returns a dict of averages."""
     powers = []
     stroke_lengths = []
     effective_lengths = []
     catch_slips = []
     finish_slips = []
 
-    for stroke in stroke_rows:
-        swivel_power = json.loads(stroke['swivel_power']) if stroke['swivel_power'] else []
-        min_angle = json.loads(stroke['min_angle']) if stroke['min_angle'] else []
-        max_angle = json.loads(stroke['max_angle']) if stroke['max_angle'] else []
-        catch_slip = json.loads(stroke['catch_slip']) if stroke['catch_slip'] else []
-        finish_slip = json.loads(stroke['finish_slip']) if stroke['finish_slip'] else []
+    for stroke in strokes:
+        swivel_power = stroke['swivel_power'] or []
+        min_angle = stroke['min_angle'] or []
+        max_angle = stroke['max_angle'] or []
+        catch_slip = stroke['catch_slip'] or []
+        finish_slip = stroke['finish_slip'] or []
 
         if seat_idx < len(swivel_power) and swivel_power[seat_idx] is not None:
             powers.append(swivel_power[seat_idx])
@@ -89,66 +149,53 @@ def _compute_seat_averages(stroke_rows, seat_idx):
     }
 
 
-def _resolve_global_athlete(cursor, crew_member, athlete_name):
-    """Find or create a global athlete from crew info. Returns (global_athlete_id, uni)."""
-    uni = crew_member.get('Abbr', '').strip().lower() or crew_member.get('Abbreviation', '').strip().lower()
-    squad = crew_member.get('Squad', '').strip().lower() or None
-    first_name = crew_member.get('First Name', '').strip() or None
-    last_name = crew_member.get('Last Name', '').strip() or None
-    peach_id = crew_member.get('ID', '').strip() or None
-    weight = parse_to_float(crew_member.get('Weight', ''))
-
-    global_athlete_id = None
+def _seat_mean(strokes, key, seat_idx, digits):
+    """Mean of one per-seat metric across decoded strokes, or None."""
+    values = []
+    for stroke in strokes:
+        arr = stroke[key] or []
+        if seat_idx < len(arr) and arr[seat_idx] is not None:
+            values.append(arr[seat_idx])
+    return round(sum(values) / len(values), digits) if values else None
+
+
+def _build_piece_averages(piece_row, athletes_rows, strokes):
+    """Build PieceAverages from a piece row, its session athletes and decoded strokes."""
+    athlete_averages = []
+    seat_powers = []
+
+    for athlete in athletes_rows:
+        seat_idx = athlete['seat_position'] - 1  # 0-indexed
+        avgs = _compute_seat_averages(strokes, seat_idx)
+        if avgs['avg_power']:
+            seat_powers.append(avgs['avg_power'])
+
+        athlete_averages.append(AthleteAverage(
+            seat_position=athlete['seat_position'],
+            name=athlete['name'],
+            avg_drive_time=_seat_mean(strokes, 'drive_time', seat_idx, 4),
+            avg_recovery_time=_seat_mean(strokes, 'recovery_time', seat_idx, 4),
+            **avgs
+        ))
 
-    if uni:
-        # Try to find by UNI
-        cursor.execute("SELECT id FROM global_athletes WHERE uni = ?", (uni,))
-        row = cursor.fetchone()
-        if row:
-            global_athlete_id = row['id']
-            cursor.execute("""
-                UPDATE global_athletes
-                SET squad = COALESCE(?, squad),
-                    weight = COALESCE(?, weight),
-                    name = ?,
-                    first_name = COALESCE(?, first_name),
-                    last_name = COALESCE(?, last_name),
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (squad, weight, athlete_name, first_name, last_name, global_athlete_id))
-        else:
-            global_athlete_id = str(uuid.uuid4())
-            cursor.execute("""
-                INSERT INTO global_athletes (id, uni, name, first_name, last_name, squad, weight, peach_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (global_athlete_id, uni, athlete_name, first_name, last_name, squad, weight, peach_id))
-    else:
-        # No UNI - match by normalized name
-        normalized_name = ' '.join(athlete_name.lower().split())
-        cursor.execute("""
-            SELECT id FROM global_athletes
-            WHERE LOWER(REPLACE(name, '  ', ' ')) = ?
-            AND (uni IS NULL OR uni = '')
-        """, (normalized_name,))
-        row = cursor.fetchone()
-        if row:
-            global_athlete_id = row['id']
-            cursor.execute("""
-                UPDATE global_athletes
-                SET squad = COALESCE(?, squad),
-                    weight = COALESCE(?, weight),
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (squad, weight, global_athlete_id))
-        else:
-            global_athlete_id = str(uuid.uuid4())
-            cursor.execute("""
-                INSERT INTO global_athletes (id, uni, name, first_name, last_name, squad, weight, peach_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (global_athlete_id, None, athlete_name, first_name, last_name, squad, weight, peach_id))
+    # Calculate overall averages
+    ratings = [s['rating'] for s in strokes if s['rating']]
+    speeds = [s['avg_boat_speed'] for s in strokes if s['avg_boat_speed']]
+
+    return PieceAverages(
+        piece_id=piece_row['id'],
+        piece_name=piece_row['name'],
+        total_strokes=len(strokes),
+        avg_rating=round(sum(ratings) / len(ratings), 2) if ratings else None,
+        avg_boat_speed=round(sum(speeds) / len(speeds), 4) if speeds else None,
+        athletes=athlete_averages,
+        crew_avg_power=round(sum(seat_powers) / len(seat_powers), 2) if seat_powers else None
+    )
 
-    return global_athlete_id, uni or None
 
+# Handlers that write, or wait on the writer lock, are plain `def` so FastAPI
+# runs them in the threadpool. Handlers that must await the request body stay
+# async and pass their write to a helper through run_in_threadpool.
 
 # ============ Upload Endpoints ============
 
@@ -161,118 +208,70 @@ async def upload_csv(file: UploadFile = File(...), session_name: Optional[str] =
     content = await file.read()
     content_str = content.decode('utf-8')
 
-    # Parse the CSV
-    parsed = parse_peach_csv(content_str)
+    prepared = prepare_ingest(content_str, file.filename, session_name,
+                              content_hash=hashlib.sha256(content).hexdigest())
+    return await run_in_threadpool(_write_prepared, prepared)
 
-    # Generate IDs
-    session_id = str(uuid.uuid4())
-    piece_id = str(uuid.uuid4())
 
-    # Extract session info
-    name = session_name or parsed.file_info.get('Session', 'Unknown Session')
-    filename = parsed.file_info.get('Filename', file.filename)
-    serial_number = parsed.file_info.get('Serial #', '')
-    start_time = parsed.file_info.get('Start Time', '')
+def _write_prepared(prepared):
+    with write_db() as conn:
+        return write_ingest(conn.cursor(), prepared)
 
-    with get_db() as conn:
-        cursor = conn.cursor()
 
-        # Insert session
-        cursor.execute("""
-            INSERT INTO sessions (id, name, filename, serial_number, start_time)
-            VALUES (?, ?, ?, ?, ?)
-        """, (session_id, name, filename, serial_number, start_time))
-
-        # Insert athletes with global athlete linking
-        athletes = []
-        for crew_member in parsed.crew:
-            position = crew_member.get('Position', '')
-            if position.isdigit():
-                athlete_id = str(uuid.uuid4())
-                athlete_name = crew_member.get('Name', 'Unknown')
-                side = get_athlete_side(parsed.crew, parsed.rig_info, position)
-
-                global_athlete_id, uni = _resolve_global_athlete(cursor, crew_member, athlete_name)
-
-                cursor.execute("""
-                    INSERT INTO athletes (id, session_id, seat_position, name, side, global_athlete_id, uni)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (athlete_id, session_id, int(position), athlete_name, side, global_athlete_id, uni))
-
-                athletes.append(Athlete(
-                    id=athlete_id,
-                    session_id=session_id,
-                    seat_position=int(position),
-                    name=athlete_name,
-                    side=side,
-                    global_athlete_id=global_athlete_id,
-                    uni=uni
-                ))
-
-        # Insert piece
-        piece_info = parsed.piece_info
-        cursor.execute("""
-            INSERT INTO pieces (id, session_id, piece_number, name, start_time_ms, end_time_ms, duration, distance_meters, avg_rating, pace)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            piece_id,
-            session_id,
-            1,
-            piece_info.get('#', ''),
-            int(piece_info.get('Start', 0)) if piece_info.get('Start') else None,
-            int(piece_info.get('End', 0)) if piece_info.get('End') else None,
-            piece_info.get('Duration', ''),
-            float(piece_info.get('Distance', 0)) if piece_info.get('Distance') else None,
-            float(piece_info.get('Rating', 0)) if piece_info.get('Rating') else None,
-            piece_info.get('Pace', '')
-        ))
+# ============ Ingest Job Endpoints ============
+
+def _save_upload(source, path):
+    with open(path, "wb") as f:
+        shutil.copyfileobj(source, f, 1024 * 1024)
+    return path.stat().st_size
+
+
+@app.post("/api/ingest/jobs", response_model=IngestJob, status_code=202)
+async def create_ingest_job(file: UploadFile = File(...), session_name: Optional[str] = Form(None)):
+    """
+    Accept a Peach CSV for background ingest.
+
+    The file is saved and a job id returned immediately; parsing and DB
+    writes run on the ingest worker pool. Poll GET /api/ingest/jobs/{id}
+    for stage and row progress.
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+
+    job_id = str(uuid.uuid4())
+    size = await run_in_threadpool(_save_upload, file.file, ingest_queue.payload_path(job_id))
+    return await run_in_threadpool(ingest_queue.enqueue, job_id, file.filename, session_name, size)
 
-        # Insert stroke metrics
-        stroke_count = 0
-        for stroke in parsed.stroke_metrics:
-            stroke_data = extract_stroke_arrays(stroke)
-            if stroke_data['stroke_number'] is not None:
-                stroke_id = str(uuid.uuid4())
-                cursor.execute("""
-                    INSERT INTO stroke_metrics (
-                        id, piece_id, stroke_number, time_ms, rating, avg_boat_speed,
-                        distance_per_stroke, average_power, swivel_power, min_angle,
-                        max_angle, catch_slip, finish_slip, drive_time, recovery_time,
-                        work_pc_q1, work_pc_q2, work_pc_q3, work_pc_q4
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    stroke_id, piece_id, stroke_data['stroke_number'], stroke_data['time_ms'],
-                    stroke_data['rating'], stroke_data['avg_boat_speed'],
-                    stroke_data['distance_per_stroke'], stroke_data['average_power'],
-                    json.dumps(stroke_data['swivel_power']),
-                    json.dumps(stroke_data['min_angle']),
-                    json.dumps(stroke_data['max_angle']),
-                    json.dumps(stroke_data['catch_slip']),
-                    json.dumps(stroke_data['finish_slip']),
-                    json.dumps(stroke_data['drive_time']),
-                    json.dumps(stroke_data['recovery_time']),
-                    json.dumps(stroke_data['work_pc_q1']),
-                    json.dumps(stroke_data['work_pc_q2']),
-                    json.dumps(stroke_data['work_pc_q3']),
-                    json.dumps(stroke_data['work_pc_q4']),
-                ))
-                stroke_count += 1
-
-        # Insert periodic data as JSON blob
-        periodic_processed = [extract_periodic_arrays(p) for p in parsed.periodic_data]
-        periodic_id = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO periodic_data (id, piece_id, data)
-            VALUES (?, ?, ?)
-        """, (periodic_id, piece_id, json.dumps(periodic_processed)))
-
-    return UploadResponse(
-        session_id=session_id,
-        session_name=name,
-        pieces_created=1,
-        stroke_count=stroke_count,
-        athletes=athletes
-    )
+
+@app.get("/api/ingest/jobs", response_model=List[IngestJob])
+async def list_ingest_jobs(limit: int = 50):
+    """List recent ingest jobs, newest first."""
+    return ingest_queue.list(min(max(limit, 1), 500))
+
+
+@app.get("/api/ingest/jobs/{job_id}", response_model=IngestJob)
+async def get_ingest_job(job_id: str):
+    """Get ingest job status, stage and rows processed."""
+    job = ingest_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/ingest/jobs/{job_id}/retry", response_model=IngestJob, status_code=202)
+def retry_ingest_job(job_id: str):
+    """Re-run a failed ingest job from its saved upload."""
+    job = ingest_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job['status'] != 'failed':
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be retried (status: {job['status']})")
+    if not ingest_queue.payload_path(job_id).exists():
+        raise HTTPException(status_code=410, detail="Uploaded file is no longer available")
+    job = ingest_queue.retry(job_id)
+    if job is None:
+        raise HTTPException(status_code=409, detail="Job is no longer failed; it may already have been retried")
+    return job
 
 
 # ============ Session Endpoints ============
@@ -287,6 +286,67 @@ async def list_sessions():
         return [Session(**dict(row)) for row in rows]
 
 
+@app.get("/api/sessions/search", response_model=List[Session])
+async def search_sessions(
+    workout_type: Optional[str] = None,
+    squad: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    boat: Optional[str] = None,
+    athlete_id: Optional[str] = None,
+    limit: int = 200,
+    offset: int = 0
+):
+    """
+    Search sessions across the database.
+
+    Args:
+        workout_type: T2, T3, T4, T5, T6 or Race
+        squad: Sessions with at least one athlete from this squad
+        date_from: Earliest session date (YYYY-MM-DD, inclusive)
+        date_to: Latest session date (YYYY-MM-DD, inclusive)
+        boat: Boat name
+        athlete_id: Sessions this global athlete rowed in
+        limit: Maximum number of sessions to return
+        offset: Number of sessions to skip
+    """
+    clauses = []
+    params = []
+    if workout_type:
+        clauses.append("s.workout_type = ?")
+        params.append(workout_type)
+    if boat:
+        clauses.append("s.boat_name = ?")
+        params.append(boat)
+    if date_from:
+        clauses.append("s.session_date >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("s.session_date <= ?")
+        params.append(date_to)
+    if athlete_id:
+        clauses.append("s.id IN (SELECT session_id FROM athletes WHERE global_athlete_id = ?)")
+        params.append(athlete_id)
+    if squad:
+        clauses.append("""s.id IN (
+            SELECT a.session_id FROM global_athletes g
+            JOIN athletes a ON a.global_athlete_id = g.id
+            WHERE g.squad = ?
+        )""")
+        params.append(squad.strip().lower())
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT s.* FROM sessions s
+            {where}
+            ORDER BY s.session_date DESC, s.created_at DESC
+            LIMIT ? OFFSET ?
+        """, params + [min(max(limit, 1), 1000), max(offset, 0)])
+        return ORJSONResponse([dict(row) for row in cursor.fetchall()])
+
+
 @app.get("/api/sessions/{session_id}", response_model=SessionWithDetails)
 async def get_session(session_id: str):
     """Get session with athletes and pieces."""
@@ -311,9 +371,9 @@ async def get_session(session_id: str):
 
 
 @app.patch("/api/sessions/{session_id}", response_model=Session)
-async def update_session(session_id: str, update: SessionUpdate):
+def update_session(session_id: str, update: SessionUpdate):
     """Update session fields (e.g. rename)."""
-    with get_db() as conn:
+    with write_db() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM sessions WHERE id = ?", (session_id,))
         row = cursor.fetchone()
@@ -322,21 +382,25 @@ async def update_session(session_id: str, update: SessionUpdate):
 
         if update.name is not None:
             cursor.execute("UPDATE sessions SET name = ? WHERE id = ?", (update.name, session_id))
+        if update.boat_name is not None:
+            cursor.execute("UPDATE sessions SET boat_name = ? WHERE id = ?", (update.boat_name.strip() or None, session_id))
         if update.workout_type is not None:
             valid_types = ['T2', 'T3', 'T4', 'T5', 'T6', 'Race', '']
             if update.workout_type not in valid_types:
                 raise HTTPException(status_code=400, detail=f"Invalid workout_type. Must be one of: {valid_types}")
             val = update.workout_type if update.workout_type else None
             cursor.execute("UPDATE sessions SET workout_type = ? WHERE id = ?", (val, session_id))
+            if val != row['workout_type']:
+                retag_session(cursor, session_id, val)
 
         cursor.execute("SELECT * FROM sessions WHERE id = ?", (session_id,))
         return Session(**dict(cursor.fetchone()))
 
 
 @app.delete("/api/sessions/{session_id}")
-async def delete_session(session_id: str):
+def delete_session(session_id: str):
     """Delete a session and all related data."""
-    with get_db() as conn:
+    with write_db() as conn:
         cursor = conn.cursor()
 
         # Get pieces to delete their related data
@@ -346,19 +410,45 @@ async def delete_session(session_id: str):
         for piece_id in piece_ids:
             cursor.execute("DELETE FROM stroke_metrics WHERE piece_id = ?", (piece_id,))
             cursor.execute("DELETE FROM periodic_data WHERE piece_id = ?", (piece_id,))
+            cursor.execute("DELETE FROM stroke_curves WHERE piece_id = ?", (piece_id,))
+            cursor.execute("DELETE FROM stroke_shape_vectors WHERE piece_id = ?", (piece_id,))
+            cursor.execute("DELETE FROM stroke_prefix_sums WHERE piece_id = ?", (piece_id,))
+            delete_periodic(cursor, piece_id)
 
-        # Delete associated videos
-        cursor.execute("SELECT filename FROM video_sessions WHERE session_id = ?", (session_id,))
-        for vrow in cursor.fetchall():
-            vpath = VIDEOS_DIR / vrow['filename']
-            if vpath.exists():
-                vpath.unlink()
+        cursor.execute("""
+            SELECT DISTINCT global_athlete_id FROM athletes
+            WHERE session_id = ? AND global_athlete_id IS NOT NULL
+        """, (session_id,))
+        cursor.executemany(
+            "UPDATE global_athletes SET session_count = MAX(session_count - 1, 0) WHERE id = ?",
+            [(row['global_athlete_id'],) for row in cursor.fetchall()]
+        )
+        delete_session_rollups(cursor, session_id)
+
+        # Delete associated videos (files shared with other sessions are kept)
+        cursor.execute("SELECT DISTINCT filename FROM video_sessions WHERE session_id = ?", (session_id,))
+        video_files = [vrow['filename'] for vrow in cursor.fetchall()]
+        cursor.execute("""
+            DELETE FROM video_alignment_tracks
+            WHERE video_id IN (SELECT id FROM video_sessions WHERE session_id = ?)
+        """, (session_id,))
         cursor.execute("DELETE FROM video_sessions WHERE session_id = ?", (session_id,))
+        for filename in video_files:
+            release_video_file(cursor, filename)
+
+        cursor.execute("SELECT id FROM video_uploads WHERE session_id = ?", (session_id,))
+        for urow in cursor.fetchall():
+            discard_partial(urow['id'])
+        cursor.execute("DELETE FROM video_uploads WHERE session_id = ?", (session_id,))
 
         cursor.execute("DELETE FROM pieces WHERE session_id = ?", (session_id,))
         cursor.execute("DELETE FROM athletes WHERE session_id = ?", (session_id,))
         cursor.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
 
+    ensemble_cache.evict(lambda key: key[0] in piece_ids)
+    evict_replay_buffers(piece_ids)
+    purge_archived(piece_ids)
+
     return {"status": "deleted"}
 
 
@@ -366,34 +456,102 @@ async def delete_session(session_id: str):
 
 @app.get("/api/athletes", response_model=List[GlobalAthlete])
 async def list_athletes():
-    """List all global athletes with session count."""
+    """List all global athletes with session count (maintained on upload/delete)."""
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT g.*, COUNT(DISTINCT a.session_id) as session_count
-            FROM global_athletes g
-            LEFT JOIN athletes a ON a.global_athlete_id = g.id
-            GROUP BY g.id
-            ORDER BY g.squad, g.name
+            SELECT * FROM global_athletes
+            ORDER BY squad, name
         """)
         rows = cursor.fetchall()
         return [GlobalAthlete(**dict(row)) for row in rows]
 
 
+@app.get("/api/athletes/search", response_model=List[AthleteSearchResult])
+async def search_global_athletes(q: str, limit: int = 20, squad: Optional[str] = None):
+    """
+    Fuzzy search of global athletes by name or UNI, best match first.
+
+    Tolerates typos and short forms ("Jon" finds "Jonathan").
+
+    Args:
+        q: Search text
+        limit: Maximum results (1-100)
+        squad: Optional squad filter
+    """
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    with get_db() as conn:
+        with phase('compute'):
+            return [AthleteSearchResult(**row) for row in search_athletes(conn.cursor(), q, limit, squad)]
+
+
+@app.get("/api/athletes/duplicates", response_model=List[DuplicateAthleteCandidate])
+async def get_duplicate_athletes(threshold: float = 0.5, limit: int = 200):
+    """
+    Pairs of global athletes that look like the same person, for merging.
+
+    Args:
+        threshold: Minimum name similarity, 0-1 (default 0.5)
+        limit: Maximum pairs returned
+    """
+    if not 0 < threshold <= 1:
+        raise HTTPException(status_code=400, detail="threshold must be in (0, 1]")
+    with get_db() as conn:
+        with phase('compute'):
+            return find_duplicate_candidates(conn.cursor(), threshold, limit)
+
+
+@app.post("/api/athletes/roster", response_model=RosterImportResult)
+async def import_athlete_roster(request: Request, dry_run: bool = False):
+    """
+    Create or update many athletes and their measurements at once.
+
+    Accepts a JSON array of rows, a CSV body (text/csv) or a CSV file in
+    a multipart `file` field; columns are the athlete and measurement
+    field names, plus `id` or `uni` to pick the athlete (else the name is
+    matched). Everything is validated first: any error returns 422 with
+    the per-row results and nothing is written. Otherwise all rows are
+    applied in one transaction.
+
+    Args:
+        dry_run: Validate and match only
+    """
+    content_type = request.headers.get('content-type', '')
+    try:
+        if content_type.startswith('multipart/form-data'):
+            form = await request.form()
+            upload = form.get('file')
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Expected a CSV file in the 'file' field")
+            rows = parse_roster_csv((await upload.read()).decode('utf-8'))
+        elif content_type.startswith('text/csv'):
+            rows = parse_roster_csv((await request.body()).decode('utf-8'))
+        else:
+            rows = orjson.loads(await request.body())
+    except (UnicodeDecodeError, orjson.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Roster must be UTF-8 CSV or a JSON array")
+    if not isinstance(rows, list) or not rows:
+        raise HTTPException(status_code=400, detail="Roster is empty")
+
+    result = await run_in_threadpool(_import_roster, rows, not dry_run)
+    if result['errors']:
+        raise HTTPException(status_code=422, detail=result)
+    return result
+
+
+def _import_roster(rows, apply):
+    with write_db() as conn:
+        return import_roster(conn.cursor(), rows, apply)
+
+
 @app.get("/api/athletes/{athlete_id}", response_model=GlobalAthleteDetail)
 async def get_athlete(athlete_id: str):
     """Get global athlete with session history."""
     with get_db() as conn:
         cursor = conn.cursor()
 
-        # Get global athlete with session count
-        cursor.execute("""
-            SELECT g.*, COUNT(DISTINCT a.session_id) as session_count
-            FROM global_athletes g
-            LEFT JOIN athletes a ON a.global_athlete_id = g.id
-            WHERE g.id = ?
-            GROUP BY g.id
-        """, (athlete_id,))
+        cursor.execute("SELECT * FROM global_athletes WHERE id = ?", (athlete_id,))
         ga_row = cursor.fetchone()
         if not ga_row:
             raise HTTPException(status_code=404, detail="Athlete not found")
@@ -413,9 +571,9 @@ async def get_athlete(athlete_id: str):
 
 
 @app.patch("/api/athletes/{athlete_id}", response_model=GlobalAthlete)
-async def update_athlete(athlete_id: str, update: GlobalAthleteUpdate):
+def update_athlete(athlete_id: str, update: GlobalAthleteUpdate):
     """Update global athlete info."""
-    with get_db() as conn:
+    with write_db() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM global_athletes WHERE id = ?", (athlete_id,))
         row = cursor.fetchone()
@@ -423,8 +581,9 @@ async def update_athlete(athlete_id: str, update: GlobalAthleteUpdate):
             raise HTTPException(status_code=404, detail="Athlete not found")
 
         if update.name is not None:
-            cursor.execute("UPDATE global_athletes SET name = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-                           (update.name, athlete_id))
+            cursor.execute("""
+                UPDATE global_athletes SET name = ?, name_key = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+            """, (update.name, normalize_name(update.name), athlete_id))
         if update.uni is not None:
             cursor.execute("UPDATE global_athletes SET uni = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
                            (update.uni.strip().lower(), athlete_id))
@@ -452,14 +611,8 @@ async def update_athlete(athlete_id: str, update: GlobalAthleteUpdate):
                 cursor.execute(f"UPDATE global_athletes SET {erg_field} = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
                                (val, athlete_id))
 
-        # Return updated record with session count
-        cursor.execute("""
-            SELECT g.*, COUNT(DISTINCT a.session_id) as session_count
-            FROM global_athletes g
-            LEFT JOIN athletes a ON a.global_athlete_id = g.id
-            WHERE g.id = ?
-            GROUP BY g.id
-        """, (athlete_id,))
+        # Return updated record
+        cursor.execute("SELECT * FROM global_athletes WHERE id = ?", (athlete_id,))
         return GlobalAthlete(**dict(cursor.fetchone()))
 
 
@@ -469,14 +622,7 @@ async def get_athlete_trends(athlete_id: str):
     with get_db() as conn:
         cursor = conn.cursor()
 
-        # Get global athlete with session count
-        cursor.execute("""
-            SELECT g.*, COUNT(DISTINCT a.session_id) as session_count
-            FROM global_athletes g
-            LEFT JOIN athletes a ON a.global_athlete_id = g.id
-            WHERE g.id = ?
-            GROUP BY g.id
-        """, (athlete_id,))
+        cursor.execute("SELECT * FROM global_athletes WHERE id = ?", (athlete_id,))
         ga_row = cursor.fetchone()
         if not ga_row:
             raise HTTPException(status_code=404, detail="Athlete not found")
@@ -498,11 +644,14 @@ async def get_athlete_trends(athlete_id: str):
         for app in appearances:
             seat_idx = app['seat_position'] - 1
             cursor.execute("SELECT * FROM stroke_metrics WHERE piece_id = ?", (app['piece_id'],))
-            strokes = cursor.fetchall()
+            rows = cursor.fetchall()
+            with phase('decode'):
+                strokes = [_decode_stroke_row(row) for row in rows]
             if not strokes:
                 continue
 
-            avgs = _compute_seat_averages(strokes, seat_idx)
+            with phase('compute'):
+                avgs = _compute_seat_averages(strokes, seat_idx)
 
             data_points.append(AthleteTrendPoint(
                 session_id=app['session_id'],
@@ -535,9 +684,9 @@ async def get_athlete_measurements(athlete_id: str):
 
 
 @app.put("/api/athletes/{athlete_id}/measurements", response_model=AthleteMeasurements)
-async def upsert_athlete_measurements(athlete_id: str, data: AthleteMeasurementsUpdate):
+def upsert_athlete_measurements(athlete_id: str, data: AthleteMeasurementsUpdate):
     """Create or update anthropometric measurements for an athlete."""
-    with get_db() as conn:
+    with write_db() as conn:
         cursor = conn.cursor()
         # Verify athlete exists
         cursor.execute("SELECT id FROM global_athletes WHERE id = ?", (athlete_id,))
@@ -568,6 +717,52 @@ async def upsert_athlete_measurements(athlete_id: str, data: AthleteMeasurements
         return AthleteMeasurements(**dict(cursor.fetchone()))
 
 
+# ============ Leaderboard Endpoints ============
+
+@app.get("/api/leaderboards/{metric}", response_model=Leaderboard)
+async def get_leaderboard(
+    metric: str,
+    workout_type: Optional[str] = None,
+    squad: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    last_n: Optional[int] = None,
+    min_sessions: int = 1,
+    limit: int = 50,
+    order: Optional[str] = None
+):
+    """
+    Rank athletes by a per-seat metric, read from the precomputed rollups.
+
+    Args:
+        metric: power, stroke_length, effective_length, catch_slip or finish_slip
+        workout_type: Only sessions of this type (T2..T6 or Race)
+        squad: Only athletes in this squad
+        date_from: Earliest session date (YYYY-MM-DD, inclusive)
+        date_to: Latest session date (YYYY-MM-DD, inclusive)
+        last_n: Only each athlete's N most recent matching sessions
+        min_sessions: Leave out athletes with fewer matching sessions
+        limit: Maximum number of athletes to return
+        order: asc or desc (default: best first; lower slip is better)
+    """
+    if metric not in LEADERBOARD_METRICS:
+        raise HTTPException(status_code=400, detail=f"Invalid metric. Must be one of: {list(LEADERBOARD_METRICS)}")
+    if order not in (None, 'asc', 'desc'):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    if last_n is not None and last_n < 1:
+        raise HTTPException(status_code=400, detail="last_n must be at least 1")
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        entries = leaderboard(
+            cursor, metric, workout_type=workout_type, squad=squad, date_from=date_from, date_to=date_to,
+            last_n=last_n, min_sessions=min_sessions, limit=limit,
+            ascending=None if order is None else order == 'asc',
+        )
+    return Leaderboard(metric=metric, workout_type=workout_type, squad=squad, date_from=date_from,
+                       date_to=date_to, last_n=last_n, entries=entries)
+
+
 # ============ Piece Endpoints ============
 
 @app.get("/api/pieces/{piece_id}")
@@ -595,18 +790,9 @@ async def get_strokes(piece_id: str):
         """, (piece_id,))
         rows = cursor.fetchall()
 
-        strokes = []
-        for row in rows:
-            row_dict = dict(row)
-            # Parse JSON arrays
-            for key in ['swivel_power', 'min_angle', 'max_angle', 'catch_slip',
-                       'finish_slip', 'drive_time', 'recovery_time',
-                       'work_pc_q1', 'work_pc_q2', 'work_pc_q3', 'work_pc_q4']:
-                if row_dict.get(key):
-                    row_dict[key] = json.loads(row_dict[key])
-            strokes.append(StrokeMetric(**row_dict))
-
-        return strokes
+    with phase('decode'):
+        strokes = [_decode_stroke_row(row) for row in rows]
+    return ORJSONResponse(strokes)
 
 
 @app.get("/api/pieces/{piece_id}/strokes/averages", response_model=PieceAverages)
@@ -630,85 +816,68 @@ async def get_stroke_averages(piece_id: str):
         """, (piece_id,))
         athletes_rows = cursor.fetchall()
 
-        # Get all strokes
+        # Get all strokes, decoding the per-seat arrays once
         cursor.execute("SELECT * FROM stroke_metrics WHERE piece_id = ?", (piece_id,))
-        stroke_rows = cursor.fetchall()
+        rows = cursor.fetchall()
+        with phase('decode'):
+            strokes = [_decode_stroke_row(row) for row in rows]
 
-        if not stroke_rows:
+        if not strokes:
             raise HTTPException(status_code=404, detail="No stroke data found")
 
-        # Calculate averages per athlete
-        athlete_averages = []
-        total_power_sum = 0
-        total_power_count = 0
-
-        for athlete in athletes_rows:
-            seat_idx = athlete['seat_position'] - 1  # 0-indexed
-            powers = []
-            stroke_lengths = []
-            effective_lengths = []
-            catch_slips = []
-            finish_slips = []
-            drive_times = []
-            recovery_times = []
-
-            for stroke in stroke_rows:
-                swivel_power = json.loads(stroke['swivel_power']) if stroke['swivel_power'] else []
-                min_angle = json.loads(stroke['min_angle']) if stroke['min_angle'] else []
-                max_angle = json.loads(stroke['max_angle']) if stroke['max_angle'] else []
-                catch_slip = json.loads(stroke['catch_slip']) if stroke['catch_slip'] else []
-                finish_slip = json.loads(stroke['finish_slip']) if stroke['finish_slip'] else []
-                drive_time = json.loads(stroke['drive_time']) if stroke['drive_time'] else []
-                recovery_time = json.loads(stroke['recovery_time']) if stroke['recovery_time'] else []
-
-                if seat_idx < len(swivel_power) and swivel_power[seat_idx] is not None:
-                    powers.append(swivel_power[seat_idx])
-                if seat_idx < len(min_angle) and seat_idx < len(max_angle):
-                    if min_angle[seat_idx] is not None and max_angle[seat_idx] is not None:
-                        sl = max_angle[seat_idx] - min_angle[seat_idx]
-                        stroke_lengths.append(sl)
-                        cs = abs(catch_slip[seat_idx]) if seat_idx < len(catch_slip) and catch_slip[seat_idx] is not None else 0
-                        fs = abs(finish_slip[seat_idx]) if seat_idx < len(finish_slip) and finish_slip[seat_idx] is not None else 0
-                        effective_lengths.append(sl - cs - fs)
-                if seat_idx < len(catch_slip) and catch_slip[seat_idx] is not None:
-                    catch_slips.append(abs(catch_slip[seat_idx]))
-                if seat_idx < len(finish_slip) and finish_slip[seat_idx] is not None:
-                    finish_slips.append(abs(finish_slip[seat_idx]))
-                if seat_idx < len(drive_time) and drive_time[seat_idx] is not None:
-                    drive_times.append(drive_time[seat_idx])
-                if seat_idx < len(recovery_time) and recovery_time[seat_idx] is not None:
-                    recovery_times.append(recovery_time[seat_idx])
-
-            avg_power = sum(powers) / len(powers) if powers else None
-            if avg_power:
-                total_power_sum += avg_power
-                total_power_count += 1
-
-            athlete_averages.append(AthleteAverage(
-                seat_position=athlete['seat_position'],
-                name=athlete['name'],
-                avg_power=round(avg_power, 2) if avg_power else None,
-                avg_stroke_length=round(sum(stroke_lengths) / len(stroke_lengths), 2) if stroke_lengths else None,
-                avg_effective_length=round(sum(effective_lengths) / len(effective_lengths), 2) if effective_lengths else None,
-                avg_catch_slip=round(sum(catch_slips) / len(catch_slips), 2) if catch_slips else None,
-                avg_finish_slip=round(sum(finish_slips) / len(finish_slips), 2) if finish_slips else None,
-                avg_drive_time=round(sum(drive_times) / len(drive_times), 4) if drive_times else None,
-                avg_recovery_time=round(sum(recovery_times) / len(recovery_times), 4) if recovery_times else None,
-            ))
+        with phase('compute'):
+            return _build_piece_averages(piece_row, athletes_rows, strokes)
 
-        # Calculate overall averages
-        ratings = [s['rating'] for s in stroke_rows if s['rating']]
-        speeds = [s['avg_boat_speed'] for s in stroke_rows if s['avg_boat_speed']]
-
-        return PieceAverages(
-            piece_id=piece_id,
-            piece_name=piece_row['name'],
-            total_strokes=len(stroke_rows),
-            avg_rating=round(sum(ratings) / len(ratings), 2) if ratings else None,
-            avg_boat_speed=round(sum(speeds) / len(speeds), 4) if speeds else None,
-            athletes=athlete_averages,
-            crew_avg_power=round(total_power_sum / total_power_count, 2) if total_power_count > 0 else None
-        )
+
+@app.get("/api/pieces/{piece_id}/strokes/range-averages", response_model=PieceRangeAverages)
+async def get_stroke_range_averages(
+    piece_id: str,
+    stroke_start: Optional[int] = None,
+    stroke_end: Optional[int] = None
+):
+    """
+    Get per-athlete means and standard deviations over a stroke range.
+
+    Computed from running sums stored at upload, so the cost is the same
+    for any range and any piece length.
+
+    Args:
+        piece_id: The piece ID
+        stroke_start: Optional first stroke number (inclusive)
+        stroke_end: Optional last stroke number (inclusive)
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT session_id FROM pieces WHERE id = ?", (piece_id,))
+        piece_row = cursor.fetchone()
+        if not piece_row:
+            raise HTTPException(status_code=404, detail="Piece not found")
+
+        stats = range_stats(conn, piece_id, stroke_start, stroke_end)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="No stroke data found")
+        if not stats['stroke_count']:
+            raise HTTPException(status_code=404, detail="No strokes in range")
+
+        cursor.execute("SELECT seat_position, name FROM athletes WHERE session_id = ? ORDER BY seat_position",
+                       (piece_row['session_id'],))
+        athletes_rows = cursor.fetchall()
+
+    athletes = [
+        {'seat_position': row['seat_position'], 'name': row['name'], **stats['seats'][row['seat_position']]}
+        for row in athletes_rows if row['seat_position'] in stats['seats']
+    ]
+    seat_powers = [a['power']['mean'] for a in athletes if a['power']['mean']]
+    return PieceRangeAverages(
+        piece_id=piece_id,
+        stroke_start=stats['stroke_start'],
+        stroke_end=stats['stroke_end'],
+        stroke_count=stats['stroke_count'],
+        rating=stats['boat']['rating'],
+        boat_speed=stats['boat']['boat_speed'],
+        athletes=athletes,
+        crew_avg_power=round(sum(seat_powers) / len(seat_powers), 2) if seat_powers else None
+    )
 
 
 # ============ Periodic Data Endpoints ============
@@ -731,27 +900,11 @@ async def get_periodic_data(
     """
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT data FROM periodic_data WHERE piece_id = ?", (piece_id,))
-        row = cursor.fetchone()
-
-        if not row:
+        if not has_periodic(cursor, piece_id):
             raise HTTPException(status_code=404, detail="Periodic data not found")
 
-        data = json.loads(row['data'])
-
-        # Filter by time range if specified
-        if stroke_start is not None or stroke_end is not None:
-            filtered = []
-            for point in data:
-                time_ms = point.get('time_ms')
-                if time_ms is None:
-                    continue
-                if stroke_start is not None and time_ms < stroke_start:
-                    continue
-                if stroke_end is not None and time_ms > stroke_end:
-                    continue
-                filtered.append(point)
-            data = filtered
+        # Only chunks overlapping the requested time range are decoded
+        data = load_periodic(cursor, piece_id, stroke_start, stroke_end)
 
         # Downsample if requested
         if downsample > 1:
@@ -764,6 +917,47 @@ async def get_periodic_data(
         }
 
 
+def _stream_periodic_ndjson(piece_id, stroke_start, stroke_end, downsample):
+    """Yield periodic samples as NDJSON, one decoded chunk at a time."""
+    conn = get_connection(check_same_thread=False)
+    try:
+        index = 0
+        for chunk in iter_periodic_chunks(conn.cursor(), piece_id, stroke_start, stroke_end):
+            lines = []
+            for point in chunk:
+                if index % downsample == 0:
+                    lines.append(orjson.dumps(point))
+                index += 1
+            if lines:
+                yield b'\n'.join(lines) + b'\n'
+    finally:
+        conn.close()
+
+
+@app.get("/api/pieces/{piece_id}/periodic/stream")
+async def stream_periodic_data(
+    piece_id: str,
+    stroke_start: Optional[int] = None,
+    stroke_end: Optional[int] = None,
+    downsample: int = 1
+):
+    """
+    Stream periodic data for a piece as NDJSON (one sample per line).
+
+    Samples are emitted as each storage chunk is decoded, so server memory
+    stays flat and clients can render before the whole piece arrives.
+    Accepts the same filters as /periodic.
+    """
+    with get_db() as conn:
+        if not has_periodic(conn.cursor(), piece_id):
+            raise HTTPException(status_code=404, detail="Periodic data not found")
+
+    return StreamingResponse(
+        _stream_periodic_ndjson(piece_id, stroke_start, stroke_end, max(downsample, 1)),
+        media_type="application/x-ndjson",
+    )
+
+
 @app.get("/api/pieces/{piece_id}/stroke/{stroke_number}/force-curve")
 async def get_force_curve(piece_id: str, stroke_number: int):
     """
@@ -785,24 +979,12 @@ async def get_force_curve(piece_id: str, stroke_number: int):
 
         stroke_time = stroke_row['time_ms']
 
-        # Get periodic data
-        cursor.execute("SELECT data FROM periodic_data WHERE piece_id = ?", (piece_id,))
-        periodic_row = cursor.fetchone()
-
-        if not periodic_row:
+        if not has_periodic(cursor, piece_id):
             raise HTTPException(status_code=404, detail="Periodic data not found")
 
-        data = json.loads(periodic_row['data'])
-
-        # Find data points for this stroke (within ~2 seconds of stroke time)
-        stroke_data = []
-        for point in data:
-            time_ms = point.get('time_ms')
-            if time_ms is None:
-                continue
-            # Stroke cycle is roughly 1.5-2 seconds, look for nearby data
-            if abs(time_ms - stroke_time) < 2000:
-                stroke_data.append(point)
+        # Stroke cycle is roughly 1.5-2 seconds, look for data within 2 s of
+        # the stroke time; only the overlapping chunks are decoded
+        stroke_data = load_periodic(cursor, piece_id, stroke_time - 1999, stroke_time + 1999)
 
         # Sort by normalized time to get proper force curve
         stroke_data.sort(key=lambda x: x.get('normalized_time') or 0)
@@ -815,6 +997,299 @@ async def get_force_curve(piece_id: str, stroke_number: int):
         }
 
 
+@app.get("/api/pieces/{piece_id}/force-curve/ensemble", response_model=PieceEnsembleCurves)
+async def get_ensemble_force_curve(
+    piece_id: str,
+    stroke_start: Optional[int] = None,
+    stroke_end: Optional[int] = None,
+    points: int = 100
+):
+    """
+    Get the ensemble-average ("average stroke") force curve per seat.
+
+    Each stroke in the range is resampled onto a fixed grid; the result
+    holds the mean and standard deviation of gate force vs. normalized time
+    and vs. gate angle over the drive. Results are cached per piece and range.
+    Pieces compacted by retention use their stored per-stroke curves.
+
+    Args:
+        piece_id: The piece ID
+        stroke_start: Optional first stroke number (inclusive)
+        stroke_end: Optional last stroke number (inclusive)
+        points: Grid size for each curve (default 100)
+    """
+    if not 10 <= points <= 500:
+        raise HTTPException(status_code=400, detail="points must be between 10 and 500")
+
+    cache_key = (piece_id, stroke_start, stroke_end, points)
+    cached = ensemble_cache.get(cache_key)
+    if cached is not None:
+        return ORJSONResponse(cached)
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT session_id, periodic_tier FROM pieces WHERE id = ?", (piece_id,))
+        piece_row = cursor.fetchone()
+        if not piece_row:
+            raise HTTPException(status_code=404, detail="Piece not found")
+
+        cursor.execute("""
+            SELECT stroke_number, time_ms FROM stroke_metrics
+            WHERE piece_id = ? ORDER BY stroke_number
+        """, (piece_id,))
+        all_strokes = cursor.fetchall()
+
+        # Each stroke runs until the next one starts, so keep the stroke after
+        # the range to bound the last window
+        selected_idx = [
+            i for i, row in enumerate(all_strokes)
+            if (stroke_start is None or row['stroke_number'] >= stroke_start)
+            and (stroke_end is None or row['stroke_number'] <= stroke_end)
+        ]
+        if not selected_idx:
+            raise HTTPException(status_code=404, detail="No strokes in range")
+        first, last = selected_idx[0], selected_idx[-1]
+        window_times = [row['time_ms'] for row in all_strokes[first:last + 2]]
+        end_ms = window_times[-1] if last + 1 < len(all_strokes) else None
+
+        cursor.execute("SELECT seat_position, name FROM athletes WHERE session_id = ? ORDER BY seat_position",
+                       (piece_row['session_id'],))
+        athletes = {row['seat_position']: row['name'] for row in cursor.fetchall()}
+
+        stored = None
+        if piece_row['periodic_tier'] != TIER_RAW:
+            cursor.execute("SELECT * FROM stroke_curves WHERE piece_id = ?", (piece_id,))
+            stored = cursor.fetchone()
+            if stored is not None and stored['stroke_count'] != len(all_strokes):
+                stored = None
+        if stored is None:
+            data = load_periodic(cursor, piece_id, window_times[0], end_ms)
+
+    seats = sorted(athletes) or list(range(1, 9))
+    with phase('compute'):
+        if stored is not None:
+            shape = (stored['stroke_count'], stored['grid_points'])
+            force = unpack_curves(stored['force'], *shape)[first:last + 1]
+            angle = unpack_curves(stored['angle'], *shape)[first:last + 1]
+            curves = compute_stored_ensemble(force, angle, seats, points)
+        else:
+            curves = compute_ensemble(data, window_times[:last - first + 1], seats, points)
+    for curve in curves:
+        curve['name'] = athletes.get(curve['seat_position'])
+
+    result = {
+        "piece_id": piece_id,
+        "stroke_start": all_strokes[first]['stroke_number'],
+        "stroke_end": all_strokes[last]['stroke_number'],
+        "stroke_count": len(selected_idx),
+        "points": points,
+        "seats": curves,
+    }
+    ensemble_cache.set(cache_key, result)
+    return ORJSONResponse(result)
+
+
+# ============ Curve Similarity Endpoints ============
+
+@app.get("/api/pieces/{piece_id}/stroke/{stroke_number}/similar", response_model=List[SimilarStroke])
+def get_similar_strokes(
+    piece_id: str,
+    stroke_number: int,
+    seat: int,
+    limit: int = 20,
+    athlete_id: Optional[str] = None,
+    include_same_piece: bool = False
+):
+    """
+    Find the strokes in the database whose force-curve shape is closest to
+    one seat's stroke.
+
+    Args:
+        piece_id: The piece ID
+        stroke_number: The reference stroke
+        seat: Seat position of the reference stroke
+        limit: Maximum number of strokes to return
+        athlete_id: Only strokes by this global athlete
+        include_same_piece: Also return strokes from the reference piece
+    """
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    with get_db() as conn:
+        cursor = conn.cursor()
+        with phase('search'):
+            matches = find_similar_strokes(cursor, piece_id, seat, stroke_number, limit, athlete_id,
+                                           include_same_piece)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="No force curve stored for this stroke and seat")
+    return matches
+
+
+@app.get("/api/pieces/{piece_id}/similar-athletes", response_model=List[SimilarAthlete])
+def get_piece_similar_athletes(piece_id: str, seat: int, limit: int = 20, squad: Optional[str] = None):
+    """
+    Rank athletes by how closely their average force-curve shape matches
+    one seat's average curve in a piece (e.g. the stroke seat).
+
+    Args:
+        piece_id: The piece ID
+        seat: Seat position to compare against
+        limit: Maximum number of athletes to return
+        squad: Only athletes in this squad
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        with phase('search'):
+            matches = find_similar_athletes(cursor, piece_id=piece_id, seat_position=seat, limit=limit, squad=squad)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="No force curves stored for this piece and seat")
+    return matches
+
+
+@app.get("/api/athletes/{athlete_id}/similar-athletes", response_model=List[SimilarAthlete])
+def get_athlete_similar_athletes(athlete_id: str, limit: int = 20, squad: Optional[str] = None):
+    """
+    Rank other athletes by how closely their average force-curve shape
+    matches this athlete's.
+
+    Args:
+        athlete_id: The global athlete ID
+        limit: Maximum number of athletes to return
+        squad: Only athletes in this squad
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        with phase('search'):
+            matches = find_similar_athletes(cursor, athlete_id=athlete_id, limit=limit, squad=squad)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="No force curves stored for this athlete")
+    return matches
+
+
+# ============ Replay Endpoints ============
+
+@app.websocket("/api/pieces/{piece_id}/replay")
+async def replay_piece(
+    websocket: WebSocket,
+    piece_id: str,
+    speed: str = '1',
+    include: str = 'all',
+    stroke_start: Optional[int] = None,
+    stroke_end: Optional[int] = None,
+):
+    """
+    Replay a piece's stroke and periodic events over a WebSocket.
+
+    Args:
+        speed: '1' (real time), '4' or 'max' (as fast as the client reads)
+        include: 'all', 'strokes' or 'periodic'
+        stroke_start: Optional first stroke number to replay
+        stroke_end: Optional last stroke number to replay (inclusive)
+
+    Viewers of the same piece share one decoded buffer. See replay.py for
+    the message and control protocol.
+    """
+    await websocket.accept()
+    if speed not in REPLAY_SPEEDS:
+        await websocket.close(code=1008, reason=f"speed must be one of: {', '.join(REPLAY_SPEEDS)}")
+        return
+    if include not in REPLAY_TRACKS:
+        await websocket.close(code=1008, reason=f"include must be one of: {', '.join(REPLAY_TRACKS)}")
+        return
+
+    buffer = await get_replay_buffer(piece_id)
+    if buffer is None:
+        await websocket.close(code=1008, reason="Piece not found")
+        return
+    await stream_replay(websocket, buffer, REPLAY_SPEEDS[speed], include, stroke_start, stroke_end)
+
+
+# ============ Dashboard Endpoints ============
+
+@app.get("/api/sessions/{session_id}/dashboard", response_model=SessionDashboard)
+async def get_session_dashboard(
+    session_id: str,
+    piece_ids: Optional[str] = None,
+    include_periodic: bool = False,
+    downsample: int = 1
+):
+    """
+    Get everything the dashboard needs for a session in one request.
+
+    Combines the session details with strokes, per-athlete averages and
+    (optionally) periodic data for each requested piece. All parts are read
+    from a single transaction, and each piece's strokes are decoded once
+    and shared between the stroke list and the averages.
+
+    Args:
+        session_id: The session ID
+        piece_ids: Optional comma-separated piece IDs (default: all pieces)
+        include_periodic: Include periodic data for each piece
+        downsample: Return every Nth periodic point (default 1 = all data)
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        # Consistent snapshot across all the reads below
+        cursor.execute("BEGIN")
+
+        cursor.execute("SELECT * FROM sessions WHERE id = ?", (session_id,))
+        session_row = cursor.fetchone()
+        if not session_row:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        cursor.execute("SELECT * FROM athletes WHERE session_id = ? ORDER BY seat_position", (session_id,))
+        athletes_rows = cursor.fetchall()
+
+        cursor.execute("SELECT * FROM pieces WHERE session_id = ? ORDER BY piece_number", (session_id,))
+        piece_rows = cursor.fetchall()
+
+        if piece_ids:
+            wanted = [pid.strip() for pid in piece_ids.split(',') if pid.strip()]
+            known = {row['id'] for row in piece_rows}
+            missing = [pid for pid in wanted if pid not in known]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Pieces not found in session: {missing}")
+            selected = [row for row in piece_rows if row['id'] in set(wanted)]
+        else:
+            selected = piece_rows
+
+        # Fetch strokes for all selected pieces in one query
+        strokes_by_piece = {row['id']: [] for row in selected}
+        if selected:
+            placeholders = ', '.join(['?'] * len(selected))
+            cursor.execute(f"""
+                SELECT * FROM stroke_metrics WHERE piece_id IN ({placeholders})
+                ORDER BY piece_id, stroke_number
+            """, [row['id'] for row in selected])
+            rows = cursor.fetchall()
+            with phase('decode'):
+                for row in rows:
+                    strokes_by_piece[row['piece_id']].append(_decode_stroke_row(row))
+
+        pieces = []
+        for piece_row in selected:
+            strokes = strokes_by_piece[piece_row['id']]
+            with phase('compute'):
+                averages = _build_piece_averages(piece_row, athletes_rows, strokes).model_dump() if strokes else None
+            entry = {
+                "piece_id": piece_row['id'],
+                "strokes": strokes,
+                "averages": averages,
+            }
+            if include_periodic:
+                data = load_periodic(cursor, piece_row['id'])
+                if downsample > 1:
+                    data = data[::downsample]
+                entry["periodic"] = {"total_points": len(data), "data": data}
+            pieces.append(entry)
+
+        session = dict(session_row)
+        session["athletes"] = [dict(row) for row in athletes_rows]
+        session["pieces"] = [dict(row) for row in piece_rows]
+
+    return ORJSONResponse({"session": session, "pieces": pieces})
+
+
 # ============ Video Endpoints ============
 
 @app.post("/api/videos/upload", response_model=VideoSession)
@@ -823,39 +1298,182 @@ async def upload_video(
     session_id: str = Form(...),
     piece_id: str = Form(None),
 ):
-    """Upload a video file and associate it with a session."""
-    allowed_ext = {'.mp4', '.mov', '.webm', '.avi', '.mkv'}
-    ext = Path(file.filename).suffix.lower()
-    if ext not in allowed_ext:
-        raise HTTPException(status_code=400, detail=f"Unsupported video format. Allowed: {allowed_ext}")
+    """
+    Upload a video file in a single multipart request and associate it with a session.
+
+    Large files should use the resumable /api/videos/uploads protocol instead.
+    """
+    ext = upload_ext(file.filename)
+    _check_video_ext(ext)
+    _require_session(session_id)
+
+    video_id = str(uuid.uuid4())
+    temp_path = partial_path(video_id)
+    content_hash = await run_in_threadpool(save_stream, file.file, temp_path)
+    return await run_in_threadpool(_store_video, video_id, session_id, piece_id,
+                                   file.filename, ext, temp_path, content_hash)
+
+
+def _check_video_ext(ext: str):
+    if ext not in ALLOWED_VIDEO_EXTENSIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"Unsupported video format. Allowed: {ALLOWED_VIDEO_EXTENSIONS}")
 
+
+def _require_session(session_id: str):
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT id FROM sessions WHERE id = ?", (session_id,))
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="Session not found")
 
-    video_id = str(uuid.uuid4())
-    stored_filename = f"{video_id}{ext}"
-    file_path = VIDEOS_DIR / stored_filename
 
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+def _register_video(cursor, video_id, session_id, piece_id, original_filename, ext, source, content_hash):
+    """Store a received file (de-duplicated by content hash) and insert its video row."""
+    stored_filename = store_video_file(cursor, source, video_id, ext, content_hash)
+    cursor.execute("""
+        INSERT INTO video_sessions (id, session_id, filename, original_filename, piece_id, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (video_id, session_id, stored_filename, original_filename, piece_id, content_hash))
+    cursor.execute("SELECT * FROM video_sessions WHERE id = ?", (video_id,))
+    return VideoSession(**dict(cursor.fetchone()))
+
+
+def _store_video(video_id, session_id, piece_id, original_filename, ext, source, content_hash):
+    with write_db() as conn:
+        return _register_video(conn.cursor(), video_id, session_id, piece_id,
+                               original_filename, ext, source, content_hash)
+
 
+def _get_video_upload(cursor, upload_id: str):
+    cursor.execute("SELECT * FROM video_uploads WHERE id = ?", (upload_id,))
+    row = cursor.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return row
+
+
+def _get_claimed_upload(upload_id: str):
+    """Read a claimed upload; if it was completed or aborted meanwhile, drop the partial file claim() created."""
     with get_db() as conn:
+        try:
+            return _get_video_upload(conn.cursor(), upload_id)
+        except HTTPException:
+            discard_partial(upload_id)
+            raise
+
+
+def _video_upload(row) -> VideoUpload:
+    return VideoUpload(**dict(row), chunk_size=UPLOAD_CHUNK_SIZE)
+
+
+@app.post("/api/videos/uploads", response_model=VideoUpload, status_code=201)
+def create_video_upload(upload: VideoUploadCreate):
+    """
+    Start a resumable video upload.
+
+    Send the file with PUT /api/videos/uploads/{id}?offset=N chunks, then
+    POST /api/videos/uploads/{id}/complete.
+    """
+    ext = upload_ext(upload.filename)
+    _check_video_ext(ext)
+    if upload.size <= 0:
+        raise HTTPException(status_code=400, detail="size must be positive")
+    _require_session(upload.session_id)
+
+    upload_id = str(uuid.uuid4())
+    with write_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            INSERT INTO video_sessions (id, session_id, filename, original_filename, piece_id)
+            INSERT INTO video_uploads (id, session_id, piece_id, original_filename, total_bytes)
             VALUES (?, ?, ?, ?, ?)
-        """, (video_id, session_id, stored_filename, file.filename, piece_id))
+        """, (upload_id, upload.session_id, upload.piece_id, upload.filename, upload.size))
+        return _video_upload(_get_video_upload(cursor, upload_id))
 
-    return VideoSession(
-        id=video_id,
-        session_id=session_id,
-        filename=stored_filename,
-        original_filename=file.filename,
-        piece_id=piece_id,
-    )
+
+@app.get("/api/videos/uploads/{upload_id}", response_model=VideoUpload)
+async def get_video_upload(upload_id: str):
+    """Get upload progress; received_bytes is the offset to resume from."""
+    with get_db() as conn:
+        return _video_upload(_get_video_upload(conn.cursor(), upload_id))
+
+
+@app.put("/api/videos/uploads/{upload_id}", response_model=VideoUpload)
+async def put_video_upload_chunk(upload_id: str, request: Request, offset: int):
+    """
+    Append the raw request body to an upload at `offset`.
+
+    The offset must equal received_bytes; on a mismatch (e.g. after a
+    dropped connection) a 409 reports the offset to resume from.
+    """
+    with get_db() as conn:
+        _get_video_upload(conn.cursor(), upload_id)
+    if not await run_in_threadpool(claim, upload_id):
+        raise HTTPException(status_code=409, detail="Another chunk is being written to this upload")
+
+    try:
+        # Read the offset only once claimed, so a chunk just written by another worker is seen
+        row = _get_claimed_upload(upload_id)
+        if offset != row['received_bytes']:
+            raise HTTPException(status_code=409, detail={
+                "message": "Offset does not match bytes received", "received_bytes": row['received_bytes']
+            })
+        received, overflow = await append_chunk(upload_id, offset, row['total_bytes'], request.stream())
+        row = await run_in_threadpool(_record_received, upload_id, offset, received)
+    finally:
+        release(upload_id)
+
+    if overflow:
+        raise HTTPException(status_code=413, detail="Chunk extends past the declared upload size")
+    return _video_upload(row)
+
+
+def _record_received(upload_id: str, offset: int, received: int):
+    with write_db() as conn:
+        cursor = conn.cursor()
+        # Only advance from the offset this chunk was written at
+        cursor.execute("""
+            UPDATE video_uploads SET received_bytes = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND received_bytes = ?
+        """, (received, upload_id, offset))
+        return _get_video_upload(cursor, upload_id)
+
+
+@app.post("/api/videos/uploads/{upload_id}/complete", response_model=VideoSession)
+def complete_video_upload(upload_id: str):
+    """Finish a fully received upload and create its video."""
+    with get_db() as conn:
+        _get_video_upload(conn.cursor(), upload_id)
+    if not claim(upload_id):
+        raise HTTPException(status_code=409, detail="Another chunk is being written to this upload")
+
+    try:
+        row = _get_claimed_upload(upload_id)
+        if row['received_bytes'] != row['total_bytes']:
+            raise HTTPException(status_code=409, detail={
+                "message": "Upload is incomplete", "received_bytes": row['received_bytes']
+            })
+        content_hash = finish_hash(upload_id, row['total_bytes'])
+        with write_db() as conn:
+            cursor = conn.cursor()
+            video = _register_video(cursor, upload_id, row['session_id'], row['piece_id'],
+                                    row['original_filename'], upload_ext(row['original_filename']),
+                                    partial_path(upload_id), content_hash)
+            cursor.execute("DELETE FROM video_uploads WHERE id = ?", (upload_id,))
+    finally:
+        release(upload_id)
+    return video
+
+
+@app.delete("/api/videos/uploads/{upload_id}")
+def abort_video_upload(upload_id: str):
+    """Abandon an upload and delete the partial file."""
+    with write_db() as conn:
+        cursor = conn.cursor()
+        _get_video_upload(cursor, upload_id)
+        cursor.execute("DELETE FROM video_uploads WHERE id = ?", (upload_id,))
+    discard_partial(upload_id)
+    return {"status": "deleted"}
 
 
 @app.get("/api/sessions/{session_id}/videos", response_model=List[VideoSession])
@@ -868,9 +1486,9 @@ async def get_session_videos(session_id: str):
         return [VideoSession(**dict(row)) for row in rows]
 
 
-@app.get("/api/videos/{video_id}/file")
-async def get_video_file(video_id: str):
-    """Stream a video file."""
+@app.api_route("/api/videos/{video_id}/file", methods=["GET", "HEAD"])
+async def get_video_file(video_id: str, request: Request):
+    """Stream a video file, honouring Range requests so seeking only fetches the bytes viewed."""
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT filename, original_filename FROM video_sessions WHERE id = ?", (video_id,))
@@ -882,13 +1500,65 @@ async def get_video_file(video_id: str):
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Video file not found on disk")
 
-    return FileResponse(file_path, filename=row['original_filename'])
+    return RangeFileResponse(file_path, request.headers, filename=row['original_filename'],
+                             method=request.method)
+
+
+@app.get("/api/videos/{video_id}/alignment", response_model=VideoAlignmentTrack)
+def get_video_alignment(video_id: str):
+    """
+    Get the video's telemetry alignment track: periodic channels resampled
+    to one value per video frame using the stored offset_ms and piece.
+
+    Uses the video's fps (30 if unknown) and its piece, or the session's
+    first piece when none is linked. The track is stored and only rebuilt
+    when the offset, piece or fps changes.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM video_sessions WHERE id = ?", (video_id,))
+        video = cursor.fetchone()
+        if not video:
+            raise HTTPException(status_code=404, detail="Video not found")
+
+        piece_id = video['piece_id']
+        if not piece_id:
+            cursor.execute("SELECT id FROM pieces WHERE session_id = ? ORDER BY piece_number LIMIT 1",
+                           (video['session_id'],))
+            piece_row = cursor.fetchone()
+            if not piece_row:
+                raise HTTPException(status_code=404, detail="Session has no pieces to align with")
+            piece_id = piece_row['id']
+
+        offset_ms = video['offset_ms'] or 0
+        fps = video['fps'] or DEFAULT_FPS
+        data = load_cached_track(cursor, video_id, piece_id, offset_ms, fps)
+        if data is not None:
+            return Response(content=data, media_type="application/json")
+
+        cursor.execute("SELECT time_ms FROM stroke_metrics WHERE piece_id = ? ORDER BY time_ms", (piece_id,))
+        stroke_times = [row['time_ms'] for row in cursor.fetchall() if row['time_ms'] is not None]
+        points = load_periodic(cursor, piece_id)
+    with phase('compute'):
+        track = build_alignment_track(points, stroke_times, offset_ms, fps, video['duration_ms'])
+    track.update(video_id=video_id, piece_id=piece_id)
+
+    with write_db() as conn:
+        cursor = conn.cursor()
+        # The video may have been deleted while the track was built
+        cursor.execute("SELECT 1 FROM video_sessions WHERE id = ?", (video_id,))
+        if cursor.fetchone():
+            data = store_track(cursor, video_id, piece_id, offset_ms, fps, track)
+        else:
+            data = orjson.dumps(track)
+
+    return Response(content=data, media_type="application/json")
 
 
 @app.patch("/api/videos/{video_id}", response_model=VideoSession)
-async def update_video(video_id: str, update: VideoSessionUpdate):
+def update_video(video_id: str, update: VideoSessionUpdate):
     """Update video sync offset or piece association."""
-    with get_db() as conn:
+    with write_db() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM video_sessions WHERE id = ?", (video_id,))
         row = cursor.fetchone()
@@ -905,24 +1575,107 @@ async def update_video(video_id: str, update: VideoSessionUpdate):
 
 
 @app.delete("/api/videos/{video_id}")
-async def delete_video(video_id: str):
+def delete_video(video_id: str):
     """Delete a video and its file."""
-    with get_db() as conn:
+    with write_db() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT filename FROM video_sessions WHERE id = ?", (video_id,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Video not found")
 
-        file_path = VIDEOS_DIR / row['filename']
-        if file_path.exists():
-            file_path.unlink()
-
+        cursor.execute("DELETE FROM video_alignment_tracks WHERE video_id = ?", (video_id,))
         cursor.execute("DELETE FROM video_sessions WHERE id = ?", (video_id,))
+        release_video_file(cursor, row['filename'])
 
     return {"status": "deleted"}
 
 
+# ============ Export Endpoints ============
+
+def _stream_export(dataset, fmt, pieces, with_athlete_seat):
+    conn = get_connection(check_same_thread=False)
+    try:
+        yield from iter_export(conn.cursor(), dataset, fmt, pieces, with_athlete_seat)
+    finally:
+        conn.close()
+
+
+@app.get("/api/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = "parquet",
+    session_id: Optional[str] = None,
+    athlete_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+):
+    """
+    Stream stroke or periodic data as Parquet or Arrow IPC.
+
+    Args:
+        dataset: strokes or periodic
+        format: parquet or arrow (IPC stream)
+        session_id: Only this session
+        athlete_id: Only sessions this global athlete rowed in (adds an athlete_seat column)
+        date_from: Earliest session date (YYYY-MM-DD, inclusive)
+        date_to: Latest session date (YYYY-MM-DD, inclusive)
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset; expected one of {', '.join(EXPORT_DATASETS)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format; expected one of {', '.join(EXPORT_FORMATS)}")
+
+    with get_db() as conn:
+        pieces = find_export_pieces(conn.cursor(), session_id, athlete_id, date_from, date_to)
+    if not pieces:
+        raise HTTPException(status_code=404, detail="No pieces match the export filters")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    scope = session_id or athlete_id or f"{date_from or 'start'}_{date_to or 'end'}"
+    return StreamingResponse(
+        _stream_export(dataset, format, pieces, bool(athlete_id)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}_{scope}.{extension}"'},
+    )
+
+
+# ============ Metrics ============
+
+@app.get("/api/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text-format metrics."""
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+# ============ Admin Endpoints ============
+
+def _require_admin(request: Request):
+    """Accept the admin token from X-Admin-Token or ?token=; hide the endpoints when none is configured."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = request.headers.get("x-admin-token") or request.query_params.get("token")
+    if not check_admin_token(token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/api/admin/profiles", response_model=List[RequestProfile], include_in_schema=False)
+async def get_profiles(request: Request, limit: int = 50):
+    """List recent request profiles, newest first."""
+    _require_admin(request)
+    return list_profiles(limit)
+
+
+@app.get("/api/admin/profiles/{profile_id}", include_in_schema=False)
+async def download_profile(profile_id: str, request: Request):
+    """Download a profile as collapsed stacks (flamegraph.pl / speedscope input)."""
+    _require_admin(request)
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=path.name)
+
+
 # ============ Health Check ============
 
 @app.get("/api/health")
@@ -23,6 +23,7 @@ class Piece(BaseModel):
     distance_meters: Optional[float] = None
     avg_rating: Optional[float] = None
     pace: Optional[str] = None
+    periodic_tier: str = 'raw'
 
 
 class Session(BaseModel):
@@ -34,6 +35,7 @@ class Session(BaseModel):
     boat_name: Optional[str] = None
     boat_seats: int = 8
     workout_type: Optional[str] = None
+    session_date: Optional[str] = None
     created_at: Optional[str] = None
 
 
@@ -83,9 +85,28 @@ class UploadResponse(BaseModel):
     athletes: List[Athlete]
 
 
+class IngestJob(BaseModel):
+    id: str
+    filename: str
+    session_name: Optional[str] = None
+    status: str
+    stage: Optional[str] = None
+    rows_processed: int = 0
+    total_rows: Optional[int] = None
+    bytes: Optional[int] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    session_id: Optional[str] = None
+    result: Optional[UploadResponse] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
 class SessionUpdate(BaseModel):
     name: Optional[str] = None
     workout_type: Optional[str] = None
+    boat_name: Optional[str] = None
 
 
 class AthleteAverage(BaseModel):
@@ -110,6 +131,90 @@ class PieceAverages(BaseModel):
     crew_avg_power: Optional[float] = None
 
 
+class MetricStats(BaseModel):
+    mean: Optional[float] = None
+    std: Optional[float] = None  # population standard deviation
+    count: int = 0
+
+
+class SeatRangeAverages(BaseModel):
+    seat_position: int
+    name: Optional[str] = None
+    power: MetricStats
+    stroke_length: MetricStats
+    effective_length: MetricStats
+    catch_slip: MetricStats
+    finish_slip: MetricStats
+    drive_time: MetricStats
+    recovery_time: MetricStats
+
+
+class PieceRangeAverages(BaseModel):
+    piece_id: str
+    stroke_start: int
+    stroke_end: int
+    stroke_count: int
+    rating: MetricStats
+    boat_speed: MetricStats
+    athletes: List[SeatRangeAverages]
+    crew_avg_power: Optional[float] = None
+
+
+class EnsembleCurve(BaseModel):
+    x: List[float]
+    force_mean: List[Optional[float]]
+    force_std: List[Optional[float]]
+
+
+class SeatEnsembleCurve(BaseModel):
+    seat_position: int
+    name: Optional[str] = None
+    strokes_used: int
+    normalized_time: Optional[EnsembleCurve] = None
+    gate_angle: Optional[EnsembleCurve] = None
+
+
+class PieceEnsembleCurves(BaseModel):
+    piece_id: str
+    stroke_start: int
+    stroke_end: int
+    stroke_count: int
+    points: int
+    seats: List[SeatEnsembleCurve]
+
+
+class SimilarStroke(BaseModel):
+    piece_id: str
+    session_id: str
+    session_name: str
+    session_date: Optional[str] = None
+    seat_position: int
+    stroke_number: int
+    global_athlete_id: Optional[str] = None
+    athlete_name: Optional[str] = None
+    similarity: float  # correlation of the two force-curve shapes, -1 to 1
+
+
+class SimilarAthlete(BaseModel):
+    athlete_id: str
+    name: str
+    squad: Optional[str] = None
+    strokes: int
+    similarity: float
+
+
+class PieceDashboard(BaseModel):
+    piece_id: str
+    strokes: List[StrokeMetric] = []
+    averages: Optional[PieceAverages] = None
+    periodic: Optional[dict] = None
+
+
+class SessionDashboard(BaseModel):
+    session: SessionWithDetails
+    pieces: List[PieceDashboard] = []
+
+
 # ============ Global Athletes Models ============
 
 class GlobalAthlete(BaseModel):
@@ -133,6 +238,17 @@ class GlobalAthlete(BaseModel):
     updated_at: Optional[str] = None
 
 
+class AthleteSearchResult(GlobalAthlete):
+    score: float
+
+
+class DuplicateAthleteCandidate(BaseModel):
+    score: float
+    reason: str  # similar_name, same_name or nickname
+    athlete_a: GlobalAthlete
+    athlete_b: GlobalAthlete
+
+
 class GlobalAthleteUpdate(BaseModel):
     name: Optional[str] = None
     uni: Optional[str] = None
@@ -181,6 +297,27 @@ class AthleteMeasurementsUpdate(BaseModel):
     l_tibia: Optional[float] = None
 
 
+class RosterRow(GlobalAthleteUpdate, AthleteMeasurementsUpdate):
+    """One roster import row: athlete fields and measurements, matched by id, UNI or name."""
+    id: Optional[str] = None
+
+
+class RosterRowResult(BaseModel):
+    row: int
+    status: str  # created, updated, error, or valid when nothing was applied
+    athlete_id: Optional[str] = None
+    name: Optional[str] = None
+    errors: List[str] = []
+
+
+class RosterImportResult(BaseModel):
+    applied: bool
+    created: int
+    updated: int
+    errors: int
+    rows: List[RosterRowResult]
+
+
 class AthleteSessionEntry(BaseModel):
     session_id: str
     session_name: str
@@ -212,6 +349,27 @@ class AthleteTrends(BaseModel):
     data_points: List[AthleteTrendPoint] = []
 
 
+class LeaderboardEntry(BaseModel):
+    rank: int
+    athlete_id: str
+    name: str
+    squad: Optional[str] = None
+    value: float
+    sessions: int
+    strokes: int
+    last_session_date: Optional[str] = None
+
+
+class Leaderboard(BaseModel):
+    metric: str
+    workout_type: Optional[str] = None
+    squad: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    last_n: Optional[int] = None
+    entries: List[LeaderboardEntry] = []
+
+
 # ============ Video Models ============
 
 class VideoSession(BaseModel):
@@ -223,9 +381,61 @@ class VideoSession(BaseModel):
     fps: Optional[float] = None
     offset_ms: int = 0
     piece_id: Optional[str] = None
+    content_hash: Optional[str] = None
     created_at: Optional[str] = None
 
 
+class VideoUploadCreate(BaseModel):
+    session_id: str
+    filename: str
+    size: int
+    piece_id: Optional[str] = None
+
+
+class VideoUpload(BaseModel):
+    id: str
+    session_id: str
+    piece_id: Optional[str] = None
+    original_filename: str
+    total_bytes: int
+    received_bytes: int = 0
+    chunk_size: int
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+
+class VideoAlignmentTrack(BaseModel):
+    """Telemetry resampled to video frames; every array is indexed by frame number."""
+    video_id: str
+    piece_id: str
+    fps: float
+    offset_ms: int
+    base_offset_ms: int
+    frame_count: int
+    stroke_index: List[int]
+    speed: List[Optional[float]]
+    accel: List[Optional[float]]
+    distance: List[Optional[float]]
+    gate_angle: List[List[Optional[float]]]
+    gate_force_x: List[List[Optional[float]]]
+    gate_angle_vel: List[List[Optional[float]]]
+
+
+class RequestProfile(BaseModel):
+    """A stored sampling profile of one request."""
+    id: str
+    created_at: str
+    method: str
+    path: str
+    route: Optional[str] = None
+    piece_id: Optional[str] = None
+    session_id: Optional[str] = None
+    status: Optional[int] = None
+    duration_ms: float
+    samples: int
+    interval_ms: float
+
+
 class VideoSessionUpdate(BaseModel):
     offset_ms: Optional[int] = None
     piece_id: Optional[str] = None
@@ -0,0 +1,182 @@
+"""
+Chunked storage for periodic (high-frequency) telemetry.
+
+Samples are stored in fixed-size chunks keyed by piece and time range, so
+readers can seek to a window or stream a piece without decoding the whole
+blob at once.
+
+Pieces compacted by retention.py to the 'archived' tier keep their chunks
+in a separate cold database at ARCHIVE_PATH instead; the readers here fall
+back to it, so callers do not need to know which tier a piece is in.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+
+from metrics import Counter, Histogram
+from timing import phase
+
+# 500 samples = 10 s at 50 Hz
+CHUNK_SIZE = 500
+
+# Cold store for archived pieces, same periodic_chunks schema as the live database
+ARCHIVE_PATH = Path(os.environ.get("PEACH_ARCHIVE_PATH", Path(__file__).parent / "peach_archive.db"))
+
+# pieces.periodic_tier values
+TIER_RAW = 'raw'
+TIER_DECIMATED = 'decimated'
+TIER_ARCHIVED = 'archived'
+
+DECODE_SECONDS = Histogram(
+    'peach_periodic_chunk_decode_seconds',
+    'Time to decode (and range-filter) one periodic chunk.',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+DECODED_SAMPLES = Counter('peach_periodic_samples_decoded_total', 'Periodic samples returned to readers.')
+
+
+def _decode_chunk(data) -> List[Dict[str, Any]]:
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # json.dumps writes NaN/Infinity for non-finite floats; orjson rejects them
+        return json.loads(data)
+
+
+def connect_archive(readonly: bool = True) -> Optional[sqlite3.Connection]:
+    """Open the cold archive, or return None if it does not exist yet and readonly is set."""
+    if readonly:
+        if not ARCHIVE_PATH.exists():
+            return None
+        conn = sqlite3.connect(f"{ARCHIVE_PATH.as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(ARCHIVE_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _is_archived(cursor, piece_id: str) -> bool:
+    cursor.execute("SELECT periodic_tier FROM pieces WHERE id = ?", (piece_id,))
+    row = cursor.fetchone()
+    return row is not None and row['periodic_tier'] == TIER_ARCHIVED
+
+
+def write_periodic(cursor, piece_id: str, points: List[Dict[str, Any]], chunk_size: int = CHUNK_SIZE) -> int:
+    """Store periodic points for a piece as time-ranged chunks. Returns chunk count."""
+    rows = []
+    for chunk_index, offset in enumerate(range(0, len(points), chunk_size)):
+        chunk = points[offset:offset + chunk_size]
+        times = [p['time_ms'] for p in chunk if p.get('time_ms') is not None]
+        rows.append((
+            piece_id, chunk_index,
+            min(times) if times else None,
+            max(times) if times else None,
+            len(chunk),
+            json.dumps(chunk),
+        ))
+    cursor.executemany("""
+        INSERT INTO periodic_chunks (piece_id, chunk_index, start_ms, end_ms, sample_count, data)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    return len(rows)
+
+
+def delete_periodic(cursor, piece_id: str):
+    """Remove all periodic chunks for a piece from the live database (see purge_archived)."""
+    cursor.execute("DELETE FROM periodic_chunks WHERE piece_id = ?", (piece_id,))
+
+
+def purge_archived(piece_ids: List[str]):
+    """
+    Remove archived chunks for pieces. Called after the live rows are gone
+    and committed, since the archive is a separate database.
+    """
+    conn = connect_archive(readonly=False) if ARCHIVE_PATH.exists() else None
+    if conn is None or not piece_ids:
+        return
+    try:
+        conn.executemany("DELETE FROM periodic_chunks WHERE piece_id = ?", [(p,) for p in piece_ids])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def has_periodic(cursor, piece_id: str) -> bool:
+    cursor.execute("SELECT 1 FROM periodic_chunks WHERE piece_id = ? LIMIT 1", (piece_id,))
+    return cursor.fetchone() is not None or (_is_archived(cursor, piece_id) and ARCHIVE_PATH.exists())
+
+
+def iter_periodic_chunks(
+    cursor,
+    piece_id: str,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield decoded chunks of periodic points in time order.
+
+    When a time range is given, only chunks overlapping it are read and
+    points outside it (or without a timestamp) are dropped.
+    """
+    filtered = start_ms is not None or end_ms is not None
+    if filtered:
+        query = """
+            SELECT data FROM periodic_chunks
+            WHERE piece_id = ?
+              AND end_ms >= COALESCE(?, end_ms)
+              AND start_ms <= COALESCE(?, start_ms)
+            ORDER BY chunk_index
+        """
+        params = (piece_id, start_ms, end_ms)
+    else:
+        query = "SELECT data FROM periodic_chunks WHERE piece_id = ? ORDER BY chunk_index"
+        params = (piece_id,)
+
+    archive = None
+    rows = cursor.execute(query, params)
+    first = rows.fetchone()
+    if first is None and _is_archived(cursor, piece_id):
+        archive = connect_archive()
+        if archive is None:
+            return
+        rows = archive.execute(query, params)
+        first = rows.fetchone()
+    try:
+        for row in chain([first], rows) if first is not None else ():
+            start = time.perf_counter()
+            with phase('decode'):
+                chunk = _decode_chunk(row['data'])
+                if filtered:
+                    chunk = [
+                        p for p in chunk
+                        if p.get('time_ms') is not None
+                        and (start_ms is None or p['time_ms'] >= start_ms)
+                        and (end_ms is None or p['time_ms'] <= end_ms)
+                    ]
+            DECODE_SECONDS.observe(time.perf_counter() - start)
+            DECODED_SAMPLES.inc(len(chunk))
+            if chunk:
+                yield chunk
+    finally:
+        if archive is not None:
+            archive.close()
+
+
+def load_periodic(
+    cursor,
+    piece_id: str,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Load periodic points for a piece, optionally limited to a time range."""
+    points = []
+    for chunk in iter_periodic_chunks(cursor, piece_id, start_ms, end_ms):
+        points.extend(chunk)
+    return points
@@ -0,0 +1,187 @@
+"""
+On-demand request profiling.
+
+When PEACH_ADMIN_TOKEN is set, a request carrying the token in an
+X-Peach-Profile header or a `profile` query parameter is run under a
+sampling profiler. The stacks are written to PROFILES_DIR in collapsed
+("folded") format, which flamegraph.pl, speedscope and inferno read
+directly, next to a JSON file with the method, route, piece id, status
+and duration. The response carries the profile id in X-Peach-Profile-Id.
+
+The sampler is a background thread that reads sys._current_frames()
+every PROFILE_INTERVAL_MS. It records the event-loop thread plus any
+thread currently running backend code, so work handed to the threadpool
+is included; concurrent requests on a busy server will show up too.
+Without an admin token the middleware is not installed, so normal
+requests pay nothing.
+"""
+
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+ADMIN_TOKEN = os.environ.get("PEACH_ADMIN_TOKEN") or None
+
+PROFILES_DIR = Path(__file__).parent / "profiles"
+
+# Matches the interpreter's default GIL switch interval; sampling faster
+# than that mostly repeats the previous stack
+PROFILE_INTERVAL_MS = float(os.environ.get("PEACH_PROFILE_INTERVAL_MS", "5"))
+
+# Oldest profiles are deleted beyond this many
+PROFILE_KEEP = 100
+
+_BACKEND_DIR = str(Path(__file__).parent)
+_PROFILE_ID = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$')
+
+
+def check_admin_token(value: Optional[str]) -> bool:
+    return ADMIN_TOKEN is not None and value is not None and hmac.compare_digest(value, ADMIN_TOKEN)
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    if path.startswith(_BACKEND_DIR):
+        path = path[len(_BACKEND_DIR) + 1:]
+    elif 'site-packages' in path:
+        path = path.split('site-packages', 1)[1].lstrip(os.sep)
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def _runs_backend_code(frame) -> bool:
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(_BACKEND_DIR) and path != __file__:
+            return True
+        frame = frame.f_back
+    return False
+
+
+class _Sampler(threading.Thread):
+    """Collects folded stacks until stopped."""
+
+    def __init__(self, loop_thread: int, interval: float):
+        super().__init__(name='peach-profiler', daemon=True)
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                if thread_id != self.loop_thread and not _runs_backend_code(frame):
+                    continue
+                if thread_id not in names:
+                    names.update((t.ident, t.name) for t in threading.enumerate())
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def _save_profile(sampler: _Sampler, meta: Dict[str, Any]) -> None:
+    PROFILES_DIR.mkdir(exist_ok=True)
+    folded = '\n'.join(f"{stack} {count}" for stack, count in sampler.stacks.most_common())
+    (PROFILES_DIR / f"{meta['id']}.folded").write_text(folded + '\n')
+    (PROFILES_DIR / f"{meta['id']}.json").write_text(json.dumps(meta))
+
+    for old in sorted(PROFILES_DIR.glob('*.json'))[:-PROFILE_KEEP]:
+        old.unlink(missing_ok=True)
+        old.with_suffix('.folded').unlink(missing_ok=True)
+
+
+def list_profiles(limit: int = 50) -> List[Dict[str, Any]]:
+    """Most recent profiles first."""
+    if not PROFILES_DIR.exists():
+        return []
+    paths = sorted(PROFILES_DIR.glob('*.json'), reverse=True)[:limit]
+    return [json.loads(p.read_text()) for p in paths]
+
+
+def profile_path(profile_id: str) -> Optional[Path]:
+    """Path of a stored folded profile, or None if the id is unknown."""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    path = PROFILES_DIR / f"{profile_id}.folded"
+    return path if path.exists() else None
+
+
+class ProfilingMiddleware:
+    """Run requests that carry the admin token under the sampling profiler."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    @staticmethod
+    def _requested(scope: Scope) -> bool:
+        for name, value in scope['headers']:
+            if name == b'x-peach-profile':
+                return check_admin_token(value.decode('latin-1'))
+        query = scope.get('query_string', b'')
+        if b'profile=' not in query:
+            return False
+        return check_admin_token(parse_qs(query.decode('latin-1')).get('profile', [None])[0])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        status = None
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                MutableHeaders(scope=message).append('X-Peach-Profile-Id', profile_id)
+            await send(message)
+
+        sampler = _Sampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            route = scope.get('route')
+            _save_profile(sampler, {
+                'id': profile_id,
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'method': scope['method'],
+                'path': scope['path'],
+                'route': getattr(route, 'path_format', None),
+                'piece_id': scope.get('path_params', {}).get('piece_id'),
+                'session_id': scope.get('path_params', {}).get('session_id'),
+                'status': status,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+                'samples': sampler.samples,
+                'interval_ms': PROFILE_INTERVAL_MS,
+            })
@@ -0,0 +1,296 @@
+"""
+WebSocket telemetry replay.
+
+A piece is replayed as a time-ordered stream of stroke and periodic
+events. Each piece is decoded once into a ReplayBuffer, which holds every
+event already serialized as JSON text and a sorted array of event times.
+Viewers of the same piece share one buffer; a viewer only slices the
+buffer and joins strings. Dozens of connections therefore cost no more
+decoding than one.
+
+Each viewer awaits every send before building its next message. A slow
+client slows only its own replay: later messages carry more events to
+catch up, and nothing queues in the server.
+
+Protocol: the server sends a "start" message, then JSON arrays of events
+(each with "type": "stroke" or "periodic" and "time_ms"), then "end". A
+client may send {"action": "pause"}, {"action": "resume"},
+{"action": "seek", "time_ms": N} or {"action": "speed", "speed": "4"}.
+"""
+
+import asyncio
+import threading
+import weakref
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from cache import LRUCache
+from database import get_db
+from periodic_store import iter_periodic_chunks
+
+# Replay speed parameter -> playback rate (None = as fast as the client reads)
+REPLAY_SPEEDS = {'1': 1.0, '4': 4.0, 'max': None}
+
+# Event subsets a viewer can ask for
+REPLAY_TRACKS = ('all', 'strokes', 'periodic')
+
+# Paced replays send at most one message per tick
+TICK_SECONDS = 0.05
+
+# Events per message, which bounds message size when catching up or at max speed
+MAX_BATCH_EVENTS = 1000
+
+_STROKE_ARRAY_FIELDS = (
+    'swivel_power', 'min_angle', 'max_angle', 'catch_slip', 'finish_slip', 'drive_time',
+    'recovery_time', 'work_pc_q1', 'work_pc_q2', 'work_pc_q3', 'work_pc_q4',
+)
+
+# Recently replayed pieces; buffers in use stay reachable through _live even once evicted
+replay_cache = LRUCache("replay_buffer", maxsize=4)
+_live: "weakref.WeakValueDictionary[str, ReplayBuffer]" = weakref.WeakValueDictionary()
+_loading: Dict[str, Future] = {}
+_loading_lock = threading.Lock()
+
+
+@dataclass
+class ReplayBuffer:
+    """Every event of a piece, serialized once, in time order per track."""
+    piece_id: str
+    # track -> (event times in ms, JSON text per event)
+    tracks: Dict[str, Tuple[np.ndarray, List[str]]]
+    stroke_numbers: np.ndarray
+    stroke_times: np.ndarray
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def time_window(self, stroke_start: Optional[int], stroke_end: Optional[int]) -> Tuple[float, float]:
+        """
+        [start_ms, end_ms) covering strokes stroke_start..stroke_end; each stroke
+        runs until the next one starts.
+        """
+        start_ms, end_ms = -np.inf, np.inf
+        if stroke_start is not None:
+            i = np.searchsorted(self.stroke_numbers, stroke_start, 'left')
+            start_ms = self.stroke_times[i] if i < len(self.stroke_times) else np.inf
+        if stroke_end is not None:
+            i = np.searchsorted(self.stroke_numbers, stroke_end, 'right')
+            end_ms = self.stroke_times[i] if i < len(self.stroke_times) else np.inf
+        return start_ms, end_ms
+
+
+def _track(times: List[int], events: List[str]) -> Tuple[np.ndarray, List[str]]:
+    times = np.asarray(times, dtype=np.int64)
+    order = np.argsort(times, kind='stable')
+    return times[order], [events[i] for i in order]
+
+
+def load_replay_buffer(piece_id: str) -> Optional[ReplayBuffer]:
+    """Decode and serialize a piece's events. Returns None if the piece does not exist."""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM pieces WHERE id = ?", (piece_id,))
+        if cursor.fetchone() is None:
+            return None
+
+        cursor.execute("SELECT * FROM stroke_metrics WHERE piece_id = ? ORDER BY stroke_number", (piece_id,))
+        stroke_times, stroke_events, numbers = [], [], []
+        for row in cursor.fetchall():
+            if row['time_ms'] is None:
+                continue
+            stroke = {key: row[key] for key in row.keys() if key not in ('id', 'piece_id')}
+            for key in _STROKE_ARRAY_FIELDS:
+                if stroke.get(key):
+                    stroke[key] = orjson.loads(stroke[key])
+            stroke_times.append(row['time_ms'])
+            numbers.append(row['stroke_number'])
+            stroke_events.append(orjson.dumps({'type': 'stroke', **stroke}).decode())
+
+        periodic_times, periodic_events = [], []
+        for chunk in iter_periodic_chunks(cursor, piece_id):
+            for point in chunk:
+                if point.get('time_ms') is not None:
+                    periodic_times.append(point['time_ms'])
+                    periodic_events.append(orjson.dumps({'type': 'periodic', **point}).decode())
+
+    # Strokes first at equal times: the stable sort keeps them ahead of the sample
+    return ReplayBuffer(
+        piece_id=piece_id,
+        tracks={
+            'all': _track(stroke_times + periodic_times, stroke_events + periodic_events),
+            'strokes': _track(stroke_times, stroke_events),
+            'periodic': _track(periodic_times, periodic_events),
+        },
+        stroke_numbers=np.asarray(numbers, dtype=np.int64),
+        stroke_times=np.asarray(stroke_times, dtype=np.int64),
+        counts={'strokes': len(stroke_events), 'periodic': len(periodic_events)},
+    )
+
+
+async def get_replay_buffer(piece_id: str) -> Optional[ReplayBuffer]:
+    """The shared buffer for a piece, decoding it at most once however many viewers ask at the same time."""
+    buffer = _live.get(piece_id) or replay_cache.get(piece_id)
+    if buffer is not None:
+        return buffer
+
+    # A concurrent.futures.Future rather than a task, so callers on any event loop can wait on it
+    with _loading_lock:
+        pending = _loading.get(piece_id)
+        loader = pending is None
+        if loader:
+            pending = _loading[piece_id] = Future()
+    if not loader:
+        return await asyncio.wrap_future(pending)
+
+    try:
+        buffer = await run_in_threadpool(load_replay_buffer, piece_id)
+    except BaseException as exc:
+        pending.set_exception(exc)
+        raise
+    else:
+        if buffer is not None:
+            replay_cache.set(piece_id, buffer)
+            _live[piece_id] = buffer
+        pending.set_result(buffer)
+    finally:
+        with _loading_lock:
+            _loading.pop(piece_id, None)
+    return buffer
+
+
+def evict_replay_buffers(piece_ids: Iterable[str]):
+    """Forget buffers for deleted pieces; viewers already connected finish their replay."""
+    piece_ids = set(piece_ids)
+    replay_cache.evict(lambda key: key in piece_ids)
+    for piece_id in piece_ids:
+        _live.pop(piece_id, None)
+
+
+class _ReplayState:
+    """Playback position and clock of one viewer, changed by its control messages."""
+
+    def __init__(self, times: np.ndarray, position: int, speed: Optional[float]):
+        self.times = times
+        self.position = position
+        self.speed = speed
+        self.paused = False
+        self.closed = False
+        self.changed = asyncio.Event()
+        self._anchor()
+
+    def _anchor(self):
+        # Replay time `media_ms` corresponds to loop time `wall`
+        self.wall = asyncio.get_running_loop().time()
+        self.media_ms = float(self.times[self.position]) if self.position < len(self.times) else 0.0
+
+    def due_ms(self) -> float:
+        return self.media_ms + (asyncio.get_running_loop().time() - self.wall) * 1000.0 * self.speed
+
+    def control(self, message: dict):
+        action = message.get('action')
+        if action == 'pause':
+            self.paused = True
+        elif action == 'resume':
+            self.paused = False
+        elif action == 'seek' and isinstance(message.get('time_ms'), (int, float)):
+            self.position = int(np.searchsorted(self.times, message['time_ms'], 'left'))
+        elif action == 'speed' and str(message.get('speed')) in REPLAY_SPEEDS:
+            self.speed = REPLAY_SPEEDS[str(message['speed'])]
+        else:
+            return
+        self._anchor()
+        self.changed.set()
+
+    async def wait(self, seconds: Optional[float]):
+        """Sleep up to `seconds` (forever if None), waking early on a control message."""
+        try:
+            await asyncio.wait_for(self.changed.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        self.changed.clear()
+
+
+async def _receive_controls(websocket: WebSocket, state: _ReplayState):
+    """Apply control messages until the client leaves; binary frames and bad JSON are ignored."""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+            if message.get('text') is None:
+                continue
+            try:
+                control = orjson.loads(message['text'])
+            except orjson.JSONDecodeError:
+                continue
+            if isinstance(control, dict):
+                state.control(control)
+    finally:
+        # However the receiver ends, the sender must not wait on it (e.g. while paused)
+        state.closed = True
+        state.changed.set()
+
+
+async def stream_replay(
+    websocket: WebSocket,
+    buffer: ReplayBuffer,
+    speed: Optional[float],
+    track: str = 'all',
+    stroke_start: Optional[int] = None,
+    stroke_end: Optional[int] = None,
+):
+    """Replay a buffer over an accepted WebSocket and close it, unless the client leaves first."""
+    times, events = buffer.tracks[track]
+    start_ms, end_ms = buffer.time_window(stroke_start, stroke_end)
+    first = int(np.searchsorted(times, start_ms, 'left'))
+    stop = int(np.searchsorted(times, end_ms, 'left'))
+    state = _ReplayState(times, first, speed)
+
+    await websocket.send_text(orjson.dumps({
+        'type': 'start',
+        'piece_id': buffer.piece_id,
+        'track': track,
+        'speed': speed,
+        'events': max(stop - first, 0),
+        'start_ms': int(times[first]) if first < stop else None,
+        'end_ms': int(times[stop - 1]) if first < stop else None,
+        'strokes': buffer.counts['strokes'],
+        'periodic': buffer.counts['periodic'],
+    }).decode())
+
+    receiver = asyncio.create_task(_receive_controls(websocket, state))
+    try:
+        while not state.closed:
+            if state.position >= stop:
+                break
+            if state.paused:
+                await state.wait(None)
+                continue
+            position = state.position
+            if state.speed is None:
+                end = min(position + MAX_BATCH_EVENTS, stop)
+            else:
+                due = state.due_ms()
+                end = min(int(np.searchsorted(times, due, 'right')), position + MAX_BATCH_EVENTS, stop)
+                if end <= position:
+                    await state.wait(min(TICK_SECONDS, (times[position] - due) / 1000.0 / state.speed))
+                    continue
+            await websocket.send_text('[' + ','.join(events[position:end]) + ']')
+            if state.position == position:
+                state.position = end
+            if state.speed is not None:
+                await state.wait(TICK_SECONDS)
+            else:
+                # Let the control receiver and other viewers run between batches
+                await asyncio.sleep(0)
+        if not state.closed:
+            await websocket.send_text('{"type":"end"}')
+            await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
@@ -0,0 +1,307 @@
+"""
+Tiered retention for periodic telemetry.
+
+50 Hz periodic chunks are most of the database, and raw samples are
+rarely looked at once a session is a season old. This compacts aged
+pieces into one of two tiers, recorded in pieces.periodic_tier:
+
+    decimated   every DECIMATE_FACTOR-th sample stays in the live database
+    archived    the chunks move unchanged to a cold database at ARCHIVE_PATH
+
+Stroke metrics are never touched. Before a raw piece is compacted its
+per-stroke force and angle curves are stored in stroke_curves, so the
+ensemble force-curve endpoint keeps full-rate results. Readers in
+periodic_store serve whichever tier a piece is in; cached video alignment
+tracks are dropped and rebuild from the new tier on demand.
+
+Each piece is compacted in its own short write transaction. Freed pages
+are then returned to the filesystem a step at a time with
+`PRAGMA incremental_vacuum`, which needs auto_vacuum=INCREMENTAL. New
+databases get that from init_db; an existing one is converted once with
+--convert-vacuum (a full VACUUM, best run while the server is stopped).
+
+Usage (from backend/):
+    python -m retention --decimate-after 180 --archive-after 540
+    python -m retention --decimate-after 180 --dry-run
+    python -m retention --convert-vacuum
+"""
+
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from athlete_search import rebuild_search_index
+from database import DATABASE_PATH, get_connection, get_db, init_db, write_db, writer_lock
+from force_curves import ensemble_cache, pack_curves, stroke_curves
+from periodic_store import (
+    ARCHIVE_PATH, TIER_ARCHIVED, TIER_DECIMATED, TIER_RAW,
+    connect_archive, delete_periodic, load_periodic, write_periodic,
+)
+
+# 50 Hz -> 10 Hz
+DECIMATE_FACTOR = 5
+
+# Pages freed per incremental_vacuum transaction (4 KiB pages: 8 MiB)
+VACUUM_STEP_PAGES = 2048
+
+_TIER_RANK = {TIER_RAW: 0, TIER_DECIMATED: 1, TIER_ARCHIVED: 2}
+
+
+@dataclass
+class RetentionPolicy:
+    """Age thresholds in days (by session date) for each tier; None disables a tier."""
+
+    decimate_after_days: Optional[float] = None
+    archive_after_days: Optional[float] = None
+    decimate_factor: int = DECIMATE_FACTOR
+
+    def target_tier(self, age_days: Optional[float]) -> str:
+        if age_days is None:
+            return TIER_RAW
+        if self.archive_after_days is not None and age_days >= self.archive_after_days:
+            return TIER_ARCHIVED
+        if self.decimate_after_days is not None and age_days >= self.decimate_after_days:
+            return TIER_DECIMATED
+        return TIER_RAW
+
+
+def find_candidates(cursor, policy: RetentionPolicy) -> List[Dict[str, Any]]:
+    """Pieces whose tier is behind the policy, oldest first."""
+    cursor.execute("""
+        SELECT p.id AS piece_id, p.periodic_tier,
+               julianday('now') - julianday(COALESCE(s.session_date, s.created_at)) AS age_days
+        FROM pieces p
+        JOIN sessions s ON s.id = p.session_id
+        WHERE p.periodic_tier != ?
+        ORDER BY age_days DESC
+    """, (TIER_ARCHIVED,))
+    candidates = []
+    for row in cursor.fetchall():
+        target = policy.target_tier(row['age_days'])
+        if _TIER_RANK[target] > _TIER_RANK[row['periodic_tier']]:
+            candidates.append({**dict(row), 'target': target})
+    return candidates
+
+
+def _init_archive(conn):
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS periodic_chunks (
+            piece_id TEXT NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            start_ms INTEGER,
+            end_ms INTEGER,
+            sample_count INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (piece_id, chunk_index)
+        )
+    """)
+
+
+def compact_piece(piece_id: str, target: str, decimate_factor: int = DECIMATE_FACTOR) -> Optional[Dict[str, Any]]:
+    """
+    Move one piece's periodic data to `target`. Returns byte counts, or None
+    if the piece was deleted or compacted by someone else meanwhile.
+    """
+    # Periodic data is immutable once ingested, so it is read before taking the writer lock
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT periodic_tier FROM pieces WHERE id = ?", (piece_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        tier = row['periodic_tier']
+        cursor.execute("""
+            SELECT chunk_index, start_ms, end_ms, sample_count, data FROM periodic_chunks
+            WHERE piece_id = ? ORDER BY chunk_index
+        """, (piece_id,))
+        chunks = [tuple(r) for r in cursor.fetchall()]
+        points = load_periodic(cursor, piece_id) if tier == TIER_RAW or target == TIER_DECIMATED else []
+        cursor.execute("SELECT time_ms FROM stroke_metrics WHERE piece_id = ? ORDER BY stroke_number", (piece_id,))
+        stroke_times = [r['time_ms'] for r in cursor.fetchall()]
+
+    # Curves from decimated data would be worse than the ones already stored
+    curves = stroke_curves(points, stroke_times) if tier == TIER_RAW else None
+
+    if target == TIER_ARCHIVED and chunks:
+        # Committed before the live rows go, so a crash in between leaves a
+        # duplicate that the next run overwrites rather than a gap
+        archive = connect_archive(readonly=False)
+        try:
+            _init_archive(archive)
+            archive.executemany("""
+                INSERT OR REPLACE INTO periodic_chunks (piece_id, chunk_index, start_ms, end_ms, sample_count, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(piece_id, *chunk) for chunk in chunks])
+            archive.commit()
+        finally:
+            archive.close()
+
+    with write_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT periodic_tier FROM pieces WHERE id = ?", (piece_id,))
+        row = cursor.fetchone()
+        if row is None or row['periodic_tier'] != tier:
+            return None
+        if curves is not None:
+            force, angle = curves
+            cursor.execute("""
+                INSERT OR REPLACE INTO stroke_curves (piece_id, stroke_count, grid_points, force, angle)
+                VALUES (?, ?, ?, ?, ?)
+            """, (piece_id, force.shape[0], force.shape[1], pack_curves(force), pack_curves(angle)))
+        delete_periodic(cursor, piece_id)
+        if target == TIER_DECIMATED:
+            write_periodic(cursor, piece_id, points[::decimate_factor])
+        cursor.execute("""
+            UPDATE pieces SET periodic_tier = ?, compacted_at = CURRENT_TIMESTAMP WHERE id = ?
+        """, (target, piece_id))
+        # Built from the old samples; rebuilt from the new tier on next request
+        cursor.execute("DELETE FROM video_alignment_tracks WHERE piece_id = ?", (piece_id,))
+        cursor.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM periodic_chunks WHERE piece_id = ?", (piece_id,))
+        live_after = cursor.fetchone()[0]
+
+    ensemble_cache.evict(lambda key: key[0] == piece_id)
+    return {
+        'piece_id': piece_id,
+        'from': tier,
+        'to': target,
+        'live_bytes_before': sum(len(chunk[4]) for chunk in chunks) if tier != TIER_ARCHIVED else 0,
+        'live_bytes_after': live_after,
+    }
+
+
+def sweep_archive() -> int:
+    """Drop archived chunks whose piece no longer exists. Returns pieces removed."""
+    archive = connect_archive(readonly=False) if ARCHIVE_PATH.exists() else None
+    if archive is None:
+        return 0
+    try:
+        archived = {row['piece_id'] for row in archive.execute("SELECT DISTINCT piece_id FROM periodic_chunks")}
+        with get_db() as conn:
+            live = {row['id'] for row in conn.execute("SELECT id FROM pieces")}
+        orphans = archived - live
+        archive.executemany("DELETE FROM periodic_chunks WHERE piece_id = ?", [(p,) for p in orphans])
+        archive.commit()
+        if orphans:
+            archive.executescript("PRAGMA incremental_vacuum;")
+        return len(orphans)
+    finally:
+        archive.close()
+
+
+def reclaim_space(step_pages: int = VACUUM_STEP_PAGES) -> int:
+    """
+    Return free pages to the filesystem, step_pages per write transaction
+    so uploads are not held up behind one long vacuum. Returns pages freed.
+    """
+    with get_db() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+    freed = 0
+    step_freed = None
+    while step_freed != 0:
+        with writer_lock():
+            conn = get_connection()
+            try:
+                free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                # incremental_vacuum frees one page per step of the statement;
+                # executescript steps it to completion, execute() would stop after one
+                conn.executescript(f"PRAGMA incremental_vacuum({min(step_pages, free)});" if free else "")
+                step_freed = free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            finally:
+                conn.close()
+        freed += step_freed
+
+    with writer_lock():
+        conn = get_connection()
+        try:
+            # The database file only shrinks once the WAL is checkpointed
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        finally:
+            conn.close()
+    return freed
+
+
+def convert_to_incremental_vacuum():
+    """One-time switch of an existing database to auto_vacuum=INCREMENTAL (rewrites the whole file)."""
+    with writer_lock():
+        conn = get_connection()
+        try:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            # VACUUM may renumber global_athletes rowids, which the search index refers to
+            rebuild_search_index(conn.cursor())
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def run(policy: RetentionPolicy, dry_run: bool = False, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Compact every piece behind the policy, then reclaim the freed space."""
+    with get_db() as conn:
+        candidates = find_candidates(conn.cursor(), policy)
+    if limit is not None:
+        candidates = candidates[:limit]
+
+    summary = {'candidates': len(candidates), TIER_DECIMATED: 0, TIER_ARCHIVED: 0,
+               'live_bytes_freed': 0, 'pages_freed': 0, 'orphans_swept': 0}
+    if dry_run:
+        for candidate in candidates:
+            summary[candidate['target']] += 1
+        return summary
+
+    for i, candidate in enumerate(candidates, 1):
+        result = compact_piece(candidate['piece_id'], candidate['target'], policy.decimate_factor)
+        if result is not None:
+            summary[result['to']] += 1
+            summary['live_bytes_freed'] += result['live_bytes_before'] - result['live_bytes_after']
+        print(f"\r{i}/{len(candidates)} pieces compacted", end='', flush=True)
+    if candidates:
+        print()
+    summary['orphans_swept'] = sweep_archive()
+    summary['pages_freed'] = reclaim_space()
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--decimate-after', type=float, metavar='DAYS', help='decimate pieces older than this')
+    parser.add_argument('--archive-after', type=float, metavar='DAYS', help='archive pieces older than this')
+    parser.add_argument('--factor', type=int, default=DECIMATE_FACTOR, help='keep every Nth sample when decimating')
+    parser.add_argument('--limit', type=int, help='compact at most this many pieces')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be compacted')
+    parser.add_argument('--convert-vacuum', action='store_true',
+                        help='switch an existing database to incremental vacuum (full VACUUM)')
+    args = parser.parse_args(argv)
+
+    if not (args.decimate_after is not None or args.archive_after is not None or args.convert_vacuum):
+        parser.error("give --decimate-after and/or --archive-after, or --convert-vacuum")
+    if args.factor < 2:
+        parser.error("--factor must be at least 2")
+
+    init_db()
+    if args.convert_vacuum:
+        start = time.perf_counter()
+        convert_to_incremental_vacuum()
+        print(f"Converted {DATABASE_PATH} to incremental vacuum in {time.perf_counter() - start:.1f}s")
+        if args.decimate_after is None and args.archive_after is None:
+            return 0
+
+    size_before = os.path.getsize(DATABASE_PATH)
+    summary = run(RetentionPolicy(args.decimate_after, args.archive_after, args.factor), args.dry_run, args.limit)
+    if args.dry_run:
+        print(f"Would decimate {summary[TIER_DECIMATED]} and archive {summary[TIER_ARCHIVED]} pieces")
+        return 0
+    print(f"Decimated {summary[TIER_DECIMATED]}, archived {summary[TIER_ARCHIVED]} pieces; "
+          f"freed {summary['live_bytes_freed'] / 1e6:.1f} MB of periodic data, {summary['pages_freed']} pages; "
+          f"{DATABASE_PATH.name} {size_before / 1e6:.1f} MB -> {os.path.getsize(DATABASE_PATH) / 1e6:.1f} MB")
+    if summary['orphans_swept']:
+        print(f"Removed archived data for {summary['orphans_swept']} deleted pieces")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Per-athlete rollups and squad leaderboards.
+
+Ingest writes one athlete_session_rollups row per seat and session. The row
+holds a sum and a count for each leaderboard metric, so rows from any set
+of sessions combine into a stroke-weighted average by adding them up.
+athlete_rollups keeps one pre-summed row per athlete and workout type. Rows
+for an (athlete, workout type) are refreshed when a session is added,
+deleted or has its workout type changed.
+
+An all-time board reads one athlete_rollups row per athlete. A board over
+an athlete's last N sessions reads at most N session rows per athlete
+through the (athlete, workout type, date) index. Neither depends on how
+much history is stored.
+
+Usage (from backend/), after changing how a metric is computed:
+    python -m rollups --rebuild
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Leaderboard metric -> True when a lower value ranks higher
+METRICS = {
+    'power': False,
+    'stroke_length': False,
+    'effective_length': False,
+    'catch_slip': True,
+    'finish_slip': True,
+}
+
+_SUM_COLUMNS = [f"{metric}_{part}" for metric in METRICS for part in ('sum', 'n')]
+
+_STROKE_FIELDS = ('swivel_power', 'min_angle', 'max_angle', 'catch_slip', 'finish_slip')
+
+
+def _seat_value(values, seat_idx):
+    return values[seat_idx] if values and seat_idx < len(values) else None
+
+
+def seat_totals(strokes: Iterable[Dict[str, Any]], seat_idx: int) -> Dict[str, float]:
+    """
+    Sums and counts of each metric for one seat across decoded strokes.
+
+    Matches the per-athlete averages shown on the dashboard: slips are
+    absolute, and effective length is stroke length minus both slips.
+    """
+    totals = {column: 0 for column in _SUM_COLUMNS}
+    totals['strokes'] = 0
+
+    def add(metric, value):
+        totals[f"{metric}_sum"] += value
+        totals[f"{metric}_n"] += 1
+
+    for stroke in strokes:
+        totals['strokes'] += 1
+        power = _seat_value(stroke['swivel_power'], seat_idx)
+        min_angle = _seat_value(stroke['min_angle'], seat_idx)
+        max_angle = _seat_value(stroke['max_angle'], seat_idx)
+        catch_slip = _seat_value(stroke['catch_slip'], seat_idx)
+        finish_slip = _seat_value(stroke['finish_slip'], seat_idx)
+        if power is not None:
+            add('power', power)
+        if min_angle is not None and max_angle is not None:
+            length = max_angle - min_angle
+            add('stroke_length', length)
+            add('effective_length', length - abs(catch_slip or 0) - abs(finish_slip or 0))
+        if catch_slip is not None:
+            add('catch_slip', abs(catch_slip))
+        if finish_slip is not None:
+            add('finish_slip', abs(finish_slip))
+    return totals
+
+
+def record_session(cursor, session_id: str, session_date: Optional[str], workout_type: Optional[str],
+                   seats: Sequence[Tuple[str, int]], strokes: Sequence[Dict[str, Any]]):
+    """
+    Write the rollup rows for a session and refresh its athletes' totals.
+
+    Args:
+        seats: (global_athlete_id, seat_position) per rower
+        strokes: Decoded stroke dicts from every piece of the session
+    """
+    workout_type = workout_type or ''
+    rows = []
+    for global_athlete_id, seat_position in seats:
+        totals = seat_totals(strokes, seat_position - 1)
+        rows.append((session_id, seat_position, global_athlete_id, session_date, workout_type,
+                     totals['strokes'], *(totals[column] for column in _SUM_COLUMNS)))
+    cursor.executemany(f"""
+        INSERT OR REPLACE INTO athlete_session_rollups (
+            session_id, seat_position, global_athlete_id, session_date, workout_type, strokes,
+            {', '.join(_SUM_COLUMNS)}
+        ) VALUES ({', '.join('?' * (6 + len(_SUM_COLUMNS)))})
+    """, rows)
+    refresh_athlete_rollups(cursor, {(gid, workout_type) for gid, _ in seats})
+
+
+def refresh_athlete_rollups(cursor, keys: Set[Tuple[str, str]]):
+    """Re-sum athlete_rollups for the given (global_athlete_id, workout_type) keys."""
+    keys = sorted(keys)
+    cursor.executemany(
+        "DELETE FROM athlete_rollups WHERE global_athlete_id = ? AND workout_type = ?", keys
+    )
+    cursor.executemany(f"""
+        INSERT INTO athlete_rollups (
+            global_athlete_id, workout_type, sessions, strokes, first_session_date, last_session_date,
+            {', '.join(_SUM_COLUMNS)}
+        )
+        SELECT global_athlete_id, workout_type, COUNT(DISTINCT session_id), SUM(strokes),
+               MIN(session_date), MAX(session_date),
+               {', '.join(f'SUM({column})' for column in _SUM_COLUMNS)}
+        FROM athlete_session_rollups
+        WHERE global_athlete_id = ? AND workout_type = ?
+        GROUP BY global_athlete_id, workout_type
+    """, keys)
+
+
+def _session_keys(cursor, session_id: str) -> Set[Tuple[str, str]]:
+    cursor.execute(
+        "SELECT global_athlete_id, workout_type FROM athlete_session_rollups WHERE session_id = ?",
+        (session_id,)
+    )
+    return {(row['global_athlete_id'], row['workout_type']) for row in cursor.fetchall()}
+
+
+def retag_session(cursor, session_id: str, workout_type: Optional[str]):
+    """Move a session's rollups to a new workout type."""
+    workout_type = workout_type or ''
+    old_keys = _session_keys(cursor, session_id)
+    cursor.execute("UPDATE athlete_session_rollups SET workout_type = ? WHERE session_id = ?",
+                   (workout_type, session_id))
+    refresh_athlete_rollups(cursor, old_keys | {(gid, workout_type) for gid, _ in old_keys})
+
+
+def delete_session_rollups(cursor, session_id: str):
+    """Remove a session's rollups and take it out of its athletes' totals."""
+    keys = _session_keys(cursor, session_id)
+    cursor.execute("DELETE FROM athlete_session_rollups WHERE session_id = ?", (session_id,))
+    refresh_athlete_rollups(cursor, keys)
+
+
+def rebuild_rollups(cursor):
+    """Recompute every rollup from stored strokes."""
+    cursor.execute("DELETE FROM athlete_session_rollups")
+    cursor.execute("DELETE FROM athlete_rollups")
+    cursor.execute("SELECT id, session_date, workout_type FROM sessions")
+    for session in cursor.fetchall():
+        cursor.execute("""
+            SELECT global_athlete_id, seat_position FROM athletes
+            WHERE session_id = ? AND global_athlete_id IS NOT NULL
+        """, (session['id'],))
+        seats = [(row['global_athlete_id'], row['seat_position']) for row in cursor.fetchall()]
+        if not seats:
+            continue
+        cursor.execute(f"""
+            SELECT {', '.join(_STROKE_FIELDS)} FROM stroke_metrics
+            WHERE piece_id IN (SELECT id FROM pieces WHERE session_id = ?)
+        """, (session['id'],))
+        strokes = [{field: json.loads(row[field]) if row[field] else None for field in _STROKE_FIELDS}
+                   for row in cursor.fetchall()]
+        record_session(cursor, session['id'], session['session_date'], session['workout_type'], seats, strokes)
+
+
+def leaderboard(
+    cursor,
+    metric: str,
+    workout_type: Optional[str] = None,
+    squad: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    last_n: Optional[int] = None,
+    min_sessions: int = 1,
+    limit: int = 50,
+    ascending: Optional[bool] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Athletes ranked by the stroke-weighted average of `metric`.
+
+    With neither a date window nor `last_n` the board is all-time and read
+    from athlete_rollups; otherwise it sums each athlete's session rollups
+    in the window, keeping only their `last_n` most recent sessions.
+    """
+    if ascending is None:
+        ascending = METRICS[metric]
+    athlete_clauses, athlete_params = ["g.session_count > 0"], []
+    if squad:
+        athlete_clauses.append("g.squad = ?")
+        athlete_params.append(squad.strip().lower())
+
+    if date_from is None and date_to is None and last_n is None:
+        type_clause, type_params = "", []
+        if workout_type is not None:
+            type_clause = "AND r.workout_type = ?"
+            type_params.append(workout_type)
+        source = f"""
+            JOIN athlete_rollups r ON r.global_athlete_id = g.id {type_clause}
+        """
+        sessions = "SUM(r.sessions)"
+        last_date = "MAX(r.last_session_date)"
+        params = type_params
+    else:
+        window_clauses, params = [], []
+        if workout_type is not None:
+            window_clauses.append("w.workout_type = ?")
+            params.append(workout_type)
+        if date_from:
+            window_clauses.append("w.session_date >= ?")
+            params.append(date_from)
+        if date_to:
+            window_clauses.append("w.session_date <= ?")
+            params.append(date_to)
+        window = ''.join(f" AND {clause}" for clause in window_clauses)
+        limit_clause = ""
+        if last_n is not None:
+            limit_clause = "LIMIT ?"
+            params.append(last_n)
+        source = f"""
+            JOIN athlete_session_rollups r ON r.rowid IN (
+                SELECT w.rowid FROM athlete_session_rollups w
+                WHERE w.global_athlete_id = g.id {window}
+                ORDER BY w.session_date DESC, w.session_id DESC
+                {limit_clause}
+            )
+        """
+        sessions = "COUNT(DISTINCT r.session_id)"
+        last_date = "MAX(r.session_date)"
+
+    cursor.execute(f"""
+        SELECT g.id AS athlete_id, g.name, g.squad,
+               SUM(r.{metric}_sum) * 1.0 / SUM(r.{metric}_n) AS value,
+               {sessions} AS sessions, SUM(r.strokes) AS strokes, {last_date} AS last_session_date
+        FROM global_athletes g
+        {source}
+        WHERE {' AND '.join(athlete_clauses)}
+        GROUP BY g.id
+        HAVING SUM(r.{metric}_n) > 0 AND {sessions} >= ?
+        ORDER BY value {'ASC' if ascending else 'DESC'}, g.name
+        LIMIT ?
+    """, [*params, *athlete_params, min_sessions, limit])
+
+    entries = []
+    for rank, row in enumerate(cursor.fetchall(), 1):
+        entries.append({**dict(row), 'rank': rank, 'value': round(row['value'], 2)})
+    return entries
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rebuild', action='store_true', help='recompute every rollup from stored strokes')
+    args = parser.parse_args(argv)
+    if not args.rebuild:
+        parser.error("nothing to do (pass --rebuild)")
+
+    from database import init_db, write_db
+    init_db()
+    with write_db() as conn:
+        rebuild_rollups(conn.cursor())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
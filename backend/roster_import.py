@@ -0,0 +1,206 @@
+"""
+Bulk roster and measurements import.
+
+A roster is a list of rows (a JSON array or a CSV with one column per
+field) carrying any of the GlobalAthleteUpdate and AthleteMeasurementsUpdate
+fields. Each row is matched to a global athlete by `id`, else `uni`, else
+normalized name among athletes without a UNI; unmatched rows with a name
+create a new athlete. Blank fields leave the stored value unchanged.
+
+Every row is validated and matched before anything is written. If any
+row has an error nothing is applied; otherwise all rows are written in
+one transaction with one executemany per table. Rows that pass but are
+not written (another row failed, or a dry run) are reported as 'valid'.
+"""
+
+import csv
+import datetime
+import io
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from athlete_identity import AthleteIdentityMap, normalize_name
+from models import AthleteMeasurementsUpdate, GlobalAthleteUpdate, RosterRow
+
+ATHLETE_FIELDS = list(GlobalAthleteUpdate.model_fields)
+MEASUREMENT_FIELDS = list(AthleteMeasurementsUpdate.model_fields)
+ROSTER_FIELDS = {'id', *ATHLETE_FIELDS, *MEASUREMENT_FIELDS}
+
+# Must be positive when given
+_POSITIVE_FIELDS = {'weight', *MEASUREMENT_FIELDS}
+
+# Set by parse_roster_csv on rows whose cell count does not match the header
+_EXTRA_CELLS = '__extra_cells__'
+_MISSING_CELLS = '__missing_cells__'
+
+
+def parse_roster_csv(text: str) -> List[Dict[str, Any]]:
+    """
+    CSV rows keyed by (stripped) header, values stripped; blank cells count
+    as unset. Rows with more non-blank cells than the header, or fewer
+    cells, are marked so validation reports them.
+    """
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')), restkey=_EXTRA_CELLS)
+    rows = []
+    for record in reader:
+        extra = [cell for cell in record.pop(_EXTRA_CELLS, []) if cell.strip()]
+        row = {(key or '').strip(): value.strip() for key, value in record.items() if isinstance(value, str)}
+        missing = [(key or '').strip() for key, value in record.items() if value is None]
+        if extra:
+            row[_EXTRA_CELLS] = len(extra)
+        if missing:
+            row[_MISSING_CELLS] = missing
+        rows.append(row)
+    return rows
+
+
+def _validate(raw: Any) -> Tuple[Optional[RosterRow], List[str]]:
+    if not isinstance(raw, dict):
+        return None, ["row must be an object"]
+    raw = dict(raw)
+    errors = []
+    if _EXTRA_CELLS in raw:
+        errors.append(f"{raw.pop(_EXTRA_CELLS)} more cell(s) than the header has columns")
+    if _MISSING_CELLS in raw:
+        errors.append(f"missing cells for: {', '.join(raw.pop(_MISSING_CELLS))}")
+    errors += [f"unknown field '{key}'" for key in raw if key not in ROSTER_FIELDS]
+    values = {key: value for key, value in raw.items()
+              if key in ROSTER_FIELDS and value is not None and value != ''}
+    try:
+        row = RosterRow(**values)
+    except ValidationError as exc:
+        errors.extend(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in exc.errors())
+        return None, errors
+
+    for field in _POSITIVE_FIELDS:
+        value = getattr(row, field)
+        if value is not None and value <= 0:
+            errors.append(f"{field}: must be positive")
+    if row.dob is not None:
+        try:
+            datetime.date.fromisoformat(row.dob)
+        except ValueError:
+            errors.append("dob: expected YYYY-MM-DD")
+    if row.name is not None:
+        row.name = row.name.strip()
+    if row.uni is not None:
+        row.uni = row.uni.strip().lower() or None
+    if row.squad is not None:
+        row.squad = row.squad.strip().lower()
+    if not (row.id or row.uni or row.name):
+        errors.append("needs an id, uni or name to match an athlete")
+    return row, errors
+
+
+def import_roster(cursor, raw_rows: List[Any], apply: bool = True) -> Dict[str, Any]:
+    """
+    Validate, match and (if everything is valid and `apply` is set) write
+    a roster using the caller's cursor. Returns a RosterImportResult dict.
+    """
+    results, rows = [], []
+    for index, raw in enumerate(raw_rows, 1):
+        row, errors = _validate(raw)
+        rows.append(row)
+        results.append({'row': index, 'status': 'error' if errors else None, 'athlete_id': None,
+                        'name': row.name if row else None, 'errors': errors})
+
+    valid = [(row, result) for row, result in zip(rows, results) if row is not None and not result['errors']]
+
+    # Look up every id, UNI and name in the roster in a few set-based queries
+    ids = sorted({row.id for row, _ in valid if row.id})
+    known_ids: Dict[str, Dict[str, Any]] = {}
+    if ids:
+        cursor.execute(f"SELECT id, uni, name FROM global_athletes WHERE id IN ({','.join('?' * len(ids))})", ids)
+        known_ids = {r['id']: dict(r) for r in cursor.fetchall()}
+    identity = AthleteIdentityMap()
+    identity.load(
+        cursor,
+        {row.uni for row, _ in valid if row.uni},
+        {normalize_name(row.name) for row, _ in valid if row.name and not row.uni and not row.id},
+    )
+
+    claimed: Dict[str, int] = {}  # athlete id or new-athlete key -> first row
+    for row, result in valid:
+        errors = result['errors']
+        if row.id:
+            target = row.id if row.id in known_ids else None
+            if target is None:
+                errors.append(f"no athlete with id {row.id}")
+            elif row.uni and identity.by_uni.get(row.uni, target) != target:
+                errors.append(f"uni {row.uni} belongs to another athlete")
+        elif row.uni:
+            target = identity.by_uni.get(row.uni)
+        else:
+            target = identity.by_name.get(normalize_name(row.name))
+        if errors:
+            continue
+
+        if target is None and not row.name:
+            errors.append("no matching athlete; a name is needed to create one")
+            continue
+        key = target or f"new:{row.uni or normalize_name(row.name)}"
+        if key in claimed:
+            errors.append(f"same athlete as row {claimed[key]}")
+            continue
+        claimed[key] = result['row']
+        result['status'] = 'updated' if target else 'created'
+        result['athlete_id'] = target or str(uuid.uuid4())
+        if target and result['name'] is None:
+            result['name'] = known_ids.get(target, {}).get('name')
+
+    for result in results:
+        if result['errors']:
+            result['status'] = 'error'
+    error_count = sum(1 for r in results if r['status'] == 'error')
+    summary = {'applied': False, 'created': 0, 'updated': 0, 'errors': error_count, 'rows': results}
+    if error_count or not apply:
+        for result in results:
+            if result['status'] != 'error':
+                if result['status'] == 'created':
+                    result['athlete_id'] = None
+                result['status'] = 'valid'
+        return summary
+
+    _write(cursor, [(row, result) for row, result in zip(rows, results)])
+    summary.update(
+        applied=True,
+        created=sum(1 for r in results if r['status'] == 'created'),
+        updated=sum(1 for r in results if r['status'] == 'updated'),
+    )
+    return summary
+
+
+def _write(cursor, planned):
+    inserts, updates, measurements = [], [], []
+    for row, result in planned:
+        athlete_id = result['athlete_id']
+        values = [getattr(row, field) for field in ATHLETE_FIELDS]
+        name_key = normalize_name(row.name) if row.name else None
+        if result['status'] == 'created':
+            inserts.append((athlete_id, name_key, *values))
+        elif any(v is not None for v in values):
+            updates.append((*values, name_key, athlete_id))
+        measured = [getattr(row, field) for field in MEASUREMENT_FIELDS]
+        if any(v is not None for v in measured):
+            measurements.append((str(uuid.uuid4()), athlete_id, *measured))
+
+    cursor.executemany(f"""
+        INSERT INTO global_athletes (id, name_key, {', '.join(ATHLETE_FIELDS)})
+        VALUES (?, ?, {', '.join('?' * len(ATHLETE_FIELDS))})
+    """, inserts)
+    cursor.executemany(f"""
+        UPDATE global_athletes
+        SET {', '.join(f'{field} = COALESCE(?, {field})' for field in ATHLETE_FIELDS)},
+            name_key = COALESCE(?, name_key),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, updates)
+    cursor.executemany(f"""
+        INSERT INTO athlete_measurements (id, athlete_id, {', '.join(MEASUREMENT_FIELDS)})
+        VALUES (?, ?, {', '.join('?' * len(MEASUREMENT_FIELDS))})
+        ON CONFLICT (athlete_id) DO UPDATE SET
+            {', '.join(f'{field} = COALESCE(excluded.{field}, {field})' for field in MEASUREMENT_FIELDS)},
+            measured_at = CURRENT_TIMESTAMP
+    """, measurements)
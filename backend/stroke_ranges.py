@@ -0,0 +1,184 @@
+"""
+Stroke-range statistics from running sums.
+
+For each piece, stroke_prefix_sums keeps, after every stroke, the running
+count, sum and sum of squares of each per-seat metric and of rating and
+boat speed. The mean and standard deviation over any stroke window are
+then the difference of two of those rows. A query reads those two rows,
+plus a binary search of the stroke numbers, with incremental blob I/O,
+so its cost does not depend on how long the piece is.
+"""
+
+import json
+import math
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from force_curves import periodic_matrix
+
+SEATS = 8
+
+# Per-seat metric -> rounding of its mean and std
+SEAT_METRICS = {
+    'power': 2,
+    'stroke_length': 2,
+    'effective_length': 2,
+    'catch_slip': 2,
+    'finish_slip': 2,
+    'drive_time': 4,
+    'recovery_time': 4,
+}
+BOAT_METRICS = {'rating': 2, 'boat_speed': 4}
+
+# Channels are seat-major (seat 1's metrics, then seat 2's, ...), then the boat metrics
+CHANNELS = SEATS * len(SEAT_METRICS) + len(BOAT_METRICS)
+
+# Each prefix row holds (count, sum, sum of squares) per channel as little-endian float64
+_ROW_BYTES = CHANNELS * 3 * 8
+
+
+def channel_values(strokes: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """
+    (strokes, CHANNELS) metric values with NaN where missing, computed like
+    the per-athlete piece averages (absolute slips; effective length is
+    stroke length minus both slips).
+    """
+    power = periodic_matrix(strokes, 'swivel_power', SEATS)
+    length = periodic_matrix(strokes, 'max_angle', SEATS) - periodic_matrix(strokes, 'min_angle', SEATS)
+    catch_slip = np.abs(periodic_matrix(strokes, 'catch_slip', SEATS))
+    finish_slip = np.abs(periodic_matrix(strokes, 'finish_slip', SEATS))
+    effective = length - np.nan_to_num(catch_slip) - np.nan_to_num(finish_slip)
+    seat_values = np.stack([
+        power, length, effective, catch_slip, finish_slip,
+        periodic_matrix(strokes, 'drive_time', SEATS),
+        periodic_matrix(strokes, 'recovery_time', SEATS),
+    ], axis=2)
+
+    # Zero rating or speed means not recorded, as in the piece averages
+    boat_values = np.array([
+        [stroke['rating'] or np.nan, stroke['avg_boat_speed'] or np.nan] for stroke in strokes
+    ], dtype=float).reshape(len(strokes), len(BOAT_METRICS))
+    return np.concatenate([seat_values.reshape(len(strokes), -1), boat_values], axis=1)
+
+
+def prefix_sums(values: np.ndarray) -> np.ndarray:
+    """(strokes + 1, channels, 3) running count, sum and sum of squares; row 0 is zeros."""
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+    stats = np.stack([valid.astype(float), x, x * x], axis=2)
+    prefix = np.zeros((len(values) + 1, values.shape[1], 3))
+    np.cumsum(stats, axis=0, out=prefix[1:])
+    return prefix
+
+
+def write_prefix_sums(cursor, piece_id: str, strokes: Sequence[Dict[str, Any]]):
+    """Store running sums for a piece from its stroke dicts (per-seat arrays decoded)."""
+    strokes = sorted(strokes, key=lambda s: s['stroke_number'])
+    numbers = np.array([s['stroke_number'] for s in strokes], dtype='<i4')
+    cursor.execute("""
+        INSERT OR REPLACE INTO stroke_prefix_sums (piece_id, stroke_count, channels, stroke_numbers, sums)
+        VALUES (?, ?, ?, ?, ?)
+    """, (piece_id, len(strokes), CHANNELS, numbers.tobytes(),
+          prefix_sums(channel_values(strokes)).astype('<f8').tobytes()))
+
+
+def backfill_prefix_sums(cursor):
+    """Running sums for every piece that has strokes but none stored."""
+    cursor.execute("""
+        SELECT id FROM pieces
+        WHERE id NOT IN (SELECT piece_id FROM stroke_prefix_sums)
+          AND id IN (SELECT piece_id FROM stroke_metrics)
+    """)
+    for piece in cursor.fetchall():
+        cursor.execute("""
+            SELECT stroke_number, rating, avg_boat_speed, swivel_power, min_angle, max_angle,
+                   catch_slip, finish_slip, drive_time, recovery_time
+            FROM stroke_metrics WHERE piece_id = ?
+        """, (piece['id'],))
+        strokes = []
+        for row in cursor.fetchall():
+            stroke = dict(row)
+            for key in ('swivel_power', 'min_angle', 'max_angle', 'catch_slip', 'finish_slip',
+                        'drive_time', 'recovery_time'):
+                stroke[key] = json.loads(row[key]) if row[key] else None
+            strokes.append(stroke)
+        write_prefix_sums(cursor, piece['id'], strokes)
+
+
+def _stroke_number_at(blob, index: int) -> int:
+    blob.seek(index * 4)
+    return int.from_bytes(blob.read(4), 'little', signed=True)
+
+
+def _bisect(blob, length: int, value: int, right: bool = False) -> int:
+    """Position of `value` in the ascending int32 blob, as bisect_left (or bisect_right)."""
+    lo, hi = 0, length
+    while lo < hi:
+        mid = (lo + hi) // 2
+        number = _stroke_number_at(blob, mid)
+        if number < value or (right and number == value):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _prefix_row(blob, index: int) -> np.ndarray:
+    blob.seek(index * _ROW_BYTES)
+    return np.frombuffer(blob.read(_ROW_BYTES), dtype='<f8').reshape(CHANNELS, 3)
+
+
+def _stats(totals: np.ndarray, digits: int) -> Dict[str, Any]:
+    count, total, squares = totals
+    if count <= 0:
+        return {'mean': None, 'std': None, 'count': 0}
+    mean = total / count
+    std = math.sqrt(max(squares / count - mean * mean, 0.0))
+    return {'mean': round(mean, digits), 'std': round(std, digits), 'count': int(count)}
+
+
+def range_stats(conn, piece_id: str, stroke_start: Optional[int] = None,
+                stroke_end: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Per-seat and boat statistics for strokes stroke_start..stroke_end
+    (inclusive, by stroke number; open ends mean the start or end of the
+    piece). Returns None if the piece has no stored sums.
+
+    The result has 'stroke_count' (0 for an empty window), the first and
+    last stroke numbers in it, 'seats' as {seat_position: {metric: stats}}
+    and 'boat' as {metric: stats}; each stats dict has mean, std and count.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT rowid, stroke_count, channels FROM stroke_prefix_sums WHERE piece_id = ?", (piece_id,))
+    row = cursor.fetchone()
+    if row is None or row['channels'] != CHANNELS:
+        return None
+    length = row['stroke_count']
+
+    with conn.blobopen('stroke_prefix_sums', 'stroke_numbers', row['rowid'], readonly=True) as numbers:
+        first = 0 if stroke_start is None else _bisect(numbers, length, stroke_start)
+        last = length if stroke_end is None else _bisect(numbers, length, stroke_end, right=True)
+        if last <= first:
+            return {'stroke_count': 0, 'stroke_start': None, 'stroke_end': None, 'seats': {}, 'boat': {}}
+        first_number, last_number = _stroke_number_at(numbers, first), _stroke_number_at(numbers, last - 1)
+    with conn.blobopen('stroke_prefix_sums', 'sums', row['rowid'], readonly=True) as sums:
+        totals = _prefix_row(sums, last) - _prefix_row(sums, first)
+
+    metric_count = len(SEAT_METRICS)
+    seats = {
+        seat + 1: {
+            metric: _stats(totals[seat * metric_count + m], digits)
+            for m, (metric, digits) in enumerate(SEAT_METRICS.items())
+        }
+        for seat in range(SEATS)
+    }
+    boat_offset = SEATS * metric_count
+    boat = {metric: _stats(totals[boat_offset + m], digits) for m, (metric, digits) in enumerate(BOAT_METRICS.items())}
+    return {
+        'stroke_count': last - first,
+        'stroke_start': first_number,
+        'stroke_end': last_number,
+        'seats': seats,
+        'boat': boat,
+    }
@@ -0,0 +1,197 @@
+"""
+Per-request phase timing.
+
+With PEACH_SERVER_TIMING=1 each response carries a Server-Timing header
+(shown in the browser devtools timing tab) breaking the request into
+phases, and one JSON log line per request is written to the
+"peach.timing" logger:
+
+    db         SQLite execute/fetch time (with the query count)
+    decode     JSON blob decoding
+    compute    aggregation and numeric work
+    serialize  orjson rendering of the response body
+    compress   br/gzip encoding
+    other      everything not covered above (routing, validation, ...)
+
+Code marks phases with `with phase("compute"):`. When timing is disabled
+the middleware is not installed and phase() costs a single
+context-variable lookup. The timed cursor also feeds the SQLite metrics
+(see metrics.py); connections only use it when either feature is on.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from metrics import METRICS_ENABLED, Counter, Histogram
+
+SERVER_TIMING_ENABLED = os.environ.get("PEACH_SERVER_TIMING", "").lower() in ("1", "true", "yes")
+
+# Whether connections should be opened with TimedConnection
+DB_TIMING_ENABLED = SERVER_TIMING_ENABLED or METRICS_ENABLED
+
+logger = logging.getLogger("peach.timing")
+
+SQLITE_STATEMENT_SECONDS = Histogram(
+    'peach_sqlite_statement_duration_seconds',
+    'SQLite execute/executemany time by statement type.',
+    ['statement'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+SQLITE_FETCH_SECONDS = Counter('peach_sqlite_fetch_seconds_total', 'Time spent fetching SQLite result rows.')
+
+_STATEMENT_TYPES = frozenset(('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE', 'ALTER', 'PRAGMA', 'BEGIN'))
+
+
+def _statement_type(sql: str) -> str:
+    word = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+    return word if word in _STATEMENT_TYPES else 'OTHER'
+
+
+class RequestTimings:
+    """Accumulated seconds and call counts per phase for one request."""
+
+    __slots__ = ('durations', 'counts')
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add(self, name: str, seconds: float, count: int = 1):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    def header(self, total: float) -> str:
+        entries = []
+        for name, seconds in self.durations.items():
+            entry = f"{name};dur={seconds * 1000:.2f}"
+            if name == 'db':
+                entry += f';desc="{self.counts[name]} queries"'
+            entries.append(entry)
+        other = total - sum(self.durations.values())
+        entries.append(f"other;dur={max(other, 0) * 1000:.2f}")
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ', '.join(entries)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar('peach_request_timings', default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str):
+    """Attribute the enclosed block's wall time to `name` for the current request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class ORJSONResponse(_ORJSONResponse):
+    """ORJSONResponse whose render time is reported as the serialize phase."""
+
+    def render(self, content) -> bytes:
+        with phase('serialize'):
+            return super().render(content)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports execute and fetch time as the db phase and to metrics."""
+
+    def _timed(self, method, *args, statement=None):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            timings = _current.get()
+            if timings is not None:
+                timings.add('db', elapsed, 0 if statement is None else 1)
+            if METRICS_ENABLED:
+                if statement is None:
+                    SQLITE_FETCH_SECONDS.inc(elapsed)
+                else:
+                    SQLITE_STATEMENT_SECONDS.observe(elapsed, statement=statement)
+
+    def execute(self, sql, *args):
+        return self._timed(super().execute, sql, *args, statement=_statement_type(sql))
+
+    def executemany(self, sql, *args):
+        return self._timed(super().executemany, sql, *args, statement=_statement_type(sql))
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+
+class ServerTimingMiddleware:
+    """Collect phase timings per request and emit them as Server-Timing and a log line."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status = None
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = MutableHeaders(scope=message)
+                headers.append('Server-Timing', timings.header(time.perf_counter() - start))
+                headers.append('Timing-Allow-Origin', '*')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            total = time.perf_counter() - start
+            logger.info(json.dumps({
+                'method': scope['method'],
+                'path': scope['path'],
+                'status': status,
+                'total_ms': round(total * 1000, 2),
+                'phases_ms': {k: round(v * 1000, 2) for k, v in timings.durations.items()},
+                'queries': timings.counts.get('db', 0),
+            }))
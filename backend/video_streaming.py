@@ -0,0 +1,167 @@
+"""
+Byte-range file responses for video playback.
+
+Browsers scrub video with Range requests; serving 206 Partial Content means
+each seek only costs the bytes actually viewed. Files go out zero-copy when
+the ASGI server offers the "http.response.zerocopysend" extension, and
+otherwise in threadpool-read chunks.
+"""
+
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 256 * 1024
+
+# Videos are immutable once uploaded (new uploads get new ids)
+CACHE_CONTROL = "private, max-age=86400"
+
+VIDEO_MEDIA_TYPES = {
+    '.mp4': 'video/mp4',
+    '.mov': 'video/quicktime',
+    '.webm': 'video/webm',
+    '.avi': 'video/x-msvideo',
+    '.mkv': 'video/x-matroska',
+}
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range Range header into an inclusive (start, end).
+
+    Returns None when the header should be ignored (malformed or a
+    multi-range request, which is answered with the full file). Raises
+    ValueError when the range is unsatisfiable.
+    """
+    match = _RANGE_RE.match(header.strip().replace(' ', ''))
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+class RangeFileResponse(Response):
+    """Serve a file with Range, conditional-request and caching support."""
+
+    def __init__(self, path: Path, request_headers: Headers, filename: Optional[str] = None,
+                 method: str = "GET"):
+        self.path = path
+        self.send_body = method != "HEAD"
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+        media_type = VIDEO_MEDIA_TYPES.get(path.suffix.lower()) \
+            or mimetypes.guess_type(str(path))[0] or 'application/octet-stream'
+        super().__init__(status_code=200, media_type=media_type)
+
+        self.headers['accept-ranges'] = 'bytes'
+        self.headers['etag'] = etag
+        self.headers['last-modified'] = last_modified
+        self.headers['cache-control'] = CACHE_CONTROL
+        if filename:
+            self.headers['content-disposition'] = f"inline; filename*=utf-8''{quote(filename)}"
+
+        self.start, self.end = 0, size - 1
+
+        if _not_modified(request_headers, etag, stat.st_mtime):
+            self.status_code = 304
+            self.send_body = False
+            del self.headers['content-length']
+            return
+
+        range_header = request_headers.get('range')
+        if range_header and _if_range_matches(request_headers.get('if-range'), etag, last_modified):
+            try:
+                parsed = parse_range(range_header, size)
+            except ValueError:
+                self.status_code = 416
+                self.send_body = False
+                self.headers['content-range'] = f'bytes */{size}'
+                self.headers['content-length'] = '0'
+                return
+            if parsed:
+                self.start, self.end = parsed
+                self.status_code = 206
+                self.headers['content-range'] = f'bytes {self.start}-{self.end}/{size}'
+
+        self.headers['content-length'] = str(max(self.end - self.start + 1, 0))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            'type': 'http.response.start',
+            'status': self.status_code,
+            'headers': self.raw_headers,
+        })
+        count = self.end - self.start + 1
+        if not self.send_body or count <= 0:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return
+
+        if 'http.response.zerocopysend' in scope.get('extensions', {}):
+            with open(self.path, 'rb') as f:
+                await send({
+                    'type': 'http.response.zerocopysend',
+                    'file': f.fileno(),
+                    'offset': self.start,
+                    'count': count,
+                    'more_body': False,
+                })
+            return
+
+        async with await anyio.open_file(self.path, 'rb') as f:
+            await f.seek(self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+            if remaining > 0:
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+def _not_modified(headers: Headers, etag: str, mtime: float) -> bool:
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _if_range_matches(if_range: Optional[str], etag: str, last_modified: str) -> bool:
+    """A Range is honoured only if If-Range is absent or still matches the file."""
+    if if_range is None:
+        return True
+    return if_range.strip() in (etag, last_modified)
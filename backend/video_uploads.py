@@ -0,0 +1,217 @@
+"""
+Resumable, chunked video uploads.
+
+A client creates an upload with the expected size, PUTs chunks at the
+current offset and completes it once every byte has arrived. Partial files
+live under VIDEOS_DIR so completing is a same-filesystem rename rather than
+another copy, and a dropped connection resumes from the last byte written.
+The SHA-256 is computed as bytes arrive; an upload identical to a video
+already on disk reuses the stored file.
+
+Only one request at a time may write to an upload. The guard is an
+exclusive flock on the partial file, so it holds across uvicorn workers;
+the in-memory hashers are only a cache and are rebuilt from the file
+when another worker has appended since.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: uploads are only guarded within one process
+    fcntl = None
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+VIDEOS_DIR = Path(__file__).parent / "videos"
+VIDEOS_DIR.mkdir(exist_ok=True)
+
+PARTIAL_DIR = VIDEOS_DIR / "partial"
+PARTIAL_DIR.mkdir(exist_ok=True)
+
+ALLOWED_VIDEO_EXTENSIONS = {'.mp4', '.mov', '.webm', '.avi', '.mkv'}
+
+# Suggested client chunk size; small enough to retry cheaply on bad Wi-Fi
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Incoming body chunks are buffered up to this size per threadpool write
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# upload_id -> (bytes hashed, running sha256); rebuilt from the partial file when stale
+_hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+# upload_id -> locked handle on the partial file, for requests in this process
+_claims: Dict[str, Optional[BinaryIO]] = {}
+_lock = threading.Lock()
+
+
+def partial_path(upload_id: str) -> Path:
+    return PARTIAL_DIR / f"{upload_id}.part"
+
+
+def claim(upload_id: str) -> bool:
+    """
+    Lock an upload for one request. Returns False if another request, in
+    this or any other worker process, holds it.
+    """
+    with _lock:
+        if upload_id in _claims:
+            return False
+        _claims[upload_id] = None
+    if fcntl is None:
+        return True
+
+    handle = open(partial_path(upload_id), 'ab')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        with _lock:
+            _claims.pop(upload_id, None)
+        return False
+    with _lock:
+        _claims[upload_id] = handle
+    return True
+
+
+def release(upload_id: str):
+    with _lock:
+        handle = _claims.pop(upload_id, None)
+    if handle is not None:
+        # Closing the handle drops the flock
+        handle.close()
+
+
+def _hasher_at(upload_id: str, offset: int):
+    """Return a sha256 covering the first `offset` bytes of the partial file."""
+    with _lock:
+        cached = _hashers.get(upload_id)
+    if cached and cached[0] == offset:
+        return cached[1]
+    hasher = hashlib.sha256()
+    path = partial_path(upload_id)
+    if offset and path.exists():
+        with open(path, 'rb') as f:
+            remaining = offset
+            while remaining > 0:
+                block = f.read(min(WRITE_BUFFER_SIZE, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+    return hasher
+
+
+def _open_at(upload_id: str, offset: int) -> BinaryIO:
+    path = partial_path(upload_id)
+    f = open(path, 'r+b' if path.exists() else 'w+b')
+    f.truncate(offset)
+    f.seek(offset)
+    return f
+
+
+def _write(f: BinaryIO, hasher, data: bytes):
+    f.write(data)
+    hasher.update(data)
+
+
+def _close(f: BinaryIO):
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+
+async def append_chunk(upload_id: str, offset: int, limit: int,
+                       stream: AsyncIterator[bytes]) -> Tuple[int, bool]:
+    """
+    Append a request body to the partial file at `offset`.
+
+    File writes and hashing run in the threadpool. Returns the new offset
+    and whether the body ran past `limit` (the excess is discarded). If the
+    client disconnects, whatever arrived is kept so the upload can resume.
+    """
+    hasher = await run_in_threadpool(_hasher_at, upload_id, offset)
+    f = await run_in_threadpool(_open_at, upload_id, offset)
+    written = offset
+    overflow = False
+    buffer = bytearray()
+    try:
+        async for chunk in stream:
+            room = limit - written - len(buffer)
+            if len(chunk) > room:
+                buffer += chunk[:room]
+                overflow = True
+                break
+            buffer += chunk
+            if len(buffer) >= WRITE_BUFFER_SIZE:
+                await run_in_threadpool(_write, f, hasher, bytes(buffer))
+                written += len(buffer)
+                buffer.clear()
+    except ClientDisconnect:
+        pass
+    finally:
+        if buffer:
+            await run_in_threadpool(_write, f, hasher, bytes(buffer))
+            written += len(buffer)
+        await run_in_threadpool(_close, f)
+        with _lock:
+            _hashers[upload_id] = (written, hasher)
+    return written, overflow
+
+
+def finish_hash(upload_id: str, total_bytes: int) -> str:
+    """Hex SHA-256 of a fully received upload."""
+    digest = _hasher_at(upload_id, total_bytes).hexdigest()
+    with _lock:
+        _hashers.pop(upload_id, None)
+    return digest
+
+
+def discard_partial(upload_id: str):
+    with _lock:
+        _hashers.pop(upload_id, None)
+    partial_path(upload_id).unlink(missing_ok=True)
+
+
+def save_stream(source: BinaryIO, dest: Path) -> str:
+    """Copy a file object to disk, hashing it on the way. Returns the hex SHA-256."""
+    hasher = hashlib.sha256()
+    with open(dest, 'wb') as f:
+        while True:
+            block = source.read(WRITE_BUFFER_SIZE)
+            if not block:
+                break
+            f.write(block)
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def store_video_file(cursor, source: Path, video_id: str, ext: str, content_hash: str) -> str:
+    """
+    Move a received file into VIDEOS_DIR, or drop it in favour of an
+    identical stored video. Returns the stored filename.
+    """
+    cursor.execute("SELECT DISTINCT filename FROM video_sessions WHERE content_hash = ?", (content_hash,))
+    for row in cursor.fetchall():
+        if (VIDEOS_DIR / row['filename']).exists():
+            source.unlink(missing_ok=True)
+            return row['filename']
+    filename = f"{video_id}{ext}"
+    os.replace(source, VIDEOS_DIR / filename)
+    return filename
+
+
+def release_video_file(cursor, filename: str):
+    """Delete a stored video file once no video row references it."""
+    cursor.execute("SELECT 1 FROM video_sessions WHERE filename = ? LIMIT 1", (filename,))
+    if cursor.fetchone():
+        return
+    (VIDEOS_DIR / filename).unlink(missing_ok=True)
+
+
+def upload_ext(filename: Optional[str]) -> str:
+    return Path(filename or '').suffix.lower()
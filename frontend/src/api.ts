@@ -1,7 +1,9 @@
 import type {
-  Session, StrokeMetric, PieceAverages, UploadResponse, PeriodicDataPoint,
-  GlobalAthlete, GlobalAthleteDetail, AthleteTrends, AthleteMeasurements,
-  VideoSession
+  Session, StrokeMetric, PieceAverages, PieceRangeAverages, UploadResponse, PeriodicDataPoint,
+  GlobalAthlete, GlobalAthleteDetail, AthleteTrends, AthleteMeasurements, Leaderboard, LeaderboardMetric,
+  AthleteSearchResult, DuplicateAthleteCandidate, RosterImportResult,
+  VideoSession, VideoUpload, VideoAlignmentTrack, SessionDashboard, PieceEnsembleCurves, IngestJob,
+  SimilarStroke, SimilarAthlete, ReplayEvent, ReplayStart, ReplayControl, ReplaySpeed
 } from './types';
 
 const API_BASE = import.meta.env.VITE_API_URL || '/api';
@@ -19,10 +21,47 @@ export async function getSessions(): Promise<Session[]> {
   return fetchJson<Session[]>(`${API_BASE}/sessions`);
 }
 
+export interface SessionSearchFilters {
+  workoutType?: string;
+  squad?: string;
+  dateFrom?: string;
+  dateTo?: string;
+  boat?: string;
+  athleteId?: string;
+  limit?: number;
+  offset?: number;
+}
+
+export async function searchSessions(filters: SessionSearchFilters): Promise<Session[]> {
+  const params = new URLSearchParams();
+  if (filters.workoutType) params.append('workout_type', filters.workoutType);
+  if (filters.squad) params.append('squad', filters.squad);
+  if (filters.dateFrom) params.append('date_from', filters.dateFrom);
+  if (filters.dateTo) params.append('date_to', filters.dateTo);
+  if (filters.boat) params.append('boat', filters.boat);
+  if (filters.athleteId) params.append('athlete_id', filters.athleteId);
+  if (filters.limit !== undefined) params.append('limit', String(filters.limit));
+  if (filters.offset !== undefined) params.append('offset', String(filters.offset));
+  return fetchJson<Session[]>(`${API_BASE}/sessions/search?${params}`);
+}
+
 export async function getSession(id: string): Promise<Session> {
   return fetchJson<Session>(`${API_BASE}/sessions/${id}`);
 }
 
+// Session details plus strokes, averages and (optionally) periodic data for
+// each piece, fetched in one round trip
+export async function getSessionDashboard(
+  id: string,
+  options: { pieceIds?: string[]; includePeriodic?: boolean; downsample?: number } = {}
+): Promise<SessionDashboard> {
+  const params = new URLSearchParams();
+  if (options.pieceIds && options.pieceIds.length > 0) params.append('piece_ids', options.pieceIds.join(','));
+  if (options.includePeriodic) params.append('include_periodic', 'true');
+  if (options.downsample && options.downsample > 1) params.append('downsample', String(options.downsample));
+  return fetchJson<SessionDashboard>(`${API_BASE}/sessions/${id}/dashboard?${params}`);
+}
+
 export async function renameSession(id: string, name: string): Promise<Session> {
   return fetchJson<Session>(`${API_BASE}/sessions/${id}`, {
     method: 'PATCH',
@@ -31,7 +70,7 @@ export async function renameSession(id: string, name: string): Promise<Session>
   });
 }
 
-export async function updateSession(id: string, data: { name?: string; workout_type?: string }): Promise<Session> {
+export async function updateSession(id: string, data: { name?: string; workout_type?: string; boat_name?: string }): Promise<Session> {
   return fetchJson<Session>(`${API_BASE}/sessions/${id}`, {
     method: 'PATCH',
     headers: { 'Content-Type': 'application/json' },
@@ -63,6 +102,27 @@ export async function uploadCsv(file: File, sessionName?: string): Promise<Uploa
   return response.json();
 }
 
+// Background ingest: the file is accepted immediately and processed by a worker
+export async function submitIngestJob(file: File, sessionName?: string): Promise<IngestJob> {
+  const formData = new FormData();
+  formData.append('file', file);
+  if (sessionName) {
+    formData.append('session_name', sessionName);
+  }
+  return fetchJson<IngestJob>(`${API_BASE}/ingest/jobs`, {
+    method: 'POST',
+    body: formData,
+  });
+}
+
+export async function getIngestJob(jobId: string): Promise<IngestJob> {
+  return fetchJson<IngestJob>(`${API_BASE}/ingest/jobs/${jobId}`);
+}
+
+export async function retryIngestJob(jobId: string): Promise<IngestJob> {
+  return fetchJson<IngestJob>(`${API_BASE}/ingest/jobs/${jobId}/retry`, { method: 'POST' });
+}
+
 // Strokes
 export async function getStrokes(pieceId: string): Promise<StrokeMetric[]> {
   return fetchJson<StrokeMetric[]>(`${API_BASE}/pieces/${pieceId}/strokes`);
@@ -72,6 +132,18 @@ export async function getStrokeAverages(pieceId: string): Promise<PieceAverages>
   return fetchJson<PieceAverages>(`${API_BASE}/pieces/${pieceId}/strokes/averages`);
 }
 
+// Means and standard deviations over a stroke window, e.g. the timeline slider selection
+export async function getStrokeRangeAverages(
+  pieceId: string,
+  strokeStart?: number,
+  strokeEnd?: number
+): Promise<PieceRangeAverages> {
+  const params = new URLSearchParams();
+  if (strokeStart !== undefined) params.append('stroke_start', String(strokeStart));
+  if (strokeEnd !== undefined) params.append('stroke_end', String(strokeEnd));
+  return fetchJson<PieceRangeAverages>(`${API_BASE}/pieces/${pieceId}/strokes/range-averages?${params}`);
+}
+
 // Periodic Data
 export async function getPeriodicData(
   pieceId: string,
@@ -88,6 +160,73 @@ export async function getPeriodicData(
   return fetchJson(url);
 }
 
+// Streams periodic samples as NDJSON, invoking onChunk as lines arrive so
+// callers can render before the full piece has downloaded.
+export async function streamPeriodicData(
+  pieceId: string,
+  onChunk: (points: PeriodicDataPoint[]) => void,
+  options: { strokeStart?: number; strokeEnd?: number; downsample?: number; signal?: AbortSignal } = {}
+): Promise<void> {
+  const params = new URLSearchParams();
+  if (options.strokeStart !== undefined) params.append('stroke_start', String(options.strokeStart));
+  if (options.strokeEnd !== undefined) params.append('stroke_end', String(options.strokeEnd));
+  if (options.downsample && options.downsample > 1) params.append('downsample', String(options.downsample));
+
+  const response = await fetch(`${API_BASE}/pieces/${pieceId}/periodic/stream?${params}`, {
+    signal: options.signal,
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`API error: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    const lines = buffered.split('\n');
+    buffered = lines.pop() ?? '';
+    const points = lines.filter((line) => line).map((line) => JSON.parse(line) as PeriodicDataPoint);
+    if (points.length > 0) onChunk(points);
+  }
+  buffered += decoder.decode();
+  if (buffered.trim()) onChunk([JSON.parse(buffered) as PeriodicDataPoint]);
+}
+
+export interface ReplayHandlers {
+  onStart?: (start: ReplayStart) => void;
+  onEvents: (events: ReplayEvent[]) => void;
+  onEnd?: () => void;
+}
+
+// Replays a piece over a WebSocket. The returned `send` pauses, resumes,
+// seeks or changes speed; `close` stops the replay.
+export function openPieceReplay(
+  pieceId: string,
+  handlers: ReplayHandlers,
+  options: { speed?: ReplaySpeed; include?: 'all' | 'strokes' | 'periodic'; strokeStart?: number; strokeEnd?: number } = {}
+): { send: (control: ReplayControl) => void; close: () => void } {
+  const params = new URLSearchParams({ speed: options.speed ?? '1', include: options.include ?? 'all' });
+  if (options.strokeStart !== undefined) params.append('stroke_start', String(options.strokeStart));
+  if (options.strokeEnd !== undefined) params.append('stroke_end', String(options.strokeEnd));
+
+  const url = new URL(`${API_BASE}/pieces/${pieceId}/replay?${params}`, window.location.href);
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+  const socket = new WebSocket(url);
+  socket.onmessage = (message) => {
+    const data = JSON.parse(message.data);
+    if (Array.isArray(data)) handlers.onEvents(data as ReplayEvent[]);
+    else if (data.type === 'start') handlers.onStart?.(data as ReplayStart);
+    else if (data.type === 'end') handlers.onEnd?.();
+  };
+  return {
+    send: (control) => socket.send(JSON.stringify(control)),
+    close: () => socket.close(),
+  };
+}
+
 export async function getForceCurve(
   pieceId: string,
   strokeNumber: number
@@ -95,11 +234,84 @@ export async function getForceCurve(
   return fetchJson(`${API_BASE}/pieces/${pieceId}/stroke/${strokeNumber}/force-curve`);
 }
 
+// Average-stroke force curve per seat over a stroke range (computed server-side)
+export async function getEnsembleForceCurve(
+  pieceId: string,
+  strokeStart?: number,
+  strokeEnd?: number,
+  points = 100
+): Promise<PieceEnsembleCurves> {
+  const params = new URLSearchParams();
+  if (strokeStart !== undefined) params.append('stroke_start', String(strokeStart));
+  if (strokeEnd !== undefined) params.append('stroke_end', String(strokeEnd));
+  if (points !== 100) params.append('points', String(points));
+  return fetchJson<PieceEnsembleCurves>(`${API_BASE}/pieces/${pieceId}/force-curve/ensemble?${params}`);
+}
+
+export async function getSimilarStrokes(
+  pieceId: string,
+  strokeNumber: number,
+  seat: number,
+  options: { limit?: number; athleteId?: string; includeSamePiece?: boolean } = {}
+): Promise<SimilarStroke[]> {
+  const params = new URLSearchParams({ seat: String(seat) });
+  if (options.limit !== undefined) params.append('limit', String(options.limit));
+  if (options.athleteId) params.append('athlete_id', options.athleteId);
+  if (options.includeSamePiece) params.append('include_same_piece', 'true');
+  return fetchJson<SimilarStroke[]>(`${API_BASE}/pieces/${pieceId}/stroke/${strokeNumber}/similar?${params}`);
+}
+
+export async function getPieceSimilarAthletes(
+  pieceId: string,
+  seat: number,
+  limit = 20,
+  squad?: string
+): Promise<SimilarAthlete[]> {
+  const params = new URLSearchParams({ seat: String(seat), limit: String(limit) });
+  if (squad) params.append('squad', squad);
+  return fetchJson<SimilarAthlete[]>(`${API_BASE}/pieces/${pieceId}/similar-athletes?${params}`);
+}
+
+export async function getAthleteSimilarAthletes(athleteId: string, limit = 20, squad?: string): Promise<SimilarAthlete[]> {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (squad) params.append('squad', squad);
+  return fetchJson<SimilarAthlete[]>(`${API_BASE}/athletes/${athleteId}/similar-athletes?${params}`);
+}
+
 // Global Athletes
 export async function getGlobalAthletes(): Promise<GlobalAthlete[]> {
   return fetchJson<GlobalAthlete[]>(`${API_BASE}/athletes`);
 }
 
+export async function searchGlobalAthletes(q: string, limit = 20, squad?: string): Promise<AthleteSearchResult[]> {
+  const params = new URLSearchParams({ q, limit: String(limit) });
+  if (squad) params.append('squad', squad);
+  return fetchJson<AthleteSearchResult[]>(`${API_BASE}/athletes/search?${params}`);
+}
+
+export async function getDuplicateAthletes(threshold = 0.5): Promise<DuplicateAthleteCandidate[]> {
+  return fetchJson<DuplicateAthleteCandidate[]>(`${API_BASE}/athletes/duplicates?threshold=${threshold}`);
+}
+
+// Rows are objects keyed by athlete/measurement field, or a roster CSV file.
+// Validation failures come back as 422 with per-row errors and nothing applied.
+export async function importRoster(
+  roster: Record<string, string | number | undefined>[] | File,
+  dryRun = false
+): Promise<RosterImportResult> {
+  const url = `${API_BASE}/athletes/roster${dryRun ? '?dry_run=true' : ''}`;
+  if (roster instanceof File) {
+    const formData = new FormData();
+    formData.append('file', roster);
+    return fetchJson<RosterImportResult>(url, { method: 'POST', body: formData });
+  }
+  return fetchJson<RosterImportResult>(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(roster),
+  });
+}
+
 export async function getGlobalAthlete(id: string): Promise<GlobalAthleteDetail> {
   return fetchJson<GlobalAthleteDetail>(`${API_BASE}/athletes/${id}`);
 }
@@ -119,6 +331,30 @@ export async function getAthleteTrends(id: string): Promise<AthleteTrends> {
   return fetchJson<AthleteTrends>(`${API_BASE}/athletes/${id}/trends`);
 }
 
+export interface LeaderboardFilters {
+  workoutType?: string;
+  squad?: string;
+  dateFrom?: string;
+  dateTo?: string;
+  lastN?: number;
+  minSessions?: number;
+  limit?: number;
+  order?: 'asc' | 'desc';
+}
+
+export async function getLeaderboard(metric: LeaderboardMetric, filters: LeaderboardFilters = {}): Promise<Leaderboard> {
+  const params = new URLSearchParams();
+  if (filters.workoutType) params.append('workout_type', filters.workoutType);
+  if (filters.squad) params.append('squad', filters.squad);
+  if (filters.dateFrom) params.append('date_from', filters.dateFrom);
+  if (filters.dateTo) params.append('date_to', filters.dateTo);
+  if (filters.lastN !== undefined) params.append('last_n', String(filters.lastN));
+  if (filters.minSessions !== undefined) params.append('min_sessions', String(filters.minSessions));
+  if (filters.limit !== undefined) params.append('limit', String(filters.limit));
+  if (filters.order) params.append('order', filters.order);
+  return fetchJson<Leaderboard>(`${API_BASE}/leaderboards/${metric}?${params}`);
+}
+
 export async function getAthleteMeasurements(id: string): Promise<AthleteMeasurements | null> {
   return fetchJson<AthleteMeasurements | null>(`${API_BASE}/athletes/${id}/measurements`);
 }
@@ -135,18 +371,55 @@ export async function updateAthleteMeasurements(
 }
 
 // Video
-export async function uploadVideo(file: File, sessionId: string, pieceId?: string): Promise<VideoSession> {
-  const formData = new FormData();
-  formData.append('file', file);
-  formData.append('session_id', sessionId);
-  if (pieceId) formData.append('piece_id', pieceId);
+const UPLOAD_CHUNK_RETRIES = 5;
 
-  const response = await fetch(`${API_BASE}/videos/upload`, {
+// Resumable chunked upload: a dropped connection retries the current chunk
+// from the offset the server last acknowledged instead of restarting the file.
+export async function uploadVideo(
+  file: File,
+  sessionId: string,
+  pieceId?: string,
+  onProgress?: (sentBytes: number, totalBytes: number) => void,
+): Promise<VideoSession> {
+  const upload = await fetchJson<VideoUpload>(`${API_BASE}/videos/uploads`, {
     method: 'POST',
-    body: formData,
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ session_id: sessionId, filename: file.name, size: file.size, piece_id: pieceId }),
   });
-  if (!response.ok) throw new Error(`Upload failed: ${response.status}`);
-  return response.json();
+
+  let offset = upload.received_bytes;
+  let failures = 0;
+  while (offset < file.size) {
+    try {
+      const response = await fetch(`${API_BASE}/videos/uploads/${upload.id}?offset=${offset}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: file.slice(offset, offset + upload.chunk_size),
+      });
+      if (response.ok) {
+        offset = ((await response.json()) as VideoUpload).received_bytes;
+        failures = 0;
+        onProgress?.(offset, file.size);
+        continue;
+      }
+      throw new Error(`Upload failed: ${response.status}`);
+    } catch (err) {
+      if (++failures > UPLOAD_CHUNK_RETRIES) throw err;
+      await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+      // Resync with the bytes the server actually has (409 offset conflicts land here too)
+      try {
+        offset = (await getVideoUpload(upload.id)).received_bytes;
+      } catch {
+        // Still offline; retry from the last known offset
+      }
+    }
+  }
+
+  return fetchJson<VideoSession>(`${API_BASE}/videos/uploads/${upload.id}/complete`, { method: 'POST' });
+}
+
+export async function getVideoUpload(uploadId: string): Promise<VideoUpload> {
+  return fetchJson<VideoUpload>(`${API_BASE}/videos/uploads/${uploadId}`);
 }
 
 export async function getSessionVideos(sessionId: string): Promise<VideoSession[]> {
@@ -157,6 +430,10 @@ export function getVideoUrl(videoId: string): string {
   return `${API_BASE}/videos/${videoId}/file`;
 }
 
+export async function getVideoAlignment(videoId: string): Promise<VideoAlignmentTrack> {
+  return fetchJson<VideoAlignmentTrack>(`${API_BASE}/videos/${videoId}/alignment`);
+}
+
 export async function updateVideo(videoId: string, data: { offset_ms?: number; piece_id?: string }): Promise<VideoSession> {
   return fetchJson<VideoSession>(`${API_BASE}/videos/${videoId}`, {
     method: 'PATCH',
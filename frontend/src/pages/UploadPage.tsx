@@ -1,14 +1,55 @@
 import { useState, useCallback } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useDropzone } from 'react-dropzone';
-import { uploadCsv } from '../api';
-import type { UploadResponse } from '../types';
+import { submitIngestJob, getIngestJob, retryIngestJob } from '../api';
+import type { IngestJob, UploadResponse } from '../types';
+
+const POLL_INTERVAL_MS = 1000;
+
+function describeJob(job: IngestJob): string {
+  if (job.status === 'queued') return 'Queued...';
+  if (job.stage === 'parsing') return 'Parsing...';
+  if (job.total_rows) {
+    return `Writing ${job.stage ?? 'rows'}: ${job.rows_processed.toLocaleString()} / ${job.total_rows.toLocaleString()} rows`;
+  }
+  return 'Processing...';
+}
 
 export default function UploadPage() {
   const navigate = useNavigate();
   const [uploading, setUploading] = useState(false);
   const [result, setResult] = useState<UploadResponse | null>(null);
   const [error, setError] = useState<string | null>(null);
+  const [job, setJob] = useState<IngestJob | null>(null);
+
+  const waitForJob = useCallback(async (initial: IngestJob) => {
+    let current = initial;
+    setJob(current);
+    while (current.status === 'queued' || current.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+      current = await getIngestJob(current.id);
+      setJob(current);
+    }
+    if (current.status === 'succeeded' && current.result) {
+      setResult(current.result);
+      setJob(null);
+    } else {
+      setError(`Failed to process file: ${current.error ?? 'unknown error'}`);
+    }
+  }, []);
+
+  const retry = async () => {
+    if (!job) return;
+    setUploading(true);
+    setError(null);
+    try {
+      await waitForJob(await retryIngestJob(job.id));
+    } catch {
+      setError('Retry failed.');
+    } finally {
+      setUploading(false);
+    }
+  };
 
   const onDrop = useCallback(async (acceptedFiles: File[]) => {
     if (acceptedFiles.length === 0) return;
@@ -21,16 +62,16 @@ export default function UploadPage() {
 
     setUploading(true);
     setError(null);
+    setJob(null);
 
     try {
-      const response = await uploadCsv(file);
-      setResult(response);
+      await waitForJob(await submitIngestJob(file));
     } catch {
       setError('Failed to upload file. Make sure it is a valid Peach CSV.');
     } finally {
       setUploading(false);
     }
-  }, []);
+  }, [waitForJob]);
 
   const { getRootProps, getInputProps, isDragActive } = useDropzone({
     onDrop,
@@ -72,7 +113,17 @@ export default function UploadPage() {
       <h1 className="text-lg font-semibold text-gray-800 mb-3">Upload CSV</h1>
 
       {error && (
-        <div className="text-red-600 text-sm mb-3">{error}</div>
+        <div className="text-red-600 text-sm mb-3">
+          {error}
+          {job?.status === 'failed' && (
+            <button
+              onClick={retry}
+              className="ml-2 bg-gray-200 text-gray-700 hover:bg-gray-300 px-2 py-0.5 rounded text-xs"
+            >
+              Retry
+            </button>
+          )}
+        </div>
       )}
 
       <div
@@ -83,7 +134,7 @@ export default function UploadPage() {
       >
         <input {...getInputProps()} disabled={uploading} />
         {uploading ? (
-          <div className="text-gray-500">Uploading and parsing...</div>
+          <div className="text-gray-500">{job ? describeJob(job) : 'Uploading...'}</div>
         ) : isDragActive ? (
           <div className="text-gray-700">Drop the CSV file here...</div>
         ) : (
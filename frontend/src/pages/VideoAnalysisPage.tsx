@@ -2,10 +2,10 @@ import { useEffect, useState, useRef, useCallback } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import {
   getSession, getStrokes, getSessionVideos, uploadVideo, getVideoUrl,
-  updateVideo, deleteVideo, getForceCurve,
+  updateVideo, deleteVideo, getForceCurve, streamPeriodicData, getVideoAlignment,
 } from '../api';
 import { ATHLETE_COLORS } from '../store';
-import type { Session, StrokeMetric, VideoSession, PeriodicDataPoint } from '../types';
+import type { Session, StrokeMetric, VideoSession, PeriodicDataPoint, VideoAlignmentTrack } from '../types';
 import {
   LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip,
   ResponsiveContainer, ReferenceLine,
@@ -30,6 +30,7 @@ export default function VideoAnalysisPage() {
   const [activeVideo, setActiveVideo] = useState<VideoSession | null>(null);
   const [selectedPieceId, setSelectedPieceId] = useState<string | null>(null);
   const [forceCurveData, setForceCurveData] = useState<PeriodicDataPoint[]>([]);
+  const [alignment, setAlignment] = useState<VideoAlignmentTrack | null>(null);
 
   // Playback state
   const [currentTimeMs, setCurrentTimeMs] = useState(0);
@@ -50,6 +51,7 @@ export default function VideoAnalysisPage() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [uploading, setUploading] = useState(false);
+  const [uploadPercent, setUploadPercent] = useState(0);
   const [chartMetric, setChartMetric] = useState<ChartMetric>('forceCurve');
   const [selectedAthletes, setSelectedAthletes] = useState<Set<number>>(new Set([1, 2, 3, 4, 5, 6, 7, 8]));
   const [saving, setSaving] = useState(false);
@@ -103,9 +105,34 @@ export default function VideoAnalysisPage() {
     load();
   }, [selectedPieceId]);
 
+  // Server-side alignment track for the active video (rebuilt when its saved offset changes)
+  useEffect(() => {
+    if (!activeVideo) {
+      setAlignment(null);
+      return;
+    }
+    let cancelled = false;
+    getVideoAlignment(activeVideo.id)
+      .then((track) => { if (!cancelled) setAlignment(track); })
+      .catch((err) => console.error('Failed to load alignment track', err));
+    return () => { cancelled = true; };
+  }, [activeVideo]);
+
+  // The track is only usable while the on-screen sync matches what it was built with
+  const alignmentFrame = alignment
+    && alignment.piece_id === selectedPieceId
+    && alignment.offset_ms === userAdjustMs
+    && alignment.base_offset_ms === baseOffsetMs
+    ? Math.floor((currentTimeMs * alignment.fps) / 1000)
+    : -1;
+  const hasAlignedFrame = alignment !== null && alignmentFrame >= 0 && alignmentFrame < alignment.frame_count;
+
   // Get current stroke index based on video time + effective offset
   const getCurrentStrokeIndex = useCallback(() => {
     if (strokes.length === 0) return 0;
+    if (hasAlignedFrame && alignment) {
+      return Math.min(Math.max(alignment.stroke_index[alignmentFrame], 0), strokes.length - 1);
+    }
     const telemetryTimeMs = currentTimeMs + effectiveOffsetMs;
     // Find the stroke whose time_ms is closest to (but not after) the telemetry time
     let idx = 0;
@@ -117,9 +144,10 @@ export default function VideoAnalysisPage() {
       }
     }
     return idx;
-  }, [currentTimeMs, effectiveOffsetMs, strokes]);
+  }, [currentTimeMs, effectiveOffsetMs, strokes, alignment, alignmentFrame, hasAlignedFrame]);
 
   const currentStrokeIdx = getCurrentStrokeIndex();
+  const liveSpeed = hasAlignedFrame && alignment ? alignment.speed[alignmentFrame] : null;
 
   // Helper to fetch and cache a single force curve
   const fetchForceCurve = useCallback(async (pieceId: string, strokeNumber: number): Promise<PeriodicDataPoint[]> => {
@@ -146,6 +174,44 @@ export default function VideoAnalysisPage() {
     prefetchingRef.current.clear();
   }, [selectedPieceId]);
 
+  // Stream the piece's periodic data and fill the force curve cache as each
+  // stroke's window arrives, so curves draw before the full piece has loaded
+  useEffect(() => {
+    if (!selectedPieceId || strokes.length === 0) return;
+    const pieceId = selectedPieceId;
+    const controller = new AbortController();
+    let received: PeriodicDataPoint[] = [];
+    let nextIdx = 0;
+
+    const fillStrokes = (lastTimeMs: number) => {
+      while (nextIdx < strokes.length && strokes[nextIdx].time_ms + 2000 <= lastTimeMs) {
+        const stroke = strokes[nextIdx];
+        const cacheKey = `${pieceId}:${stroke.stroke_number}`;
+        // Drop samples that no later stroke window can use
+        const firstNeeded = received.findIndex((p) => p.time_ms > stroke.time_ms - 2000);
+        received = firstNeeded === -1 ? [] : received.slice(firstNeeded);
+        if (!forceCurveCache.current.has(cacheKey)) {
+          const curve = received
+            .filter((p) => Math.abs(p.time_ms - stroke.time_ms) < 2000)
+            .sort((a, b) => (a.normalized_time ?? 0) - (b.normalized_time ?? 0));
+          forceCurveCache.current.set(cacheKey, curve);
+        }
+        nextIdx++;
+      }
+    };
+
+    streamPeriodicData(pieceId, (points) => {
+      received.push(...points);
+      fillStrokes(points[points.length - 1].time_ms);
+    }, { signal: controller.signal })
+      .then(() => fillStrokes(Number.POSITIVE_INFINITY))
+      .catch((err) => {
+        if (!controller.signal.aborted) console.error('Failed to stream periodic data', err);
+      });
+
+    return () => controller.abort();
+  }, [selectedPieceId, strokes]);
+
   // Load force curve for current stroke + prefetch nearby
   useEffect(() => {
     if (!selectedPieceId || strokes.length === 0) return;
@@ -206,7 +272,9 @@ export default function VideoAnalysisPage() {
     if (!file || !sessionId) return;
     try {
       setUploading(true);
-      const video = await uploadVideo(file, sessionId, selectedPieceId || undefined);
+      setUploadPercent(0);
+      const video = await uploadVideo(file, sessionId, selectedPieceId || undefined,
+        (sent, total) => setUploadPercent(Math.round((sent / total) * 100)));
       setVideos([video, ...videos]);
       setActiveVideo(video);
       setUserAdjustMs(video.offset_ms);
@@ -742,7 +810,7 @@ export default function VideoAnalysisPage() {
           {/* Video management */}
           <div className="flex items-center gap-2 text-xs">
             <label className="bg-gray-200 hover:bg-gray-300 text-gray-700 px-2 py-1 rounded cursor-pointer">
-              {uploading ? 'Uploading...' : 'Upload Video'}
+              {uploading ? `Uploading ${uploadPercent}%` : 'Upload Video'}
               <input
                 type="file"
                 accept="video/*"
@@ -891,6 +959,7 @@ export default function VideoAnalysisPage() {
                 <span>Speed: <strong className="text-gray-800">{currentStroke.avg_boat_speed?.toFixed(2) ?? '-'} m/s</strong></span>
                 <span>Avg Power: <strong className="text-gray-800">{currentStroke.average_power?.toFixed(0) ?? '-'} W</strong></span>
                 <span>DPS: <strong className="text-gray-800">{currentStroke.distance_per_stroke?.toFixed(2) ?? '-'} m</strong></span>
+                <span>Live Speed: <strong className="text-gray-800">{liveSpeed?.toFixed(2) ?? '-'} m/s</strong></span>
               </div>
               {/* Per-athlete power for this stroke */}
               <div className="mt-1 flex flex-wrap gap-2">
@@ -19,6 +19,7 @@ export interface Piece {
   distance_meters?: number;
   avg_rating?: number;
   pace?: string;
+  periodic_tier?: 'raw' | 'decimated' | 'archived';
 }
 
 export interface Session {
@@ -30,6 +31,7 @@ export interface Session {
   boat_name?: string;
   boat_seats: number;
   workout_type?: string | null;
+  session_date?: string | null;
   created_at?: string;
   athletes?: Athlete[];
   pieces?: Piece[];
@@ -57,6 +59,62 @@ export interface StrokeMetric {
   work_pc_q4?: (number | null)[];
 }
 
+export interface EnsembleCurve {
+  x: number[];
+  force_mean: (number | null)[];
+  force_std: (number | null)[];
+}
+
+export interface SeatEnsembleCurve {
+  seat_position: number;
+  name?: string | null;
+  strokes_used: number;
+  normalized_time: EnsembleCurve | null;
+  gate_angle: EnsembleCurve | null;
+}
+
+export interface PieceEnsembleCurves {
+  piece_id: string;
+  stroke_start: number;
+  stroke_end: number;
+  stroke_count: number;
+  points: number;
+  seats: SeatEnsembleCurve[];
+}
+
+// Similarity is the correlation of two force-curve shapes (-1 to 1)
+export interface SimilarStroke {
+  piece_id: string;
+  session_id: string;
+  session_name: string;
+  session_date?: string;
+  seat_position: number;
+  stroke_number: number;
+  global_athlete_id?: string;
+  athlete_name?: string;
+  similarity: number;
+}
+
+export interface SimilarAthlete {
+  athlete_id: string;
+  name: string;
+  squad?: string;
+  strokes: number;
+  similarity: number;
+}
+
+export interface PieceDashboard {
+  piece_id: string;
+  strokes: StrokeMetric[];
+  averages: PieceAverages | null;
+  periodic?: { total_points: number; data: PeriodicDataPoint[] };
+}
+
+export interface SessionDashboard {
+  session: Session;
+  pieces: PieceDashboard[];
+}
+
 export interface PeriodicDataPoint {
   time_ms: number;
   normalized_time?: number;
@@ -68,6 +126,30 @@ export interface PeriodicDataPoint {
   accel?: number;
 }
 
+export type ReplaySpeed = '1' | '4' | 'max';
+
+export type ReplayEvent =
+  | ({ type: 'stroke' } & StrokeMetric)
+  | ({ type: 'periodic' } & PeriodicDataPoint);
+
+export interface ReplayStart {
+  type: 'start';
+  piece_id: string;
+  track: 'all' | 'strokes' | 'periodic';
+  speed: number | null;
+  events: number;
+  start_ms: number | null;
+  end_ms: number | null;
+  strokes: number;
+  periodic: number;
+}
+
+export type ReplayControl =
+  | { action: 'pause' }
+  | { action: 'resume' }
+  | { action: 'seek'; time_ms: number }
+  | { action: 'speed'; speed: ReplaySpeed };
+
 export interface AthleteAverage {
   seat_position: number;
   name: string;
@@ -90,6 +172,35 @@ export interface PieceAverages {
   crew_avg_power?: number;
 }
 
+export interface MetricStats {
+  mean?: number;
+  std?: number;
+  count: number;
+}
+
+export interface SeatRangeAverages {
+  seat_position: number;
+  name?: string;
+  power: MetricStats;
+  stroke_length: MetricStats;
+  effective_length: MetricStats;
+  catch_slip: MetricStats;
+  finish_slip: MetricStats;
+  drive_time: MetricStats;
+  recovery_time: MetricStats;
+}
+
+export interface PieceRangeAverages {
+  piece_id: string;
+  stroke_start: number;
+  stroke_end: number;
+  stroke_count: number;
+  rating: MetricStats;
+  boat_speed: MetricStats;
+  athletes: SeatRangeAverages[];
+  crew_avg_power?: number;
+}
+
 export interface UploadResponse {
   session_id: string;
   session_name: string;
@@ -98,6 +209,26 @@ export interface UploadResponse {
   athletes: Athlete[];
 }
 
+export type IngestJobStatus = 'queued' | 'running' | 'succeeded' | 'failed';
+
+export interface IngestJob {
+  id: string;
+  filename: string;
+  session_name?: string | null;
+  status: IngestJobStatus;
+  stage?: string | null;
+  rows_processed: number;
+  total_rows?: number | null;
+  bytes?: number | null;
+  attempts: number;
+  error?: string | null;
+  session_id?: string | null;
+  result?: UploadResponse | null;
+  created_at?: string;
+  updated_at?: string;
+  finished_at?: string | null;
+}
+
 // ============ Global Athletes ============
 
 export interface GlobalAthlete {
@@ -121,6 +252,33 @@ export interface GlobalAthlete {
   updated_at?: string;
 }
 
+export interface AthleteSearchResult extends GlobalAthlete {
+  score: number;
+}
+
+export interface DuplicateAthleteCandidate {
+  score: number;
+  reason: 'similar_name' | 'same_name' | 'nickname';
+  athlete_a: GlobalAthlete;
+  athlete_b: GlobalAthlete;
+}
+
+export interface RosterRowResult {
+  row: number;
+  status: 'created' | 'updated' | 'error' | 'valid';
+  athlete_id?: string;
+  name?: string;
+  errors: string[];
+}
+
+export interface RosterImportResult {
+  applied: boolean;
+  created: number;
+  updated: number;
+  errors: number;
+  rows: RosterRowResult[];
+}
+
 export interface AthleteMeasurements {
   id: string;
   athlete_id: string;
@@ -169,6 +327,29 @@ export interface AthleteTrends {
   data_points: AthleteTrendPoint[];
 }
 
+export type LeaderboardMetric = 'power' | 'stroke_length' | 'effective_length' | 'catch_slip' | 'finish_slip';
+
+export interface LeaderboardEntry {
+  rank: number;
+  athlete_id: string;
+  name: string;
+  squad?: string;
+  value: number;
+  sessions: number;
+  strokes: number;
+  last_session_date?: string;
+}
+
+export interface Leaderboard {
+  metric: LeaderboardMetric;
+  workout_type?: string;
+  squad?: string;
+  date_from?: string;
+  date_to?: string;
+  last_n?: number;
+  entries: LeaderboardEntry[];
+}
+
 // ============ Video ============
 
 export interface VideoSession {
@@ -180,5 +361,35 @@ export interface VideoSession {
   fps?: number;
   offset_ms: number;
   piece_id?: string;
+  content_hash?: string;
+  created_at?: string;
+}
+
+// Telemetry resampled to video frames; arrays are indexed by frame number
+export interface VideoAlignmentTrack {
+  video_id: string;
+  piece_id: string;
+  fps: number;
+  offset_ms: number;
+  base_offset_ms: number;
+  frame_count: number;
+  stroke_index: number[];
+  speed: (number | null)[];
+  accel: (number | null)[];
+  distance: (number | null)[];
+  gate_angle: (number | null)[][];
+  gate_force_x: (number | null)[][];
+  gate_angle_vel: (number | null)[][];
+}
+
+export interface VideoUpload {
+  id: string;
+  session_id: string;
+  piece_id?: string;
+  original_filename: string;
+  total_bytes: number;
+  received_bytes: number;
+  chunk_size: number;
   created_at?: string;
+  updated_at?: string;
 }